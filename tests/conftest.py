@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,19 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # объекты и страницы кешируются между тестами, а id после отката
+    # транзакции используются повторно
+    from django.core.cache import cache
+    cache.clear()
+
+
+@pytest.fixture(autouse=True, scope='session')
+def temporary_search_index():
+    # сигналы постов пишут в индекс поиска, а не только в тестовую базу
+    from core.test_runner import temporary_search_index
+    with temporary_search_index():
+        yield
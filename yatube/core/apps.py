@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import profiling, sqlite
+
+        # регистрирует проверки настроек
+        from . import checks  # noqa: F401
+
+        profiling.install_template_timer()
+        connection_created.connect(sqlite.configure_connection)
@@ -0,0 +1,188 @@
+"""ASGI-точка входа для Django 2.2.
+
+Django 2.2 сам не умеет ASGI, поэтому ASGIHandler переводит
+HTTP-запрос ASGI в WSGI environ и выполняет обычный обработчик Django
+(middleware, маршрутизацию, представление) в пуле из ASGI_WORKERS
+потоков, не занимая цикл событий сервера. Ответ с методом
+async_stream() (потоки SSE) после этого отдается из цикла событий, и
+долгие соединения не держат потоки пула.
+
+Представления остаются синхронными: каждое выполняется целиком в
+одном потоке пула и ходит в базу через одно соединение этого потока.
+Поэтому с каждой базой открыто не больше ASGI_WORKERS соединений на
+процесс; что они помещаются в лимит базы, проверяет core/checks.py.
+"""
+
+import asyncio
+import contextlib
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+_executors = {}
+
+
+def executor(name, size):
+    """Пул потоков процесса; создается при первом обращении."""
+    if name not in _executors:
+        _executors[name] = ThreadPoolExecutor(size, thread_name_prefix=name)
+    return _executors[name]
+
+
+def build_environ(scope, body):
+    """WSGI environ для HTTP-запроса ASGI."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin1').upper().replace('-', '_')
+        value = raw_value.decode('latin1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            # повторяющиеся заголовки склеиваются, как в WSGI-серверах
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    # тело уже прочитано целиком, в том числе при chunked-передаче
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+class ASGIHandler:
+    def __init__(self, wsgi_application, workers):
+        self.wsgi_application = wsgi_application
+        self.workers = workers
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        pool = executor('asgi', self.workers)
+        status, headers, response = await loop.run_in_executor(
+            pool, self.run_wsgi, build_environ(scope, body)
+        )
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': status,
+                'headers': headers,
+            }
+        )
+        if isinstance(response, list):
+            await send(
+                {'type': 'http.response.body', 'body': b''.join(response)}
+            )
+            return
+        try:
+            await self.stream(response, receive, send)
+        finally:
+            # close() отправляет request_finished, а он трогает базу
+            await loop.run_in_executor(pool, response.close)
+
+    async def stream(self, response, receive, send):
+        """Отдает бесконечный ответ, пока клиент не отключится."""
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        chunks = response.async_stream()
+        try:
+            while True:
+                chunk = asyncio.ensure_future(chunks.__anext__())
+                await asyncio.wait(
+                    {chunk, disconnected},
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected.done():
+                    chunk.cancel()
+                    with contextlib.suppress(
+                        asyncio.CancelledError, StopAsyncIteration
+                    ):
+                        await chunk
+                    return
+                try:
+                    body = chunk.result()
+                except StopAsyncIteration:
+                    break
+                await send(
+                    {
+                        'type': 'http.response.body',
+                        'body': body,
+                        'more_body': True,
+                    }
+                )
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await chunks.aclose()
+
+    async def wait_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Тело запроса или None, если клиент отключился."""
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    def run_wsgi(self, environ):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ]
+
+        response = self.wsgi_application(environ, start_response)
+        if hasattr(response, 'async_stream'):
+            # такой ответ читается в цикле событий, не занимая поток
+            return started['status'], started['headers'], response
+        try:
+            chunks = list(response)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return started['status'], started['headers'], chunks
+
+
+def get_asgi_application():
+    from django.core.wsgi import get_wsgi_application
+
+    return ASGIHandler(get_wsgi_application(), settings.ASGI_WORKERS)
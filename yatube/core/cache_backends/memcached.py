@@ -0,0 +1,330 @@
+"""Клиент сетевого кеша (текстовый протокол memcached) с пулом соединений.
+
+Соединения не открываются на каждый запрос, а берутся из пула процесса.
+get_many отправляет одну команду get со всеми ключами, set_many пишет
+все команды set одним пакетом и затем читает ответы.
+
+Кеш не должен ронять страницы: если сервер недоступен, не ответил
+вовремя или ответил ошибкой, чтение считается промахом, а запись не
+выполняется; сбой пишется в лог.
+"""
+
+import hashlib
+import logging
+import pickle
+import queue
+import socket
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAX_KEY_LENGTH = 250
+# memcached считает сроки больше 30 дней абсолютным временем unix
+MAX_RELATIVE_TIMEOUT = 60 * 60 * 24 * 30
+FLAG_PICKLE = 1
+FLAG_INT = 2
+
+logger = logging.getLogger(__name__)
+
+
+class CacheServerError(Exception):
+    pass
+
+
+class Connection:
+    def __init__(self, address, timeout):
+        self.address = address
+        self.timeout = timeout
+        self.socket = None
+        self.buffer = b''
+
+    def send(self, data):
+        if self.socket is None:
+            # подключение при первой команде: сбой подключения ловится
+            # там же, где сбой обмена
+            self.socket = socket.create_connection(
+                self.address, timeout=self.timeout
+            )
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.sendall(data)
+
+    def readline(self):
+        while b'\r\n' not in self.buffer:
+            self._fill()
+        line, self.buffer = self.buffer.split(b'\r\n', 1)
+        return line
+
+    def read(self, size):
+        # данные и завершающий \r\n
+        while len(self.buffer) < size + 2:
+            self._fill()
+        data, self.buffer = self.buffer[:size], self.buffer[size + 2:]
+        return data
+
+    def _fill(self):
+        chunk = self.socket.recv(65536)
+        if not chunk:
+            raise ConnectionError('Сервер кеша закрыл соединение')
+        self.buffer += chunk
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+
+
+class ConnectionPool:
+    def __init__(self, address, size, timeout):
+        self.address = address
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = Connection(self.address, self.timeout)
+        try:
+            yield connection
+        except BaseException:
+            # после сбоя в буфере может остаться чужой ответ
+            connection.close()
+            raise
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def parse_address(location):
+    host, _, port = location.rpartition(':')
+    return host, int(port)
+
+
+class PooledMemcachedCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        if isinstance(location, str):
+            location = location.split(';')
+        options = params.get('OPTIONS', {})
+        self._pools = [
+            ConnectionPool(
+                parse_address(server),
+                options.get('POOL_SIZE', 10),
+                options.get('SOCKET_TIMEOUT', 3),
+            )
+            for server in location
+        ]
+
+    def make_key(self, key, version=None):
+        key = super().make_key(key, version=version)
+        if (
+            len(key) > MAX_KEY_LENGTH
+            or not key.isascii()
+            or any(char.isspace() or ord(char) < 33 for char in key)
+        ):
+            key = 'sha1:' + hashlib.sha1(key.encode()).hexdigest()
+        return key
+
+    @contextmanager
+    def _connection(self, pool, command):
+        """Соединение из пула; сбой пишется в лог и не пробрасывается.
+
+        Код после блока with должен считать, что ответа от сервера нет.
+        Соединение после сбоя закрывается (см. ConnectionPool), а не
+        возвращается в пул: непрочитанный остаток ответа сбил бы
+        следующую команду.
+        """
+        try:
+            with pool.connection() as connection:
+                yield connection
+        except OSError:
+            logger.warning(
+                'Сервер кеша %s:%s недоступен (%s)',
+                *pool.address,
+                command,
+                exc_info=True,
+            )
+        except CacheServerError:
+            logger.warning(
+                'Сервер кеша %s:%s ответил ошибкой (%s)',
+                *pool.address,
+                command,
+                exc_info=True,
+            )
+
+    def _pool(self, key):
+        if len(self._pools) == 1:
+            return self._pools[0]
+        return self._pools[zlib.crc32(key.encode()) % len(self._pools)]
+
+    def _group(self, keys):
+        groups = {}
+        for key in keys:
+            groups.setdefault(self._pool(key), []).append(key)
+        return groups.items()
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return 0
+        if int(timeout) <= 0:
+            return -1
+        if timeout > MAX_RELATIVE_TIMEOUT:
+            return int(time.time() + timeout)
+        return int(timeout)
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return FLAG_INT, str(value).encode()
+        return FLAG_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(flags, data):
+        if flags == FLAG_INT:
+            return int(data)
+        if flags == FLAG_PICKLE:
+            return pickle.loads(data)
+        return data
+
+    @staticmethod
+    def _store_command(command, key, value, expires):
+        flags, data = PooledMemcachedCache._encode(value)
+        header = f'{command} {key} {flags} {expires} {len(data)}\r\n'
+        return header.encode() + data + b'\r\n'
+
+    def _get(self, keys):
+        found = {}
+        for pool, group in self._group(keys):
+            with self._connection(pool, 'get') as connection:
+                connection.send(f'get {" ".join(group)}\r\n'.encode())
+                while True:
+                    line = connection.readline()
+                    if line == b'END':
+                        break
+                    if not line.startswith(b'VALUE '):
+                        raise CacheServerError(line.decode())
+                    _, key, flags, size = line.split()[:4]
+                    data = connection.read(int(size))
+                    found[key.decode()] = self._decode(int(flags), data)
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        return self._get([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        if not made:
+            return {}
+        return {made[key]: value for key, value in self._get(made).items()}
+
+    def _store(self, command, items, timeout):
+        """Пишет пачку команд set/add одним пакетом, возвращает ответы."""
+        expires = self.get_backend_timeout(timeout)
+        if expires < 0:
+            self._delete([key for key, _ in items])
+            return {key: b'NOT_STORED' for key, _ in items}
+        replies = {}
+        values = dict(items)
+        for pool, group in self._group(values):
+            with self._connection(pool, command) as connection:
+                connection.send(
+                    b''.join(
+                        self._store_command(command, key, values[key], expires)
+                        for key in group
+                    )
+                )
+                for key in group:
+                    replies[key] = connection.readline()
+        return replies
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made = {self.make_key(key, version=version): key for key in data}
+        replies = self._store(
+            'set', [(key, data[made[key]]) for key in made], timeout
+        )
+        return [
+            key
+            for made_key, key in made.items()
+            if replies.get(made_key) != b'STORED'
+        ]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        replies = self._store('add', [(key, value)], timeout)
+        return replies.get(key) == b'STORED'
+
+    def _delete(self, keys):
+        for pool, group in self._group(keys):
+            with self._connection(pool, 'delete') as connection:
+                connection.send(
+                    b''.join(f'delete {key}\r\n'.encode() for key in group)
+                )
+                for _ in group:
+                    connection.readline()
+
+    def delete(self, key, version=None):
+        self._delete([self.make_key(key, version=version)])
+
+    def delete_many(self, keys, version=None):
+        self._delete([self.make_key(key, version=version) for key in keys])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        pool = self._pool(key)
+        reply = None
+        with self._connection(pool, 'touch') as connection:
+            expires = self.get_backend_timeout(timeout)
+            connection.send(f'touch {key} {expires}\r\n'.encode())
+            reply = connection.readline()
+        return reply == b'TOUCHED'
+
+    def incr(self, key, delta=1, version=None):
+        if delta < 0:
+            return self.decr(key, -delta, version=version)
+        return self._arithmetic('incr', key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        if delta < 0:
+            return self.incr(key, -delta, version=version)
+        return self._arithmetic('decr', key, delta, version)
+
+    def _arithmetic(self, command, key, delta, version):
+        made_key = self.make_key(key, version=version)
+        pool = self._pool(made_key)
+        # недоступный или ответивший ошибкой сервер - как ключа нет
+        reply = b'NOT_FOUND'
+        with self._connection(pool, command) as connection:
+            connection.send(f'{command} {made_key} {delta}\r\n'.encode())
+            line = connection.readline()
+            if line != b'NOT_FOUND' and not line.isdigit():
+                raise CacheServerError(line.decode())
+            reply = line
+        if reply == b'NOT_FOUND':
+            raise ValueError(f"Key '{key}' not found")
+        return int(reply)
+
+    def clear(self):
+        for pool in self._pools:
+            with self._connection(pool, 'flush_all') as connection:
+                connection.send(b'flush_all\r\n')
+                connection.readline()
+
+    def close(self, **kwargs):
+        # соединения возвращаются в пул и переживают запрос
+        pass
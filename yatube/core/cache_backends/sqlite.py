@@ -0,0 +1,203 @@
+"""Общий кеш для всех процессов одного сервера в файле SQLite.
+
+В отличие от LocMemCache его видят все воркеры gunicorn, а инвалидация
+в одном воркере сразу действует в остальных. get_many и set_many
+выполняются одним запросом/транзакцией.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+# SQLite ограничивает число параметров одного запроса
+BATCH_SIZE = 500
+# как часто (в записях) проверять, не пора ли чистить кеш
+CULL_CHECK_EVERY = 100
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _expiry(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _batches(items):
+        items = list(items)
+        for start in range(0, len(items), BATCH_SIZE):
+            yield items[start:start + BATCH_SIZE]
+
+    def _select(self, keys):
+        """Непросроченные значения по готовым (make_key) ключам."""
+        found = {}
+        now = time.time()
+        for batch in self._batches(keys):
+            placeholders = ','.join('?' * len(batch))
+            rows = self._connection.execute(
+                'SELECT key, value FROM cache WHERE key IN '
+                f'({placeholders}) AND (expires IS NULL OR expires > ?)',
+                [*batch, now],
+            )
+            for key, value in rows:
+                found[key] = pickle.loads(value)
+        return found
+
+    def _write(self, sql, rows):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(sql, rows)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._writes += len(rows)
+        if self._writes >= CULL_CHECK_EVERY:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        connection = self._connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', [time.time()]
+        )
+        [count] = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self._max_entries and self._cull_frequency:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                [count // self._cull_frequency],
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._select([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        return {
+            made[key]: value for key, value in self._select(made).items()
+        }
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expiry(timeout)
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        self._write(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            [(key, value, expires) for key, value in rows],
+        )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                [key, time.time()],
+            )
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                [
+                    key,
+                    pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                    self._expiry(timeout),
+                ],
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            value = self._select([made_key]).get(made_key)
+            if value is None:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [pickle.dumps(value, pickle.HIGHEST_PROTOCOL), made_key],
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            [self._expiry(timeout), key, time.time()],
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_key(key, version=version) for key in keys]
+        for key in made:
+            self.validate_key(key)
+        self._write('DELETE FROM cache WHERE key = ?', [(k,) for k in made])
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # соединение живет в потоке и переиспользуется между запросами
+        pass
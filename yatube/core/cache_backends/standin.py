@@ -0,0 +1,140 @@
+"""Локальная замена сетевого кеша для тестов и разработки.
+
+Понимает подмножество текстового протокола memcached, которое использует
+PooledMemcachedCache: get, set, add, delete, incr, decr, touch, flush_all.
+
+    python -m core.cache_backends.standin 127.0.0.1:11211
+"""
+import collections
+import socketserver
+import sys
+import threading
+import time
+
+from .memcached import MAX_RELATIVE_TIMEOUT, parse_address
+
+
+DEFAULT = '127.0.0.1:11211'
+
+
+class Storage:
+    def __init__(self):
+        self.items = {}
+        self.commands = collections.Counter()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def expiry(exptime):
+        exptime = int(exptime)
+        if exptime == 0:
+            return None
+        if exptime < 0:
+            return 0
+        if exptime > MAX_RELATIVE_TIMEOUT:
+            return exptime
+        return time.time() + exptime
+
+    def lookup(self, key):
+        item = self.items.get(key)
+        if item is None:
+            return None
+        if item[2] is not None and item[2] <= time.time():
+            del self.items[key]
+            return None
+        return item
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        storage = self.server.storage
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, *args = line.decode().split()
+            handler = getattr(self, f'do_{command}', None)
+            if handler is None:
+                self.wfile.write(b'ERROR\r\n')
+                continue
+            with storage.lock:
+                storage.commands[command] += 1
+                reply = handler(storage, *args)
+            self.wfile.write(reply)
+
+    def do_get(self, storage, *keys):
+        reply = b''
+        for key in keys:
+            item = storage.lookup(key)
+            if item is not None:
+                flags, data, _ = item
+                reply += f'VALUE {key} {flags} {len(data)}\r\n'.encode()
+                reply += data + b'\r\n'
+        return reply + b'END\r\n'
+
+    def do_set(self, storage, key, flags, exptime, size, add=False):
+        data = self.rfile.read(int(size) + 2)[:-2]
+        if add and storage.lookup(key) is not None:
+            return b'NOT_STORED\r\n'
+        storage.items[key] = (int(flags), data, storage.expiry(exptime))
+        return b'STORED\r\n'
+
+    def do_add(self, storage, key, flags, exptime, size):
+        return self.do_set(storage, key, flags, exptime, size, add=True)
+
+    def do_delete(self, storage, key):
+        if storage.lookup(key) is None:
+            return b'NOT_FOUND\r\n'
+        del storage.items[key]
+        return b'DELETED\r\n'
+
+    def do_incr(self, storage, key, delta):
+        item = storage.lookup(key)
+        if item is None:
+            return b'NOT_FOUND\r\n'
+        flags, data, expires = item
+        value = max(int(data) + int(delta), 0)
+        storage.items[key] = (flags, str(value).encode(), expires)
+        return f'{value}\r\n'.encode()
+
+    def do_decr(self, storage, key, delta):
+        return self.do_incr(storage, key, -int(delta))
+
+    def do_touch(self, storage, key, exptime):
+        item = storage.lookup(key)
+        if item is None:
+            return b'NOT_FOUND\r\n'
+        storage.items[key] = (item[0], item[1], storage.expiry(exptime))
+        return b'TOUCHED\r\n'
+
+    def do_flush_all(self, storage):
+        storage.items.clear()
+        return b'OK\r\n'
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, Handler)
+        self.storage = Storage()
+
+    @property
+    def location(self):
+        host, port = self.server_address[:2]
+        return f'{host}:{port}'
+
+    def start(self):
+        """Запускает сервер в фоновом потоке."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    address = parse_address(sys.argv[1] if len(sys.argv) > 1 else DEFAULT)
+    StandInServer(address).serve_forever()
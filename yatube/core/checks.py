@@ -0,0 +1,38 @@
+"""Проверки настроек при запуске (manage.py check, runserver, тесты)."""
+
+from django.conf import settings
+from django.core import checks
+
+
+def connection_budget(engine, workers, processes, limit):
+    """Ошибки, если пулы ASGI всех процессов не помещаются в лимит базы.
+
+    Каждый поток пула держит свое соединение с каждой базой, в которую
+    ходил (CONN_MAX_AGE), поэтому к основной базе и к каждой реплике
+    может быть открыто workers * processes соединений. Для SQLite
+    лимита нет: соединение - открытый файл.
+    """
+    if engine.endswith('sqlite3'):
+        return []
+    connections = workers * processes
+    if connections <= limit:
+        return []
+    return [
+        checks.Error(
+            f'ASGI_WORKERS * WEB_PROCESSES = {connections} соединений '
+            f'с каждой базой, а лимит - {limit}',
+            hint='Уменьшите YATUBE_ASGI_WORKERS или YATUBE_WEB_PROCESSES, '
+            'либо увеличьте max_connections и YATUBE_DB_CONNECTION_LIMIT.',
+            id='core.E001',
+        )
+    ]
+
+
+@checks.register()
+def check_connection_budget(app_configs, **kwargs):
+    return connection_budget(
+        settings.DATABASES['default']['ENGINE'],
+        settings.ASGI_WORKERS,
+        settings.WEB_PROCESSES,
+        settings.DATABASE_CONNECTION_LIMIT,
+    )
@@ -0,0 +1,138 @@
+"""Настройки баз из окружения и маршрутизация чтения на реплики.
+
+Запись всегда идет в основную базу (default). Чтение в запросах
+ReadYourWritesMiddleware уходит на случайную реплику, кроме случаев,
+когда запрос закреплен за основной базой:
+- небезопасный метод (POST и т.п.) или представление с @use_primary;
+- у пользователя есть cookie, выставленная после его недавней записи,
+  чтобы он сразу видел свой пост, комментарий или подписку, даже если
+  реплика отстает. Cookie ставят только записи небезопасных запросов и
+  представлений с @use_primary: служебная запись на GET (сессия,
+  last_login) запрос не закрепляет.
+Вне запросов (команды, фоновые задачи) все читается из основной базы.
+"""
+
+import functools
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_state = ContextVar('database_state', default=None)
+
+
+def database_settings(env, base_dir):
+    """DATABASES и список алиасов реплик по переменным окружения.
+
+    YATUBE_DB_ENGINE - sqlite (по умолчанию) или postgresql;
+    YATUBE_DB_NAME, _HOST, _PORT, _USER, _PASSWORD - основная база;
+    YATUBE_DB_REPLICAS - через запятую: файлы SQLite или host[:port]
+    реплик PostgreSQL с теми же именем базы и пользователем;
+    YATUBE_DB_CONN_MAX_AGE - сколько секунд держать соединение.
+    """
+    engine = env.get('YATUBE_DB_ENGINE', 'sqlite')
+    if engine not in ENGINES:
+        raise ValueError(f'Неизвестный YATUBE_DB_ENGINE: {engine}')
+    primary = {
+        'ENGINE': ENGINES[engine],
+        'NAME': env.get(
+            'YATUBE_DB_NAME',
+            base_dir + '/db.sqlite3' if engine == 'sqlite' else 'yatube',
+        ),
+        'CONN_MAX_AGE': int(env.get('YATUBE_DB_CONN_MAX_AGE', 60)),
+    }
+    if engine != 'sqlite':
+        primary.update(
+            HOST=env.get('YATUBE_DB_HOST', 'localhost'),
+            PORT=env.get('YATUBE_DB_PORT', '5432'),
+            USER=env.get('YATUBE_DB_USER', 'yatube'),
+            PASSWORD=env.get('YATUBE_DB_PASSWORD', ''),
+        )
+    databases = {'default': primary}
+    replicas = [
+        replica.strip()
+        for replica in env.get('YATUBE_DB_REPLICAS', '').split(',')
+        if replica.strip()
+    ]
+    for number, replica in enumerate(replicas, 1):
+        if engine == 'sqlite':
+            location = {'NAME': replica}
+        else:
+            host, _, port = replica.partition(':')
+            location = {'HOST': host, 'PORT': port or primary['PORT']}
+        # в тестах реплика - то же соединение, что и основная база
+        databases[f'replica_{number}'] = dict(
+            primary, **location, TEST={'MIRROR': 'default'}
+        )
+    return databases, [alias for alias in databases if alias != 'default']
+
+
+class RequestState:
+    def __init__(self, pinned, sticky):
+        self.pinned = pinned
+        # запись в запросе закрепляет следующие запросы через cookie
+        self.sticky = sticky
+        self.wrote = False
+
+
+def begin_request(pinned, sticky):
+    return _state.set(RequestState(pinned, sticky))
+
+
+def end_request(token):
+    """Завершает запрос; True, если нужно выставить cookie.
+
+    То есть в запросе была запись в базу, и это небезопасный запрос или
+    представление с @use_primary.
+    """
+    state = _state.get()
+    _state.reset(token)
+    return state.wrote and state.sticky
+
+
+def pin_primary():
+    """Закрепляет текущий запрос и его запись за основной базой."""
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+        state.sticky = True
+
+
+def use_primary(view):
+    """Декоратор представления, которое пишет в базу в том числе на GET."""
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        pin_primary()
+        return view(request, *args, **kwargs)
+
+    wrapper.uses_primary = True
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = settings.DATABASE_REPLICAS
+        if state is None or state.pinned or not replicas:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+            # дальше в этом запросе читаем свои же записи
+            state.pinned = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики - копии основной базы
+        return True
@@ -0,0 +1,61 @@
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db, profiling
+
+
+class ProfilingMiddleware:
+    """Профилирует долю запросов, см. core/profiling.py."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.PROFILING_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+        profile, token = profiling.activate()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            profiling.deactivate(token)
+        profile.finish()
+        match = request.resolver_match
+        profiling.histogram.add(
+            match.view_name if match else 'unresolved', profile.metrics()
+        )
+        response['Server-Timing'] = profile.server_timing()
+        return response
+
+
+class ReadYourWritesMiddleware:
+    """Закрепляет запросы за основной базой, см. core/db.py."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        unsafe = request.method not in db.SAFE_METHODS
+        pinned = unsafe or settings.DATABASE_STICKY_COOKIE in request.COOKIES
+        token = db.begin_request(pinned, sticky=unsafe)
+        try:
+            response = self.get_response(request)
+        finally:
+            sticky = db.end_request(token)
+        if sticky:
+            response.set_cookie(
+                settings.DATABASE_STICKY_COOKIE,
+                '1',
+                max_age=settings.DATABASE_REPLICA_LAG,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,183 @@
+"""Выборочное профилирование запросов.
+
+ProfilingMiddleware с вероятностью settings.PROFILING_SAMPLE_RATE
+включает для запроса Profile: время и число SQL-запросов, время
+отрисовки шаблонов и участков кода, отмеченных timer('имя'). Итог
+уходит в заголовок Server-Timing и в скользящую гистограмму по
+представлениям (у каждого процесса своя), которую показывает
+core.views.profiling_stats.
+
+Без выборки middleware только сравнивает случайное число с порогом, а
+timer и отрисовка шаблона - проверяют, что профиля нет.
+Время вложенных участков входит во внешние: SQL, выполненный при
+отрисовке шаблона, учитывается и в db, и в tpl.
+
+Профиль принадлежит одному запросу и меняется только его потоком:
+middleware оборачивает соединения (connections.all()) этого потока.
+Общая между потоками только гистограмма процесса: в нее одновременно
+пишут все потоки запросов (пул ASGI_WORKERS, многопоточный runserver),
+поэтому она меняется и читается под блокировкой.
+"""
+
+import math
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.base import Template
+
+# границы корзин гистограммы, мс
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+PERCENTILES = (50, 95, 99)
+
+_current = ContextVar('profile', default=None)
+
+
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.queries = 0
+        self.timings = defaultdict(float, db=0.0)
+        self._depth = Counter()
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка выполнения SQL для connection.execute_wrapper."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.timings['db'] += time.perf_counter() - start
+
+    def enter(self, name):
+        self._depth[name] += 1
+        return time.perf_counter()
+
+    def exit(self, name, start):
+        # вложенные участки с тем же именем не считаются повторно
+        self._depth[name] -= 1
+        if not self._depth[name]:
+            self.timings[name] += time.perf_counter() - start
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def metrics(self):
+        """Метрики запроса: время в мс и число SQL-запросов."""
+        metrics = {'total': self.total * 1000, 'queries': self.queries}
+        for name, seconds in self.timings.items():
+            metrics[name] = seconds * 1000
+        return metrics
+
+    def server_timing(self):
+        parts = []
+        for name, seconds in sorted(self.timings.items()):
+            part = f'{name};dur={seconds * 1000:.1f}'
+            if name == 'db':
+                part += f';desc="{self.queries} queries"'
+            parts.append(part)
+        parts.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def activate():
+    """Включает профиль для текущего запроса (потока или задачи)."""
+    profile = Profile()
+    return profile, _current.set(profile)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+class timer:
+    """Контекстный менеджер: время участка кода в профиле запроса."""
+
+    __slots__ = ('name', 'profile', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.profile = _current.get()
+        if self.profile is not None:
+            self.start = self.profile.enter(self.name)
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.exit(self.name, self.start)
+
+
+def install_template_timer():
+    """Учитывает отрисовку шаблонов Django как участок tpl."""
+    render = Template.render
+    if getattr(render, 'profiled', False):
+        return
+
+    def profiled_render(self, context):
+        with timer('tpl'):
+            return render(self, context)
+
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+def percentile(ordered, percent):
+    """Процентиль отсортированного списка по ближайшему рангу."""
+    return ordered[max(math.ceil(percent / 100 * len(ordered)), 1) - 1]
+
+
+class Histogram:
+    """Последние window значений каждой метрики каждого представления."""
+
+    def __init__(self, window):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, view, metrics):
+        with self._lock:
+            samples = self._samples.setdefault(view, {})
+            for name, value in metrics.items():
+                if name not in samples:
+                    samples[name] = deque(maxlen=self.window)
+                samples[name].append(value)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self, values):
+        ordered = sorted(values)
+        summary = {'count': len(ordered), 'max': round(ordered[-1], 3)}
+        for percent in PERCENTILES:
+            summary[f'p{percent}'] = round(percentile(ordered, percent), 3)
+        buckets = Counter(
+            next((str(edge) for edge in BUCKETS if value <= edge), 'inf')
+            for value in ordered
+        )
+        summary['buckets'] = {
+            edge: buckets[edge]
+            for edge in [*map(str, BUCKETS), 'inf']
+            if buckets[edge]
+        }
+        return summary
+
+    def snapshot(self):
+        with self._lock:
+            samples = {
+                view: {name: list(values) for name, values in metrics.items()}
+                for view, metrics in self._samples.items()
+            }
+        return {
+            view: {
+                name: self.summary(values) for name, values in metrics.items()
+            }
+            for view, metrics in sorted(samples.items())
+        }
+
+
+histogram = Histogram(settings.PROFILING_WINDOW)
@@ -0,0 +1,135 @@
+"""Режим SQLite для небольших установок на одном сервере.
+
+С SQLITE_TUNING каждое новое соединение с SQLite получает PRAGMA из
+TUNED_PRAGMAS: WAL, чтобы запись комментариев и подписок не блокировала
+чтение лент, synchronous=NORMAL (в WAL это безопасно для целостности),
+mmap и увеличенный кеш страниц, а также busy_timeout вместо мгновенной
+ошибки "database is locked".
+
+SQLite допускает одного писателя, поэтому представления с
+@serialize_writes выстраиваются в очередь процесса и пишут по одному в
+порядке прихода; между процессами их разводит busy_timeout. Запись вне
+представлений (например, пачки posts.write_behind) и представления,
+которым до записи нужно долго готовить данные, встают в ту же очередь
+через queued_write() только на время работы с базой.
+"""
+
+import collections
+import contextlib
+import functools
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from .db import SAFE_METHODS
+
+TUNED_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # отрицательное значение - размер в КиБ, а не в страницах
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+# PRAGMA, возвращающие базу в режим по умолчанию
+DEFAULT_PRAGMAS = {'journal_mode': 'delete', 'synchronous': 'full'}
+
+
+class WriteQueueTimeout(Exception):
+    pass
+
+
+class WriteQueue:
+    """Очередь писателей: по одному, в порядке прихода."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._busy = False
+        self._waiters = collections.deque()
+
+    def acquire(self, timeout=None):
+        with self._lock:
+            if not self._busy:
+                self._busy = True
+                return
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if waiter.wait(timeout):
+            return
+        with self._lock:
+            # очередь могла дойти до нас в момент истечения ожидания
+            if waiter.is_set():
+                return
+            self._waiters.remove(waiter)
+        raise WriteQueueTimeout
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # очередь передается следующему, не освобождаясь
+                self._waiters.popleft().set()
+            else:
+                self._busy = False
+
+    def __len__(self):
+        return len(self._waiters)
+
+
+write_queue = WriteQueue()
+
+
+def apply_pragmas(connection, pragmas):
+    # сигнал приходит из connect(), курсор Django еще недоступен
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик connection_created: настраивает соединения с SQLite."""
+    if connection.vendor == 'sqlite' and settings.SQLITE_TUNING:
+        apply_pragmas(connection, TUNED_PRAGMAS)
+
+
+def _queue_enabled():
+    return settings.SQLITE_TUNING and connections['default'].vendor == 'sqlite'
+
+
+@contextlib.contextmanager
+def queued_write(timeout=None):
+    """Запись вне представлений, в той же очереди процесса."""
+    if not _queue_enabled():
+        yield
+        return
+    write_queue.acquire(timeout)
+    try:
+        yield
+    finally:
+        write_queue.release()
+
+
+def overloaded():
+    """Ответ писателю, не дождавшемуся очереди."""
+    response = HttpResponse('Сервер перегружен', status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+def serialize_writes(view):
+    """Декоратор пишущего представления: запись через очередь процесса."""
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS or not _queue_enabled():
+            return view(request, *args, **kwargs)
+        try:
+            write_queue.acquire(settings.SQLITE_WRITE_QUEUE_TIMEOUT)
+        except WriteQueueTimeout:
+            return overloaded()
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            write_queue.release()
+
+    return wrapper
@@ -0,0 +1,37 @@
+"""Запуск тестов: файлы, которые пишут сигналы, уходят во временный каталог."""
+
+import contextlib
+import os
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextlib.contextmanager
+def temporary_search_index():
+    """SEARCH_INDEX во временном каталоге, который потом удаляется.
+
+    Сигналы постов сразу пишут в индекс поиска, и без этого любой тест,
+    создающий пост, менял бы settings.SEARCH_INDEX рабочей установки.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        with override_settings(
+            SEARCH_INDEX=os.path.join(directory, 'search.sqlite3')
+        ):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._files = contextlib.ExitStack()
+        self._files.enter_context(temporary_search_index())
+
+    def teardown_test_environment(self, **kwargs):
+        self._files.close()
+        super().teardown_test_environment(**kwargs)
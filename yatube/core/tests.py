@@ -1,4 +1,36 @@
-from django.test import TestCase
+import asyncio
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.http import HttpResponse
+from django.middleware.csrf import _get_new_csrf_token
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from . import asgi, checks, db, sqlite
+from .cache_backends.memcached import PooledMemcachedCache
+from .cache_backends.sqlite import SQLiteCache
+from .cache_backends.standin import Handler, StandInServer
+from .middleware import ReadYourWritesMiddleware
+from .profiling import Histogram, activate, deactivate, histogram, timer
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +38,666 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TestRunnerTests(SimpleTestCase):
+    def test_search_index_is_temporary(self):
+        """Тесты не пишут в индекс поиска из BASE_DIR"""
+        self.assertNotEqual(
+            os.path.dirname(settings.SEARCH_INDEX), settings.BASE_DIR
+        )
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        histogram.clear()
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request_has_no_timing(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(histogram.snapshot(), {})
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_request_reports_server_timing(self):
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'tpl;dur=', 'fragments;dur=', 'total;dur='):
+            self.assertIn(name, timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        metrics = histogram.snapshot()['posts:index']
+        self.assertEqual(metrics['total']['count'], 1)
+        self.assertGreaterEqual(metrics['queries']['p50'], 1)
+
+    def test_nested_timers_are_counted_once(self):
+        profile, token = activate()
+        try:
+            with timer('tpl'):
+                with timer('tpl'):
+                    time.sleep(0.01)
+        finally:
+            deactivate(token)
+        self.assertLess(profile.timings['tpl'], 0.02)
+        self.assertGreaterEqual(profile.timings['tpl'], 0.01)
+
+    def test_histogram_keeps_samples_from_concurrent_requests(self):
+        """Потоки запросов пишут в общую гистограмму, не теряя значений"""
+        shared = Histogram(window=1000)
+
+        def work():
+            for _ in range(200):
+                shared.add('index', {'total': 1.0})
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(shared.snapshot()['index']['total']['count'], 800)
+
+    def test_histogram_summary(self):
+        window = Histogram(window=3)
+        for value in (1, 3, 30, 700):
+            window.add('view', {'total': value})
+        summary = window.snapshot()['view']['total']
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['p50'], 30)
+        self.assertEqual(summary['max'], 700)
+        self.assertEqual(summary['buckets'], {'5': 1, '50': 1, '1000': 1})
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_stats_endpoint_is_for_staff(self):
+        url = reverse('profiling_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        staff = get_user_model().objects.create_user(
+            username='staff', is_staff=True
+        )
+        self.client.force_login(staff)
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posts:index', response.json()['views'])
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_sqlite_primary_and_replica_files(self):
+        databases, replicas = db.database_settings(
+            {
+                'YATUBE_DB_NAME': '/data/primary.sqlite3',
+                'YATUBE_DB_REPLICAS': '/data/replica.sqlite3',
+            },
+            '/app',
+        )
+        self.assertEqual(replicas, ['replica_1'])
+        self.assertEqual(databases['default']['NAME'], '/data/primary.sqlite3')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 60)
+        self.assertEqual(
+            databases['replica_1']['NAME'], '/data/replica.sqlite3'
+        )
+        self.assertEqual(databases['replica_1']['TEST'], {'MIRROR': 'default'})
+
+    def test_postgresql_replicas_share_credentials(self):
+        databases, replicas = db.database_settings(
+            {
+                'YATUBE_DB_ENGINE': 'postgresql',
+                'YATUBE_DB_HOST': 'primary',
+                'YATUBE_DB_PASSWORD': 'secret',
+                'YATUBE_DB_REPLICAS': 'replica-a, replica-b:6432',
+                'YATUBE_DB_CONN_MAX_AGE': '300',
+            },
+            '/app',
+        )
+        self.assertEqual(replicas, ['replica_1', 'replica_2'])
+        self.assertEqual(
+            databases['default']['ENGINE'], 'django.db.backends.postgresql'
+        )
+        self.assertEqual(databases['replica_2']['HOST'], 'replica-b')
+        self.assertEqual(databases['replica_2']['PORT'], '6432')
+        self.assertEqual(databases['replica_1']['PORT'], '5432')
+        self.assertEqual(databases['replica_1']['PASSWORD'], 'secret')
+        self.assertEqual(databases['replica_1']['CONN_MAX_AGE'], 300)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            db.database_settings({'YATUBE_DB_ENGINE': 'oracle'}, '/app')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Решения роутера в запросах ReadYourWritesMiddleware."""
+
+    def setUp(self):
+        self.router = db.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def call(self, request, view):
+        return ReadYourWritesMiddleware(view)(request)
+
+    def reader(self, request):
+        return HttpResponse(self.router.db_for_read(None))
+
+    def writer(self, request):
+        self.router.db_for_write(None)
+        return self.reader(request)
+
+    def test_outside_requests_reads_use_primary(self):
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_safe_request_reads_from_replica(self):
+        response = self.call(self.factory.get('/'), self.reader)
+        self.assertEqual(response.content, b'replica_1')
+        self.assertNotIn(settings.DATABASE_STICKY_COOKIE, response.cookies)
+
+    def test_write_pins_request_and_sets_sticky_cookie(self):
+        response = self.call(self.factory.post('/'), self.writer)
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[settings.DATABASE_STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.DATABASE_REPLICA_LAG)
+
+    def test_service_write_on_get_sets_no_cookie(self):
+        """Служебная запись на GET (сессия) не ставит cookie"""
+        response = self.call(self.factory.get('/'), self.writer)
+        self.assertNotIn(settings.DATABASE_STICKY_COOKIE, response.cookies)
+        response = self.call(
+            self.factory.get('/'), db.use_primary(self.writer)
+        )
+        self.assertIn(settings.DATABASE_STICKY_COOKIE, response.cookies)
+
+    def test_sticky_cookie_reads_own_writes(self):
+        request = self.factory.get('/')
+        request.COOKIES[settings.DATABASE_STICKY_COOKIE] = '1'
+        response = self.call(request, self.reader)
+        self.assertEqual(response.content, b'default')
+
+    def test_use_primary_pins_get_views(self):
+        response = self.call(
+            self.factory.get('/'), db.use_primary(self.reader)
+        )
+        self.assertEqual(response.content, b'default')
+
+    def test_write_views_are_pinned(self):
+        from posts import views
+
+        for view in (
+            views.post_create,
+            views.post_edit,
+            views.add_comment,
+            views.profile_follow,
+            views.profile_unfollow,
+        ):
+            self.assertTrue(getattr(view, 'uses_primary', False), view)
+
+
+def run_on_commit(func):
+    func()
+
+
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+class StaleReplicaTests(TestCase):
+    """Промахи кешей читаются из основной базы, а не с отстающей реплики.
+
+    Реплика - отдельный файл SQLite со снимком основной базы до правок.
+    """
+
+    alias = 'stale_replica'
+
+    def setUp(self):
+        from posts.models import Comment, Follow, Group, Post
+
+        cache.clear()
+        User = get_user_model()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            author=self.author, text='Старый пост', group=group
+        )
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Старый комментарий'
+        )
+        self.follow = Follow.objects.create(
+            user=self.reader, author=self.author
+        )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'replica.sqlite3')
+        connection.ensure_connection()
+        # снимок читается тем же соединением: оно видит данные теста
+        replica = sqlite3.connect(path)
+        replica.executescript(
+            '\n'.join(connection.connection.iterdump())
+        )
+        replica.close()
+        connections.databases[self.alias] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+        }
+        self.addCleanup(connections.databases.pop, self.alias)
+        self.addCleanup(lambda: connections[self.alias].close())
+
+    def stale_request(self):
+        """Запрос без закрепления: чтение уходит на реплику."""
+        self.addCleanup(db.end_request, db.begin_request(False, False))
+        replicas = override_settings(DATABASE_REPLICAS=[self.alias])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+
+    def test_cache_misses_read_primary(self):
+        from posts import fragments, graph, object_cache
+        from posts.models import Post
+
+        self.post.text = 'Новый пост'
+        self.post.save()
+        self.comment.text = 'Новый комментарий'
+        self.comment.save()
+        self.follow.delete()
+        self.stale_request()
+        # реплика действительно отстает
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).text, 'Старый пост'
+        )
+        post = object_cache.posts.get(pk=self.post.pk)
+        self.assertEqual(post.text, 'Новый пост')
+        self.assertFalse(graph.follows(self.reader.pk, self.author.pk))
+        page = fragments.render_comments(self.post.pk)
+        self.assertIn('Новый комментарий', page['html'])
+        [html] = fragments.render_posts(
+            Post.objects.feed().filter(pk=self.post.pk)
+        )
+        self.assertIn('Новый пост', html)
+        self.assertIn(
+            'Новый пост', fragments.render_posts([post])[0], 'из кеша'
+        )
+
+
+class SQLiteTuningTests(TestCase):
+    def test_tuned_connection_pragmas(self):
+        """В режиме SQLITE_TUNING новое соединение получает PRAGMA"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        wrapper = connections['default'].__class__(
+            dict(
+                connections['default'].settings_dict,
+                NAME=os.path.join(directory, 'db.sqlite3'),
+            ),
+            'tuning',
+        )
+        with override_settings(SQLITE_TUNING=True):
+            cursor = wrapper.cursor()
+        pragmas = {}
+        for name in sqlite.TUNED_PRAGMAS:
+            cursor.execute(f'PRAGMA {name}')
+            pragmas[name] = cursor.fetchone()[0]
+        wrapper.close()
+        self.assertEqual(
+            pragmas,
+            {
+                'journal_mode': 'wal',
+                'synchronous': 1,
+                'mmap_size': sqlite.TUNED_PRAGMAS['mmap_size'],
+                'cache_size': sqlite.TUNED_PRAGMAS['cache_size'],
+                'busy_timeout': sqlite.TUNED_PRAGMAS['busy_timeout'],
+            },
+        )
+
+    def test_write_queue_is_fifo(self):
+        """Очередь записи пропускает писателей по одному в порядке прихода"""
+        queue = sqlite.WriteQueue()
+        order = []
+        queue.acquire()
+        threads = []
+        for number in range(3):
+            thread = threading.Thread(
+                target=lambda number=number: (
+                    queue.acquire(),
+                    order.append(number),
+                    queue.release(),
+                )
+            )
+            thread.start()
+            threads.append(thread)
+            while len(queue) < number + 1:
+                time.sleep(0.001)
+        queue.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [0, 1, 2])
+
+    def test_write_queue_timeout(self):
+        """Не дождавшийся очереди писатель уходит из нее"""
+        queue = sqlite.WriteQueue()
+        queue.acquire()
+        with self.assertRaises(sqlite.WriteQueueTimeout):
+            queue.acquire(timeout=0.01)
+        self.assertEqual(len(queue), 0)
+        queue.release()
+        queue.acquire(timeout=0.01)
+
+    @override_settings(SQLITE_TUNING=True, SQLITE_WRITE_QUEUE_TIMEOUT=0.01)
+    def test_busy_queue_answers_503(self):
+        """Запись, не дождавшаяся очереди, получает 503 вместо ошибки"""
+        from posts.models import Post
+
+        user = get_user_model().objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='Пост')
+        self.client.force_login(user)
+        url = reverse('posts:add_comment', args=[post.pk])
+        sqlite.write_queue.acquire()
+        try:
+            response = self.client.post(url, {'text': 'Комментарий'})
+        finally:
+            sqlite.write_queue.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        response = self.client.post(url, {'text': 'Комментарий'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(post.comments.count(), 1)
+
+    @override_settings(SQLITE_TUNING=True, SQLITE_WRITE_QUEUE_TIMEOUT=0.01)
+    def test_post_form_is_validated_outside_queue(self):
+        """Форма поста проверяется, пока очередь занята другим писателем"""
+        from posts.forms import PostForm
+        from posts.models import Post
+
+        user = get_user_model().objects.create_user(username='writer')
+        self.client.force_login(user)
+        url = reverse('posts:create')
+        is_valid = PostForm.is_valid
+        sqlite.write_queue.acquire()
+        try:
+            with mock.patch.object(
+                PostForm, 'is_valid', autospec=True, side_effect=is_valid
+            ) as checked:
+                response = self.client.post(url, {'text': 'Пост'})
+        finally:
+            sqlite.write_queue.release()
+        checked.assert_called_once()
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Post.objects.exists())
+        response = self.client.post(url, {'text': 'Пост'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Post.objects.count(), 1)
+
+
+class ConnectionBudgetTests(SimpleTestCase):
+    postgresql = 'django.db.backends.postgresql'
+
+    def test_default_pool_fits_postgresql_limit(self):
+        self.assertEqual(
+            checks.connection_budget(
+                self.postgresql,
+                settings.ASGI_WORKERS,
+                settings.WEB_PROCESSES,
+                settings.DATABASE_CONNECTION_LIMIT,
+            ),
+            [],
+        )
+
+    def test_pools_over_limit(self):
+        [error] = checks.connection_budget(self.postgresql, 64, 2, 97)
+        self.assertEqual(error.id, 'core.E001')
+
+    def test_sqlite_has_no_limit(self):
+        self.assertEqual(
+            checks.connection_budget('django.db.backends.sqlite3', 64, 4, 97),
+            [],
+        )
+
+
+def asgi_request(method, path, query_string=b'', body=b'', headers=()):
+    """Выполняет HTTP-запрос через ASGI-приложение, возвращает сообщения."""
+    messages = [
+        {'type': 'http.request', 'body': body[:1], 'more_body': True},
+        {'type': 'http.request', 'body': body[1:]},
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [(b'host', b'testserver'), *headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+    application = asgi.get_asgi_application()
+    asyncio.run(application(scope, receive, send))
+    return sent
+
+
+class ASGIEnvironTests(SimpleTestCase):
+    def test_build_environ(self):
+        """Запрос ASGI переводится в WSGI environ"""
+        environ = asgi.build_environ(
+            {
+                'type': 'http',
+                'method': 'POST',
+                'path': '/create/',
+                'query_string': b'a=1',
+                'headers': [
+                    (b'content-type', b'text/plain'),
+                    (b'x-tag', b'a'),
+                    (b'x-tag', b'b'),
+                ],
+                'client': ('10.0.0.1', 5000),
+            },
+            b'body',
+        )
+        self.assertEqual(environ['REQUEST_METHOD'], 'POST')
+        self.assertEqual(environ['PATH_INFO'], '/create/')
+        self.assertEqual(environ['QUERY_STRING'], 'a=1')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_X_TAG'], 'a,b')
+        self.assertEqual(environ['REMOTE_ADDR'], '10.0.0.1')
+        self.assertEqual(environ['CONTENT_LENGTH'], '4')
+        self.assertEqual(environ['wsgi.input'].read(), b'body')
+
+
+class FeedViewTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='reader')
+
+    def test_feed_queries_use_request_connection(self):
+        """Вне транзакции страницы ленты читают базу соединением запроса"""
+        from posts.models import Group, Post
+
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(author=self.user, text='Пост', group=group)
+        self.client.force_login(self.user)
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        ):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertTrue(
+                any('"posts_post"' in query['sql'] for query in queries), url
+            )
+
+    def test_feed_pages_through_asgi(self):
+        """Страницы ленты отвечают через ASGI"""
+        from posts.models import Post
+
+        post = Post.objects.create(author=self.user, text='Асинхронный пост')
+        for path in (
+            '/',
+            f'/profile/{self.user.username}/',
+            f'/posts/{post.pk}/',
+        ):
+            start, body = asgi_request('GET', path)
+            self.assertEqual(start['status'], 200, path)
+            self.assertIn('Асинхронный пост', body['body'].decode(), path)
+        start, _ = asgi_request('GET', '/posts/0/')
+        self.assertEqual(start['status'], 404)
+
+    def test_post_body_reaches_view(self):
+        """Тело запроса из нескольких сообщений доходит до представления"""
+        self.client.force_login(self.user)
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        # обработчик ASGI, в отличие от тестового клиента, проверяет CSRF
+        token = _get_new_csrf_token()
+        start, _ = asgi_request(
+            'POST',
+            '/create/',
+            body=urlencode(
+                {'text': 'Пост', 'csrfmiddlewaretoken': token}
+            ).encode(),
+            headers=[
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (
+                    b'cookie',
+                    f'sessionid={session}; csrftoken={token}'.encode(),
+                ),
+            ],
+        )
+        self.assertEqual(start['status'], 302)
+        self.assertEqual(self.user.posts.get().text, 'Пост')
+
+
+class CacheBackendContract:
+    """Общие проверки для всех общих бэкендов кеша."""
+
+    def test_get_set_delete(self):
+        self.cache.set('ключ', {'a': 1})
+        self.assertEqual(self.cache.get('ключ'), {'a': 1})
+        self.cache.delete('ключ')
+        self.assertIsNone(self.cache.get('ключ'))
+        self.assertEqual(self.cache.get('ключ', 'default'), 'default')
+
+    def test_get_many_and_set_many(self):
+        self.cache.set_many({'a': 1, 'b': 'два', 'c': [3]})
+        self.assertEqual(
+            self.cache.get_many(['a', 'c', 'missing']), {'a': 1, 'c': [3]}
+        )
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': [3]})
+
+    def test_add_incr_and_clear(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('counter'))
+
+    def test_timeouts(self):
+        self.cache.set('forever', 1, None)
+        self.cache.set('expired', 1, 1)
+        self.cache.set('never', 1, 0)
+        time.sleep(1.1)
+        self.assertEqual(
+            self.cache.get_many(['forever', 'expired', 'never']),
+            {'forever': 1},
+        )
+
+
+class SQLiteCacheTests(CacheBackendContract, SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'), {}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_processes_share_one_file(self):
+        """Второй экземпляр (другой воркер) видит записи первого"""
+        other = SQLiteCache(self.cache._path, {})
+        self.cache.set('shared', 'value')
+        self.assertEqual(other.get('shared'), 'value')
+        other.delete('shared')
+        self.assertIsNone(self.cache.get('shared'))
+
+
+class PooledMemcachedCacheTests(CacheBackendContract, SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StandInServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = PooledMemcachedCache(
+            self.server.location, {'OPTIONS': {'POOL_SIZE': 2}}
+        )
+        self.cache.clear()
+        self.server.storage.commands.clear()
+
+    def test_batches_are_single_round_trips(self):
+        """get_many - одна команда get, соединение берется из пула"""
+        self.cache.set_many({f'key{i}': i for i in range(20)})
+        self.assertEqual(
+            len(self.cache.get_many([f'key{i}' for i in range(20)])), 20
+        )
+        self.assertEqual(self.server.storage.commands['get'], 1)
+        [pool] = self.cache._pools
+        self.assertEqual(pool._idle.qsize(), 1)
+
+    def test_unavailable_server_is_a_miss(self):
+        """Недоступный или молчащий сервер: промах и пропуск записи"""
+        refused = socket.socket()
+        refused.bind(('127.0.0.1', 0))
+        silent = socket.socket()
+        silent.bind(('127.0.0.1', 0))
+        silent.listen()
+        locations = [
+            '%s:%s' % sock.getsockname() for sock in (refused, silent)
+        ]
+        refused.close()
+        try:
+            for location in locations:
+                broken = PooledMemcachedCache(
+                    location, {'OPTIONS': {'SOCKET_TIMEOUT': 0.1}}
+                )
+                with self.assertLogs(
+                    'core.cache_backends.memcached', 'WARNING'
+                ) as logs:
+                    self.assertEqual(broken.get('key', 'default'), 'default')
+                    self.assertEqual(broken.get_many(['a', 'b']), {})
+                    broken.set('key', 1)
+                    self.assertEqual(broken.set_many({'a': 1}), ['a'])
+                    self.assertFalse(broken.add('key', 1))
+                    broken.delete('key')
+                    with self.assertRaises(ValueError):
+                        broken.incr('key')
+                    broken.clear()
+                self.assertEqual(len(logs.output), 8)
+        finally:
+            silent.close()
+
+    def test_server_error_is_a_miss(self):
+        """Ответ-ошибка сервера: промах, соединение не возвращается в пул"""
+        self.cache.set('key', 1)
+        error = b'SERVER_ERROR out of memory\r\n'
+        [pool] = self.cache._pools
+        get = mock.patch.object(Handler, 'do_get', return_value=error)
+        incr = mock.patch.object(Handler, 'do_incr', return_value=error)
+        watch = self.assertLogs('core.cache_backends.memcached', 'WARNING')
+        with get, incr, watch as logs:
+            self.assertEqual(self.cache.get('key', 'default'), 'default')
+            self.assertEqual(pool._idle.qsize(), 0)
+            with self.assertRaises(ValueError):
+                self.cache.incr('key')
+            self.assertEqual(pool._idle.qsize(), 0)
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual(self.cache.get('key'), 1)
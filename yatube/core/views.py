@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import profiling
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +20,16 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profiling_stats(request):
+    """Гистограммы профилированных запросов этого процесса."""
+    return JsonResponse(
+        {
+            'sample_rate': settings.PROFILING_SAMPLE_RATE,
+            'window': profiling.histogram.window,
+            'views': profiling.histogram.snapshot(),
+        },
+        json_dumps_params={'ensure_ascii': False},
+    )
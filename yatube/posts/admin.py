@@ -1,22 +1,249 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.template.response import TemplateResponse
 
+from . import moderation
+from .consts import MODERATION_CHUNK_SIZE
+from .models import Comment
 from .models import Group
 from .models import Post
+from .paginators import EstimatedCountPaginator
+from .search import build_query, get_index
 
+# сколько лучших совпадений поиска показывать в админке
+ADMIN_SEARCH_LIMIT = 1000
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """Автокомплит, который берет подпись выбранного объекта из строки.
+
+    AutocompleteSelect читает выбранный объект отдельным запросом, то
+    есть в list_editable - по запросу на строку списка. Объект строки
+    уже загружен через list_select_related, его и показываем.
+    """
+
+    loaded = ()
+
+    def optgroups(self, name, value, attr=None):
+        selected = [choice for choice in value if choice]
+        objects = {str(obj.pk): obj for obj in self.loaded}
+        if not all(choice in objects for choice in selected):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for choice in selected:
+            options.append(
+                self.create_option(
+                    name,
+                    objects[choice].pk,
+                    self.choices.field.label_from_instance(objects[choice]),
+                    True,
+                    len(options),
+                )
+            )
+        return [(None, options, 0)]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список, который открывается быстро при любом размере таблицы.
+
+    Без COUNT(*) по всей таблице, связанные объекты - одним JOIN,
+    а вместо выпадающих списков со всеми объектами - автокомплит.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault(
+                'widget',
+                LoadedAutocompleteSelect(
+                    db_field.remote_field,
+                    self.admin_site,
+                    using=kwargs.get('using'),
+                ),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        form = super().get_changelist_form(request, **kwargs)
+        autocomplete_fields = self.get_autocomplete_fields(request)
+
+        class ChangeListForm(form):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                for name, field in self.fields.items():
+                    if name not in autocomplete_fields:
+                        continue
+                    # виджет обернут в RelatedFieldWidgetWrapper
+                    widget = getattr(field.widget, 'widget', field.widget)
+                    related = getattr(self.instance, name)
+                    widget.loaded = () if related is None else (related,)
+
+        return ChangeListForm
+
+
+class MoveForm(forms.Form):
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        widget=forms.TextInput,
+        label='Slug группы',
+        help_text='Пусто - посты останутся без группы.',
+    )
+
+
+class ModerationAdmin(LargeTableAdmin):
+    """Массовые действия через posts.moderation, кусками.
+
+    Стандартное удаление выбранных убрано: оно загружает в память все
+    объекты выборки вместе со связанными. В поиске '@username' - все
+    строки автора.
+    """
+
+    readonly_fields = ('hidden',)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term.startswith('@'):
+            username = search_term[1:].strip()
+            return queryset.filter(author__username=username), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def confirm(self, request, queryset, title, form=None):
+        """Страница подтверждения или None, если действие подтверждено."""
+        if 'confirm' in request.POST and (form is None or form.is_valid()):
+            return None
+        context = {
+            **self.admin_site.each_context(request),
+            'title': title,
+            'opts': self.model._meta,
+            'count': queryset.count(),
+            'chunk_size': MODERATION_CHUNK_SIZE,
+            'form': form,
+            # у списка бывает по форме действий сверху и снизу
+            'action': request.POST.getlist('action')[
+                int(request.POST.get('index', 0))
+            ],
+            'select_across': request.POST.get('select_across', '0'),
+            'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(
+            request, 'admin/posts/moderation_confirmation.html', context
+        )
+
+    def report(self, request, message, done):
+        self.message_user(request, f'{message}: {done}')
+
+
+class PostAdmin(ModerationAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'hidden')
+    list_select_related = ('author', 'group')
     list_editable = ('group',)
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    # фильтр по диапазонам pub_date идет по индексу (-pub_date, -id);
+    # date_hierarchy не используется: он выбирает DISTINCT по всем датам
+    list_filter = ('pub_date', 'hidden')
     empty_value_display = '-пусто-'
+    actions = ('delete_posts', 'hide_posts', 'unhide_posts', 'move_posts')
+
+    def get_search_results(self, request, queryset, search_term):
+        # полнотекстовый индекс вместо LIKE '%...%' по всей таблице
+        if not search_term or search_term.startswith('@'):
+            return super().get_search_results(request, queryset, search_term)
+        post_ids = get_index().search(
+            build_query(search_term), 0, ADMIN_SEARCH_LIMIT
+        )
+        return queryset.filter(pk__in=post_ids), False
+
+    def delete_posts(self, request, queryset):
+        response = self.confirm(request, queryset, 'Удаление постов')
+        if response is None:
+            done = moderation.delete_posts(queryset)
+            self.report(request, 'Удалено постов', done)
+        return response
+
+    delete_posts.allowed_permissions = ('delete',)
+    delete_posts.short_description = 'Удалить с комментариями'
+
+    def hide_posts(self, request, queryset):
+        self.report(request, 'Скрыто постов', moderation.hide_posts(queryset))
+
+    hide_posts.allowed_permissions = ('change',)
+    hide_posts.short_description = 'Скрыть'
+
+    def unhide_posts(self, request, queryset):
+        done = moderation.hide_posts(queryset, hidden=False)
+        self.report(request, 'Возвращено постов', done)
+
+    unhide_posts.allowed_permissions = ('change',)
+    unhide_posts.short_description = 'Вернуть скрытые'
+
+    def move_posts(self, request, queryset):
+        form = MoveForm(request.POST if 'confirm' in request.POST else None)
+        response = self.confirm(request, queryset, 'Перенос постов', form)
+        if response is None:
+            group = form.cleaned_data['group']
+            done = moderation.move_posts(queryset, group)
+            self.report(request, 'Перенесено постов', done)
+        return response
+
+    move_posts.allowed_permissions = ('change',)
+    move_posts.short_description = 'Перенести в группу'
+
+
+class CommentAdmin(ModerationAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post', 'hidden')
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    search_fields = ('text',)
+    list_filter = ('created', 'hidden')
+    empty_value_display = '-пусто-'
+    actions = ('delete_comments', 'hide_comments', 'unhide_comments')
+
+    def delete_comments(self, request, queryset):
+        response = self.confirm(request, queryset, 'Удаление комментариев')
+        if response is None:
+            done = moderation.delete_comments(queryset)
+            self.report(request, 'Удалено комментариев', done)
+        return response
+
+    delete_comments.allowed_permissions = ('delete',)
+    delete_comments.short_description = 'Удалить'
+
+    def hide_comments(self, request, queryset):
+        done = moderation.hide_comments(queryset)
+        self.report(request, 'Скрыто комментариев', done)
+
+    hide_comments.allowed_permissions = ('change',)
+    hide_comments.short_description = 'Скрыть'
+
+    def unhide_comments(self, request, queryset):
+        done = moderation.hide_comments(queryset, hidden=False)
+        self.report(request, 'Возвращено комментариев', done)
+
+    unhide_comments.allowed_permissions = ('change',)
+    unhide_comments.short_description = 'Вернуть скрытые'
 
 
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(LargeTableAdmin):
     list_display = ('title', 'slug', 'description')
-    search_fields = ('description',)
+    # по этим полям ищет и автокомплит группы у поста
+    search_fields = ('title', 'slug', 'description')
     empty_value_display = '-пусто-'
 
 
+admin.site.register(Comment, CommentAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Post, PostAdmin)
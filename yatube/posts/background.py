@@ -0,0 +1,52 @@
+"""Пул потоков для фоновой обработки картинок постов."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+
+from .consts import BACKGROUND_WORKERS
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_in_flight = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                BACKGROUND_WORKERS, thread_name_prefix='posts-background'
+            )
+        return _executor
+
+
+def _run(key, func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась ошибкой', key)
+    finally:
+        with _lock:
+            _in_flight.discard(key)
+        close_old_connections()
+
+
+def _submit(key, func, args):
+    with _lock:
+        if key in _in_flight:
+            return
+        _in_flight.add(key)
+    _get_executor().submit(_run, key, func, args)
+
+
+def run_in_background(key, func, *args):
+    """Выполняет func(*args) в пуле после фиксации текущей транзакции.
+
+    Задача с тем же key, пока она в очереди, повторно не ставится.
+    """
+    transaction.on_commit(lambda: _submit(key, func, args))
@@ -0,0 +1,280 @@
+"""Замеры скорости страниц ленты и сравнение с базовыми результатами.
+
+Для каждой страницы (index, group_list, profile, post_detail,
+follow_index) и глубины листания измеряются p50 и p99 времени ответа,
+число запросов к базе и пик выделенной памяти. Результаты - словарь
+{'<страница>@<глубина>': {...}}, который сохраняется в JSON и
+сравнивается с базовым файлом.
+
+ConcurrencyBenchmark нагружает базу из нескольких процессов с
+несколькими потоками в каждом, как воркеры сервера: смесь чтения
+страницы поста и записи комментариев к нему. Считаются пропускная
+способность, p99 чтения и записи и ошибки.
+"""
+
+import itertools
+import math
+import multiprocessing
+import random
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection, connections, reset_queries
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .consts import BENCHMARK_TOLERANCE
+from .models import Follow, Group, Post, User, UserStats
+
+METRICS = ('p50_ms', 'p99_ms', 'queries', 'peak_kb')
+# отдельный кеш на время замеров: cache.clear() при --cold и данные
+# временной базы не должны попадать в рабочий кеш
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+}
+# эти метрики сравниваются с допуском, остальные - точно
+NOISY_METRICS = ('p50_ms', 'p99_ms', 'peak_kb')
+
+
+def percentile(values, percent):
+    """Процентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def compare(results, baseline, tolerance=BENCHMARK_TOLERANCE):
+    """Список описаний регрессий результатов относительно базовых."""
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in METRICS:
+            if metric not in base:
+                continue
+            limit = base[metric]
+            if metric in NOISY_METRICS:
+                limit *= 1 + tolerance
+            if metrics[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {metrics[metric]} > {base[metric]}'
+                )
+    return regressions
+
+
+class Benchmark:
+    def __init__(self, depths, iterations, cold=False):
+        self.depths = depths
+        self.iterations = iterations
+        self.cold = cold
+        self.anonymous = Client()
+        self.reader = Client()
+
+    def targets(self):
+        """Самые тяжелые группа, автор, пост и читатель в базе."""
+        group = (
+            Group.objects.annotate(total=Count('posts'))
+            .order_by('-total')
+            .first()
+        )
+        stats = UserStats.objects.select_related('user').order_by(
+            '-posts_count'
+        )
+        post = Post.objects.order_by('-comments_count').first()
+        reader = (
+            Follow.objects.values('user')
+            .annotate(total=Count('id'))
+            .order_by('-total')
+            .first()
+        )
+        if None in (group, post, reader) or not stats.exists():
+            raise ValueError('В базе нет данных для замеров')
+        self.reader.force_login(
+            Follow.objects.filter(user=reader['user']).first().user
+        )
+        return {
+            'index': (self.anonymous, reverse('posts:index')),
+            'group_list': (
+                self.anonymous,
+                reverse('posts:group_list', args=[group.slug]),
+            ),
+            'profile': (
+                self.anonymous,
+                reverse('posts:profile', args=[stats.first().user.username]),
+            ),
+            'post_detail': (
+                self.anonymous,
+                reverse('posts:post_detail', args=[post.pk]),
+            ),
+            'follow_index': (self.reader, reverse('posts:follow_index')),
+        }
+
+    def page_url(self, client, name, url, depth):
+        """Адрес страницы на глубине depth или None, если ее нет."""
+        if name == 'post_detail':
+            page_url = url
+            for _ in range(depth - 1):
+                page = client.get(page_url).context['comments']
+                if page['next_cursor'] is None:
+                    return None
+                page_url = f'{url}?comments_cursor={page["next_cursor"]}'
+            return page_url
+        page_url = url
+        for _ in range(depth - 1):
+            page = client.get(page_url).context['page_obj']
+            if not page.has_next():
+                return None
+            page_url = f'{url}?cursor={page.next_cursor}'
+        return page_url
+
+    def request(self, client, url):
+        if self.cold:
+            cache.clear()
+        response = client.get(url)
+        if response.status_code != 200:
+            raise ValueError(f'{url}: ответ {response.status_code}')
+
+    def measure(self, client, url):
+        self.request(client, url)
+        timings = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            self.request(client, url)
+            timings.append((time.perf_counter() - start) * 1000)
+        # журнал запросов ограничен по длине и может быть уже заполнен
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            self.request(client, url)
+        # следующий запрос очистит журнал, поэтому считаем сразу
+        query_count = len(queries)
+        # отдельный проход: tracemalloc замедляет код
+        tracemalloc.start()
+        try:
+            self.request(client, url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': query_count,
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def run(self):
+        results = {}
+        for name, (client, url) in self.targets().items():
+            for depth in self.depths:
+                page_url = self.page_url(client, name, url, depth)
+                if page_url is not None:
+                    results[f'{name}@{depth}'] = self.measure(client, page_url)
+        return results
+
+
+def write_load(task):
+    """Поток нагрузки: чтение страницы поста и запись комментариев к ней."""
+    number, user_id, post_id, requests, write_ratio, seed = task
+    client = Client()
+    client.force_login(User.objects.get(pk=user_id))
+    detail_url = reverse('posts:post_detail', args=[post_id])
+    comment_url = reverse('posts:add_comment', args=[post_id])
+    generator = random.Random(seed + number)
+    results = []
+    try:
+        for step in range(requests):
+            write = generator.random() < write_ratio
+            start = time.perf_counter()
+            try:
+                if write:
+                    response = client.post(
+                        comment_url, {'text': f'Нагрузка {number}.{step}'}
+                    )
+                else:
+                    response = client.get(detail_url)
+                ok = response.status_code in (200, 302)
+            except DatabaseError:
+                ok = False
+            results.append((write, ok, start, time.perf_counter()))
+    finally:
+        connections.close_all()
+    return results
+
+
+def write_load_process(tasks):
+    """Процесс нагрузки, как воркер сервера: несколько потоков."""
+    with ThreadPoolExecutor(len(tasks)) as pool:
+        return list(itertools.chain.from_iterable(pool.map(write_load, tasks)))
+
+
+class ConcurrencyBenchmark:
+    def __init__(self, processes, threads, requests, write_ratio, seed=1):
+        self.processes = processes
+        self.threads = threads
+        self.requests = requests
+        self.write_ratio = write_ratio
+        self.seed = seed
+
+    def tasks(self):
+        post = Post.objects.order_by('-comments_count').first()
+        total = self.processes * self.threads
+        user_ids = list(
+            User.objects.order_by('pk').values_list('pk', flat=True)[:total]
+        )
+        if post is None or len(user_ids) < total:
+            raise ValueError('В базе нет данных для замеров')
+        tasks = [
+            (
+                number,
+                user_id,
+                post.pk,
+                self.requests,
+                self.write_ratio,
+                self.seed,
+            )
+            for number, user_id in enumerate(user_ids)
+        ]
+        return [
+            tasks[start:start + self.threads]
+            for start in range(0, total, self.threads)
+        ]
+
+    def run(self):
+        tasks = self.tasks()
+        # соединения с базой нельзя делить между процессами
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(self.processes, mp_context=context) as pool:
+            results = list(
+                itertools.chain.from_iterable(
+                    pool.map(write_load_process, tasks)
+                )
+            )
+        return self.summary(results)
+
+    def summary(self, results):
+        elapsed = max(end for *_, end in results) - min(
+            start for _, _, start, _ in results
+        )
+        summary = {
+            'rps': round(len(results) / elapsed, 1),
+            'errors': sum(not ok for _, ok, _, _ in results),
+        }
+        for kind, write in (('read', False), ('write', True)):
+            timings = [
+                (end - start) * 1000
+                for is_write, _, start, end in results
+                if is_write == write
+            ]
+            summary[f'{kind}s'] = len(timings)
+            summary[f'{kind}_p99_ms'] = (
+                round(percentile(timings, 99), 3) if timings else None
+            )
+        return summary
@@ -0,0 +1,109 @@
+"""Счетчики ссылок постов на файлы картинок.
+
+Файл из ContentAddressedStorage может принадлежать нескольким постам.
+Он удаляется вместе с вариантами и миниатюрами, только когда на него не
+остается ни одной ссылки.
+
+Удаление идет после фиксации и под блокировкой хранилища. К этому
+времени тот же файл мог снова загрузить другой пост, поэтому файл не
+удаляется, если на него опять есть ссылка или его пересохранили после
+освобождения (изменилась версия файла в хранилище).
+"""
+
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import default as thumbnail_default
+from sorl.thumbnail.images import ImageFile
+
+from . import images
+from .background import run_in_background
+from .models import Blob, Post
+
+logger = logging.getLogger(__name__)
+
+
+def _storage():
+    return Post._meta.get_field('image').storage
+
+
+def acquire(name):
+    """Добавляет ссылку на файл."""
+    Blob.objects.get_or_create(name=name)
+    Blob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """Убирает ссылку на файл и удаляет его, если ссылок не осталось."""
+    Blob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1
+    )
+    deleted, _ = Blob.objects.filter(name=name, refcount=0).delete()
+    if deleted:
+        version = _storage().version(name)
+        transaction.on_commit(lambda: delete_files(name, version))
+
+
+def release_many(names):
+    """Убирает по ссылке на каждое имя из names (с повторами).
+
+    Один UPDATE на каждое имя, а файлы и миниатюры освободившихся
+    картинок удаляются одной фоновой задачей после фиксации.
+    """
+    for name, count in Counter(names).items():
+        Blob.objects.filter(name=name, refcount__gte=count).update(
+            refcount=F('refcount') - count
+        )
+    unused = list(
+        Blob.objects.filter(name__in=set(names), refcount=0).values_list(
+            'name', flat=True
+        )
+    )
+    if unused:
+        Blob.objects.filter(name__in=unused).delete()
+        storage = _storage()
+        run_in_background(
+            ('delete_files', *unused),
+            delete_many,
+            {name: storage.version(name) for name in unused},
+        )
+
+
+def delete_many(versions):
+    for name, version in versions.items():
+        delete_files(name, version)
+
+
+def delete_files(name, version):
+    """Удаляет файл картинки, ее варианты и миниатюры.
+
+    version - версия файла в хранилище на момент освобождения.
+    """
+    storage = _storage()
+    try:
+        with storage.lock():
+            if Blob.objects.filter(name=name).exists():
+                return
+            # файл пересохранили после освобождения: ссылка на него
+            # появится, когда зафиксируется новый пост
+            if storage.version(name) != version:
+                return
+            thumbnail_default.kvstore.delete(ImageFile(name, storage))
+            images.delete_variants(name)
+            storage.delete(name)
+    except OSError:
+        logger.exception('Не удалось удалить файл %s', name)
+
+
+def recount():
+    """Пересчитывает ссылки на файлы по данным в базе."""
+    Blob.objects.all().delete()
+    Blob.objects.bulk_create(
+        Blob(name=row['image'], refcount=row['total'])
+        for row in Post.objects.exclude(image='')
+        .order_by()
+        .values('image')
+        .annotate(total=Count('id'))
+    )
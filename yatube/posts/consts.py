@@ -1,2 +1,51 @@
 # my config for the project
 POSTS_NUMBERS = 10
+COMMENTS_NUMBERS = 50
+# авторы с таким числом подписчиков не рассылаются по лентам при записи,
+# их посты подмешиваются в ленту при чтении
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BATCH_SIZE = 500
+# массовая модерация: строк в одной транзакции
+MODERATION_CHUNK_SIZE = 500
+# отложенная запись: операций в одной транзакции и сколько секунд
+# очередь набирает пачку
+WRITE_BEHIND_BATCH_SIZE = 500
+WRITE_BEHIND_INTERVAL = 0.05
+# админка считает строки точно только до этого числа, дальше - оценка
+ADMIN_EXACT_COUNT_LIMIT = 10000
+OBJECT_CACHE_TIMEOUT = 60 * 60
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+GRAPH_CACHE_TIMEOUT = 60 * 60
+# id подписок в одной записи кеша графа: по 4 байта на id, а memcached
+# не хранит значения больше 1 МБ
+GRAPH_CHUNK_IDS = 200000
+# картинки постов обрабатываются в фоне этим числом потоков
+BACKGROUND_WORKERS = 2
+# пропорции картинки в ленте и ширины ее адаптивных вариантов
+IMAGE_ASPECT = (960, 339)
+IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1920)
+# загрузка картинок: файлы пишутся на диск кусками, оригиналы больше
+# IMAGE_MAX_SIDE уменьшаются один раз при сохранении
+UPLOAD_CHUNK_SIZE = 64 * 1024
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_MAX_SIDE = 2560
+# поиск: не больше стольких слов в запросе; найденные посты считаются
+# не дальше SEARCH_COUNT_LIMIT, больше показывается как «больше N»
+SEARCH_MAX_TERMS = 10
+SEARCH_COUNT_LIMIT = 1000
+SEARCH_BATCH_SIZE = 1000
+# генератор тестовых данных: сколько авторов/постов в одной задаче
+LOADGEN_CHUNK_SIZE = 1000
+LOADGEN_BATCH_SIZE = 1000
+# замеры скорости: во сколько раз (1 + допуск) можно медленнее базовых
+BENCHMARK_ITERATIONS = 50
+BENCHMARK_DEPTHS = (1, 10, 50)
+BENCHMARK_TOLERANCE = 0.25
+# поток новых постов (SSE): длина очереди подписчика, интервал пустых
+# сообщений и время жизни соединения, с; пауза переподключения, мс
+SSE_QUEUE_SIZE = 100
+SSE_HEARTBEAT = 15
+SSE_MAX_AGE = 5 * 60
+SSE_RETRY = 5000
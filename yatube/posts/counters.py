@@ -0,0 +1,145 @@
+"""Денормализованные счетчики пользователя и комментариев поста.
+
+Счетчики меняются атомарным UPDATE ... SET n = n + 1, без чтения строки.
+recount() пересчитывает их целиком, например после bulk_create, а
+recount_posts(), recount_authors() и recount_follows() - только у
+перечисленных, например после массовой модерации или пачки подписок.
+Скрытые посты и комментарии не считаются.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from . import object_cache
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _stats(user_id):
+    """Все счетчики пользователя по данным в базе."""
+    return {
+        'posts_count': Post.objects.visible()
+        .filter(author_id=user_id)
+        .count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def _change_stats(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+    elif not stats.update(**{field: F(field) + delta}):
+        UserStats.objects.get_or_create(
+            user_id=user_id, defaults=_stats(user_id)
+        )
+    object_cache.authors.invalidate(user_id)
+
+
+def change_posts_count(user_id, delta):
+    _change_stats(user_id, 'posts_count', delta)
+
+
+def change_follow_counts(user_id, author_id, delta):
+    """Подписка (delta=1) или отписка (delta=-1) user_id от author_id."""
+    _change_stats(user_id, 'following_count', delta)
+    _change_stats(author_id, 'followers_count', delta)
+
+
+def change_comments_count(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+    object_cache.posts.invalidate(post_id)
+
+
+def _comments_count():
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk'), hidden=False)
+        .order_by()
+        .values('post')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(comments), Value(0))
+
+
+def recount_posts(post_ids):
+    """Пересчитывает число комментариев перечисленных постов."""
+    Post.objects.filter(pk__in=post_ids).update(
+        comments_count=_comments_count()
+    )
+    object_cache.posts.invalidate_many(post_ids)
+
+
+def _posts_count():
+    posts = (
+        Post.objects.visible()
+        .filter(author=OuterRef('user'))
+        .order_by()
+        .values('author')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(posts), Value(0))
+
+
+def _follow_counts():
+    counts = {}
+    for name, field in (
+        ('followers_count', 'author'),
+        ('following_count', 'user'),
+    ):
+        follows = (
+            Follow.objects.filter(**{field: OuterRef('user')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        counts[name] = Coalesce(Subquery(follows), Value(0))
+    return counts
+
+
+def recount_authors(user_ids):
+    """Пересчитывает число постов перечисленных авторов."""
+    UserStats.objects.filter(user__in=user_ids).update(
+        posts_count=_posts_count()
+    )
+    object_cache.authors.invalidate_many(user_ids)
+
+
+def recount_follows(user_ids):
+    """Пересчитывает подписчиков и подписки перечисленных пользователей.
+
+    Недостающие строки счетчиков создаются сразу со всеми счетчиками.
+    """
+    user_ids = set(user_ids)
+    existing = set(
+        UserStats.objects.filter(user__in=user_ids).values_list(
+            'user', flat=True
+        )
+    )
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id, **_stats(user_id))
+            for user_id in user_ids - existing
+        ],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.filter(user__in=existing).update(**_follow_counts())
+    object_cache.authors.invalidate_many(user_ids)
+
+
+def recount():
+    """Пересчитывает все счетчики по данным в базе."""
+    Post.objects.update(comments_count=_comments_count())
+    UserStats.objects.all().delete()
+    UserStats.objects.bulk_create(
+        UserStats(user_id=user_id)
+        for user_id in User.objects.values_list('pk', flat=True).iterator()
+    )
+    UserStats.objects.update(posts_count=_posts_count(), **_follow_counts())
+    object_cache.invalidate_all()
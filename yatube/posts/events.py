@@ -0,0 +1,189 @@
+"""Новые посты в реальном времени: pub/sub процесса и поток SSE.
+
+После фиксации нового поста его id публикуется в каналы 'index' и
+'author:<id>'. Подписчик - открытый поток /events/ (лента index) или
+/follow/events/ (лента подписок: каналы авторов, на которых подписан
+читатель в момент подключения).
+
+У каждого подписчика своя очередь не длиннее SSE_QUEUE_SIZE событий:
+если клиент не успевает их забирать, старые события отбрасываются, а
+клиент получает событие overflow и перечитывает страницу целиком.
+
+Pub/sub живет в памяти процесса: подписчики получают посты, созданные
+в том же процессе сервера. Потоки включает settings.LIVE_UPDATES,
+только для запуска через ASGI: под WSGI открытый поток держал бы
+воркер до SSE_MAX_AGE секунд.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
+
+from .consts import SSE_HEARTBEAT, SSE_MAX_AGE, SSE_QUEUE_SIZE, SSE_RETRY
+
+INDEX_CHANNEL = 'index'
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+class Subscriber:
+    def __init__(self, channels, size=SSE_QUEUE_SIZE):
+        self.channels = frozenset(channels)
+        self.events = deque(maxlen=size)
+        # сколько событий отброшено с прошлого чтения
+        self.dropped = 0
+        self._condition = threading.Condition()
+        self._waker = None
+
+    def put(self, event):
+        with self._condition:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append(event)
+            self._condition.notify()
+            waker = self._waker
+        if waker is not None:
+            loop, ready = waker
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                # цикл событий уже закрыт
+                pass
+
+    def _take(self):
+        events = list(self.events)
+        self.events.clear()
+        dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+    def wait(self, timeout):
+        """События и число отброшенных; ждет не дольше timeout."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.events or self.dropped, timeout
+            )
+            return self._take()
+
+    async def wait_async(self, timeout):
+        """То же, что wait, но не занимая поток."""
+        ready = asyncio.Event()
+        with self._condition:
+            if self.events or self.dropped:
+                return self._take()
+            self._waker = (asyncio.get_running_loop(), ready)
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._waker = None
+        with self._condition:
+            return self._take()
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self, channels, size=SSE_QUEUE_SIZE):
+        subscriber = Subscriber(channels, size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, channels, event):
+        """Отдает событие каждому подписчику одного из каналов один раз."""
+        channels = set(channels)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if not subscriber.channels.isdisjoint(channels):
+                subscriber.put(event)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+broker = Broker()
+
+
+def publish_post(post):
+    """Публикует пост после фиксации транзакции, в которой он создан."""
+    event = {'id': post.pk, 'author': post.author_id}
+    channels = (INDEX_CHANNEL, author_channel(post.author_id))
+    transaction.on_commit(lambda: broker.publish(channels, event))
+
+
+def format_event(name, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {name}')
+    lines.append(f'data: {json.dumps(data)}')
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+def format_batch(events, dropped):
+    if dropped:
+        return format_event('overflow', {'dropped': dropped})
+    return b''.join(
+        format_event('post', event, event['id']) for event in events
+    )
+
+
+HEARTBEAT = b': ping\n\n'
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """Поток SSE подписчика; закрывается через SSE_MAX_AGE секунд.
+
+    Обычный обработчик WSGI читает поток в своем потоке выполнения,
+    а core.asgi.ASGIHandler - через async_stream(), не занимая потока.
+    """
+
+    def __init__(self, channels, max_age=SSE_MAX_AGE):
+        self.subscriber = broker.subscribe(channels)
+        self.max_age = max_age
+        super().__init__(self._stream(), content_type='text/event-stream')
+        self['Cache-Control'] = 'no-cache'
+        # отключает буферизацию ответа в nginx
+        self['X-Accel-Buffering'] = 'no'
+
+    def _stream(self):
+        try:
+            yield f'retry: {SSE_RETRY}\n\n'.encode()
+            deadline = time.monotonic() + self.max_age
+            while time.monotonic() < deadline:
+                events, dropped = self.subscriber.wait(SSE_HEARTBEAT)
+                yield format_batch(events, dropped) or HEARTBEAT
+        finally:
+            broker.unsubscribe(self.subscriber)
+
+    async def async_stream(self):
+        try:
+            yield f'retry: {SSE_RETRY}\n\n'.encode()
+            deadline = time.monotonic() + self.max_age
+            while time.monotonic() < deadline:
+                events, dropped = await self.subscriber.wait_async(
+                    SSE_HEARTBEAT
+                )
+                yield format_batch(events, dropped) or HEARTBEAT
+        finally:
+            broker.unsubscribe(self.subscriber)
+
+    def close(self):
+        broker.unsubscribe(self.subscriber)
+        super().close()
@@ -1,12 +1,14 @@
 from django import forms
 
 from .models import Post, Comment
+from .uploads import NormalizedImageField
 
 
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': NormalizedImageField}
         labels = {'text': 'Текст', 'group': 'Группа'}
         help_texts = {
             'text': 'Добавьте новую запись',
@@ -0,0 +1,152 @@
+"""Кеш отрисованных постов (includes/posts_rendering.html).
+
+Фрагмент поста не зависит от читателя, поэтому один и тот же фрагмент
+отдается и гостям, и авторизованным пользователям. В ключ фрагмента
+входят поколения поста, его автора и группы: правка любого из них
+меняет поколение, и пост отрисовывается заново.
+
+Страницы комментариев кешируются так же: в ключ входит поколение
+комментариев поста ('comments'), которое меняется при добавлении,
+правке и удалении комментария, а вместе со страницей хранятся
+поколения авторов комментариев на момент отрисовки.
+
+Все, что попадает в кеш, читается из основной базы: строка с отстающей
+реплики легла бы под новое поколение и пережила бы инвалидацию.
+"""
+
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .consts import FRAGMENT_CACHE_TIMEOUT
+from .models import Post
+from .paginators import InvalidCursor, decode_cursor, paginate_comments
+
+TEMPLATE = 'includes/posts_rendering.html'
+COMMENTS_TEMPLATE = 'posts/includes/comment_list.html'
+
+
+def _generation_key(kind, pk):
+    return f'fragment:{kind}:{pk}:generation'
+
+
+def bump(kind, pk):
+    """Меняет поколение поста ('post'), автора ('author'), группы
+    ('group') или комментариев поста ('comments')."""
+    cache.set(_generation_key(kind, pk), uuid4().hex, None)
+
+
+def bump_many(kind, pks):
+    cache.set_many(
+        {_generation_key(kind, pk): uuid4().hex for pk in pks}, None
+    )
+
+
+def _generations(keys):
+    """Поколения по ключам; отсутствующие создаются."""
+    generations = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in generations}
+    if missing:
+        cache.set_many(missing, None)
+        generations.update(missing)
+    return generations
+
+
+def _sources(post):
+    return (
+        ('post', post.pk),
+        ('author', post.author_id),
+        ('group', post.group_id),
+    )
+
+
+def render_posts(posts, show_group_link=False):
+    """Возвращает HTML постов страницы в том же порядке.
+
+    Поколения и готовые фрагменты читаются двумя пакетными запросами
+    к кешу, отрисовываются только отсутствующие фрагменты.
+    """
+    posts = list(posts)
+    generations = _generations(
+        {
+            _generation_key(kind, pk)
+            for post in posts
+            for kind, pk in _sources(post)
+        }
+    )
+
+    fragment_keys = [
+        ':'.join(
+            [f'fragment:post:{post.pk}:{int(bool(show_group_link))}']
+            + [
+                generations[_generation_key(kind, pk)]
+                for kind, pk in _sources(post)
+            ]
+        )
+        for post in posts
+    ]
+    fragments = cache.get_many(fragment_keys)
+    missing = {
+        post.pk: key
+        for post, key in zip(posts, fragment_keys)
+        if key not in fragments
+    }
+    # страница могла прийти с реплики, в кеш кладется пост из основной
+    primary = Post.objects.db_manager('default').feed().in_bulk(list(missing))
+    rendered = {}
+    for post in posts:
+        if post.pk not in missing:
+            continue
+        html = render_to_string(
+            TEMPLATE,
+            {
+                'post': primary.get(post.pk, post),
+                'show_group_link': show_group_link,
+            },
+        )
+        if post.pk in primary:
+            rendered[missing[post.pk]] = html
+        else:
+            # поста уже нет в ленте: отдаем как есть, но не кешируем
+            fragments[missing[post.pk]] = html
+    if rendered:
+        cache.set_many(rendered, FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(rendered)
+    return [fragments[key] for key in fragment_keys]
+
+
+def render_comments(post_id, cursor=None):
+    """Страница комментариев поста: HTML, курсор следующей и размер.
+
+    Готовая страница не читает базу; она отрисовывается заново, если
+    сменилось поколение комментариев поста или одного из авторов.
+    """
+    try:
+        decode_cursor(cursor or '')
+    except InvalidCursor:
+        # в ключ кеша попадают только корректные курсоры
+        cursor = None
+    generation = _generations({_generation_key('comments', post_id)})
+    key = ':'.join(
+        (f'fragment:comments:{post_id}', cursor or '', *generation.values())
+    )
+    page = cache.get(key)
+    if page is not None and _generations(page['authors']) == page['authors']:
+        return page
+    comments = paginate_comments(post_id, cursor)
+    page = {
+        'html': render_to_string(
+            COMMENTS_TEMPLATE, {'comment_page': comments}
+        ),
+        'next_cursor': comments.next_cursor,
+        'count': len(comments),
+        'authors': _generations(
+            {
+                _generation_key('author', comment.author_id)
+                for comment in comments
+            }
+        ),
+    }
+    cache.set(key, page, FRAGMENT_CACHE_TIMEOUT)
+    return page
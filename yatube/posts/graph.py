@@ -0,0 +1,174 @@
+"""Кеш графа подписок.
+
+Для каждого пользователя в кеше лежат два отсортированных массива id
+(array('i') в байтах, по 4 байта на подписку): авторы, на которых он
+подписан, и его подписчики. Вопросы «подписан ли A на B» и «взаимна ли
+подписка» решаются двоичным поиском по массиву, без запросов к базе;
+база читается, только когда массива в кеше нет.
+
+Массив хранится под ключом с версией, как в object_cache: подписка и
+отписка меняют версии обоих участников после коммита, поэтому массив,
+прочитанный из базы до правки, после правки уже не будет прочитан.
+Длинный массив делится на части по GRAPH_CHUNK_IDS id: первая лежит под
+ключом массива вместе с числом частей, остальные - под ключами с
+номером части.
+"""
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .consts import GRAPH_CACHE_TIMEOUT, GRAPH_CHUNK_IDS
+from .models import Follow
+
+KEY_PREFIX = 'graph'
+# общая версия графа, меняется при массовых правках
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+# направление: (поле пользователя, поле соседей) в Follow
+FIELDS = {FOLLOWING: ('user', 'author'), FOLLOWERS: ('author', 'user')}
+
+
+def _new_version():
+    return uuid4().hex
+
+
+def _version_key(direction, user_id):
+    return f'{KEY_PREFIX}:{direction}:{user_id}:version'
+
+
+def _chunk_key(key, number):
+    return key if number == 0 else f'{key}:{number}'
+
+
+def _chunks(ids):
+    """Массив, разбитый на части для записи в кеш."""
+    return [
+        ids[start:start + GRAPH_CHUNK_IDS].tobytes()
+        for start in range(0, len(ids) or 1, GRAPH_CHUNK_IDS)
+    ]
+
+
+def _load(direction, user_ids):
+    """Отсортированные массивы соседей пользователей по направлению."""
+    version_keys = {
+        user_id: _version_key(direction, user_id) for user_id in user_ids
+    }
+    versions = cache.get_many([GENERATION_KEY, *version_keys.values()])
+    missing = {
+        key: _new_version()
+        for key in (GENERATION_KEY, *version_keys.values())
+        if key not in versions
+    }
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    keys = {
+        user_id: ':'.join(
+            (
+                f'{KEY_PREFIX}:{direction}:{user_id}',
+                versions[GENERATION_KEY],
+                versions[key],
+            )
+        )
+        for user_id, key in version_keys.items()
+    }
+    cached = cache.get_many(keys.values())
+    tails = cache.get_many(
+        [
+            _chunk_key(key, number)
+            for key, (count, _) in cached.items()
+            for number in range(1, count)
+        ]
+    )
+    result = {}
+    for user_id, key in keys.items():
+        if key not in cached:
+            continue
+        count, head = cached[key]
+        chunks = [head]
+        chunks.extend(tails.get(_chunk_key(key, n)) for n in range(1, count))
+        # часть вытеснена из кеша: массив читается из базы заново
+        if None not in chunks:
+            result[user_id] = array('i')
+            result[user_id].frombytes(b''.join(chunks))
+    absent = [user_id for user_id in keys if user_id not in result]
+    if absent:
+        field, other = FIELDS[direction]
+        neighbours = defaultdict(list)
+        for user_id, other_id in (
+            # реплика может отставать, а массив ляжет под новую версию
+            Follow.objects.using('default')
+            .filter(**{f'{field}__in': absent})
+            .order_by(other)
+            .values_list(field, other)
+            .iterator()
+        ):
+            neighbours[user_id].append(other_id)
+        loaded = {
+            user_id: array('i', neighbours[user_id]) for user_id in absent
+        }
+        values = {}
+        for user_id, ids in loaded.items():
+            chunks = _chunks(ids)
+            values[keys[user_id]] = (len(chunks), chunks[0])
+            for number, chunk in enumerate(chunks[1:], 1):
+                values[_chunk_key(keys[user_id], number)] = chunk
+        cache.set_many(values, GRAPH_CACHE_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def following(user_id):
+    """Отсортированный массив id авторов, на которых подписан user_id."""
+    return _load(FOLLOWING, [user_id])[user_id]
+
+
+def followers(user_id):
+    """Отсортированный массив id подписчиков user_id."""
+    return _load(FOLLOWERS, [user_id])[user_id]
+
+
+def follows(user_id, author_id):
+    """Подписан ли user_id на author_id."""
+    return _contains(following(user_id), author_id)
+
+
+def is_mutual(user_id, other_id):
+    """Подписаны ли пользователи друг на друга."""
+    return follows(user_id, other_id) and follows(other_id, user_id)
+
+
+def mutuals(user_id):
+    """Отсортированный список id взаимных подписок user_id.
+
+    Каждый id меньшего массива ищется двоичным поиском в большем.
+    """
+    smaller, larger = sorted((following(user_id), followers(user_id)), key=len)
+    return [other for other in smaller if _contains(larger, other)]
+
+
+def invalidate(user_id, author_id):
+    """Сбрасывает кеш после подписки или отписки user_id от author_id."""
+    invalidate_many([(user_id, author_id)])
+
+
+def invalidate_many(pairs):
+    keys = set()
+    for user_id, author_id in pairs:
+        keys.add(_version_key(FOLLOWING, user_id))
+        keys.add(_version_key(FOLLOWERS, author_id))
+    cache.set_many({key: _new_version() for key in keys}, None)
+
+
+def invalidate_all():
+    """Сбрасывает весь граф разом, например после bulk_create подписок."""
+    cache.set(GENERATION_KEY, _new_version(), None)
@@ -0,0 +1,148 @@
+"""Адаптивные варианты картинки поста: несколько ширин и форматов.
+
+Варианты создаются в фоне после сохранения поста, их описание хранится
+в Post.image_variants (JSON), а тег {% post_picture %} выводит из него
+<picture> с srcset. Пока вариантов нет, выводится исходная картинка.
+"""
+
+import io
+import json
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import fragments, object_cache
+from .background import run_in_background
+from .consts import IMAGE_ASPECT, IMAGE_VARIANT_WIDTHS
+
+logger = logging.getLogger(__name__)
+
+# (формат Pillow, MIME-тип, расширение) от самого компактного к запасному
+FORMATS = (
+    ('AVIF', 'image/avif', 'avif'),
+    ('WEBP', 'image/webp', 'webp'),
+    ('JPEG', 'image/jpeg', 'jpg'),
+)
+QUALITY = 80
+
+
+def supported_formats():
+    Image.init()
+    return [fmt for fmt in FORMATS if fmt[0] in Image.SAVE]
+
+
+def variant_widths(source_width):
+    """Ширины вариантов: не шире исходника, но хотя бы одна."""
+    widths = [width for width in IMAGE_VARIANT_WIDTHS if width <= source_width]
+    return widths or [IMAGE_VARIANT_WIDTHS[0]]
+
+
+def parse_variants(encoded, name):
+    """Список вариантов из JSON, если он описывает картинку name."""
+    try:
+        data = json.loads(encoded)
+        if data['source'] == name:
+            return data['variants']
+    except (ValueError, TypeError, KeyError):
+        logger.warning('Битое описание вариантов картинки %s', name)
+    return []
+
+
+def load_variants(post):
+    """Варианты текущей картинки поста или пустой список."""
+    if not post.image or not post.image_variants:
+        return []
+    return parse_variants(post.image_variants, post.image.name)
+
+
+def dump_variants(name, variants):
+    """JSON для Post.image_variants: варианты картинки name."""
+    return json.dumps({'source': name, 'variants': variants})
+
+
+def variants_directory(name):
+    return os.path.join('variants', os.path.splitext(name)[0])
+
+
+def encode_variants(name):
+    """Создает файлы вариантов картинки name и возвращает их описание.
+
+    Имя картинки определяется ее содержимым, поэтому уже созданный
+    вариант повторно не кодируется и не записывается.
+    """
+    from .models import Post
+
+    with Post._meta.get_field('image').storage.open(name) as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    ratio_width, ratio_height = IMAGE_ASPECT
+    directory = variants_directory(name)
+    variants = []
+    for width in variant_widths(image.width):
+        height = round(width * ratio_height / ratio_width)
+        resized = None
+        for pil_format, mime_type, extension in supported_formats():
+            path = os.path.join(directory, f'{width}.{extension}')
+            if not default_storage.exists(path):
+                if resized is None:
+                    resized = ImageOps.fit(
+                        image, (width, height), Image.LANCZOS
+                    )
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, quality=QUALITY)
+                path = default_storage.save(
+                    path, ContentFile(buffer.getvalue())
+                )
+            variants.append(
+                {
+                    'name': path,
+                    'type': mime_type,
+                    'width': width,
+                    'height': height,
+                }
+            )
+    return variants
+
+
+def build_variants(name):
+    """Сохраняет описание вариантов картинки name во всех ее постах.
+
+    Если у другого поста с той же картинкой варианты уже есть, берется
+    их описание.
+    """
+    from .models import Post
+
+    posts = Post.objects.filter(image=name)
+    encoded = (
+        posts.exclude(image_variants='')
+        .values_list('image_variants', flat=True)
+        .first()
+    )
+    variants = parse_variants(encoded, name) if encoded else []
+    if not variants:
+        variants = encode_variants(name)
+    post_ids = list(posts.values_list('pk', flat=True))
+    posts.update(image_variants=dump_variants(name, variants))
+    for post_id in post_ids:
+        object_cache.posts.invalidate(post_id)
+        fragments.bump('post', post_id)
+
+
+def delete_variants(name):
+    """Удаляет файлы вариантов картинки name."""
+    directory = variants_directory(name)
+    if not default_storage.exists(directory):
+        return
+    for filename in default_storage.listdir(directory)[1]:
+        default_storage.delete(os.path.join(directory, filename))
+
+
+def schedule_variants(post):
+    """Ставит в очередь варианты, если их нет для текущей картинки."""
+    if post.image and not load_variants(post):
+        run_in_background(
+            ('variants', post.image.name), build_variants, post.image.name
+        )
@@ -0,0 +1,358 @@
+"""Генерация синтетических данных для нагрузочного тестирования лент.
+
+Пользователи, подписки, посты и комментарии вставляются bulk_create
+пачками, каждая пачка - в своей транзакции. Посты, подписки и
+комментарии можно создавать в нескольких процессах. Сигналы при
+bulk_create не срабатывают, поэтому в конце производные данные
+(счетчики, ссылки на файлы, варианты картинок, ленты, поисковый
+индекс) строятся заново. Тексты генерирует Faker, группы - mixer.
+
+Распределения задаются строкой:
+    const:N            - всегда N;
+    uniform:A:B        - равномерно от A до B;
+    pareto:ALPHA:MAX   - степенной хвост (мало кто много), не больше MAX.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import multiprocessing
+import random
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import OutputWrapper
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+from PIL import Image
+
+from . import blobs, counters, graph, images
+from .consts import LOADGEN_BATCH_SIZE, LOADGEN_CHUNK_SIZE
+from .models import Comment, Follow, Group, Post, User
+
+TEXT_POOL_SIZE = 1000
+IMAGE_SIZE = (1200, 800)
+
+# данные, общие для всех задач; при fork воркеры получают их без
+# сериализации
+_shared = {}
+
+
+def parse_distribution(spec):
+    """Функция rng -> int по строке распределения."""
+    name, *args = spec.split(':')
+    try:
+        args = [float(arg) for arg in args]
+        if name == 'const' and len(args) == 1:
+            value = int(args[0])
+            return lambda rng: value
+        if name == 'uniform' and len(args) == 2:
+            low, high = int(args[0]), int(args[1])
+            return lambda rng: rng.randint(low, high)
+        if name == 'pareto' and len(args) == 2 and args[0] > 0:
+            alpha, maximum = args[0], int(args[1])
+            return lambda rng: min(int(rng.paretovariate(alpha)) - 1, maximum)
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(
+        f'Неизвестное распределение {spec!r}: ожидается const:N, '
+        'uniform:A:B или pareto:ALPHA:MAX'
+    )
+
+
+def distribution(spec):
+    """Проверяет строку распределения для argparse и возвращает ее."""
+    parse_distribution(spec)
+    return spec
+
+
+@contextlib.contextmanager
+def generated_dates(model):
+    """Отключает auto_now_add, чтобы сохранить сгенерированные даты."""
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def bulk_insert(model, objects, batch_size=LOADGEN_BATCH_SIZE, **kwargs):
+    """Вставляет объекты пачками, каждую в своей транзакции."""
+    total = 0
+    objects = iter(objects)
+    with generated_dates(model):
+        while True:
+            batch = list(itertools.islice(objects, batch_size))
+            if not batch:
+                return total
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+            total += len(batch)
+
+
+def random_moment(rng, start, end):
+    return start + (end - start) * rng.random()
+
+
+def create_follows(task):
+    follower_ids, seed = task
+    rng = random.Random(seed)
+    follows_per_user = parse_distribution(_shared['follows_per_user'])
+    authors = _shared['authors']
+    cum_weights = _shared['cum_weights']
+    follows = []
+    for user_id in follower_ids:
+        count = min(follows_per_user(rng), len(authors) - 1)
+        chosen = set(rng.choices(authors, cum_weights=cum_weights, k=count))
+        chosen.discard(user_id)
+        follows.extend(
+            Follow(user_id=user_id, author_id=author_id)
+            for author_id in chosen
+        )
+    return bulk_insert(Follow, follows, ignore_conflicts=True)
+
+
+def create_posts(task):
+    author_ids, seed = task
+    rng = random.Random(seed)
+    posts_per_author = parse_distribution(_shared['posts_per_author'])
+    texts = _shared['texts']
+    group_ids = _shared['group_ids'] or [None]
+    images = _shared['images']
+    start, end = _shared['period']
+    posts = (
+        Post(
+            author_id=author_id,
+            text=rng.choice(texts),
+            group_id=rng.choice(group_ids),
+            pub_date=random_moment(rng, start, end),
+            image=(
+                rng.choice(images)
+                if images and rng.random() < _shared['image_ratio']
+                else ''
+            ),
+        )
+        for author_id in author_ids
+        for _ in range(posts_per_author(rng))
+    )
+    return bulk_insert(Post, posts)
+
+
+def create_comments(task):
+    first_id, last_id, seed = task
+    rng = random.Random(seed)
+    comments_per_post = parse_distribution(_shared['comments_per_post'])
+    texts = _shared['texts']
+    users = _shared['users']
+    end = _shared['period'][1]
+    posts = Post.objects.filter(id__gte=first_id, id__lte=last_id)
+    comments = (
+        Comment(
+            post_id=post_id,
+            author_id=rng.choice(users),
+            text=rng.choice(texts),
+            created=random_moment(rng, pub_date, end),
+        )
+        for post_id, pub_date in posts.values_list('id', 'pub_date')
+        for _ in range(comments_per_post(rng))
+    )
+    return bulk_insert(Comment, comments)
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        users,
+        groups,
+        posts_per_author,
+        follows_per_user,
+        comments_per_post,
+        popularity=1.0,
+        images=0,
+        image_ratio=0.0,
+        days=365,
+        workers=1,
+        seed=None,
+        stdout=None,
+    ):
+        self.users = users
+        self.groups = groups
+        self.workers = workers
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.images = images
+        self.popularity = popularity
+        self.stdout = stdout or OutputWrapper(sys.stdout)
+        # метка запуска: повторный запуск не пересекается по slug и username
+        self.tag = uuid.uuid4().hex[:8]
+        now = timezone.now()
+        _shared.update(
+            posts_per_author=posts_per_author,
+            follows_per_user=follows_per_user,
+            comments_per_post=comments_per_post,
+            image_ratio=image_ratio,
+            period=(now - datetime.timedelta(days=days), now),
+        )
+
+    def run(self):
+        _shared['texts'] = self.make_texts()
+        _shared['group_ids'] = self.create_groups()
+        _shared['users'] = self.create_users()
+        _shared['images'] = self.create_images()
+        self.stdout.write(f'Пользователей: {len(_shared["users"])}')
+        self.set_popularity(_shared['users'])
+        self.stdout.write(
+            f'Подписок: {self.in_workers(create_follows, _shared["users"])}'
+        )
+        last_post_id = self.last_post_id()
+        self.stdout.write(
+            f'Постов: {self.in_workers(create_posts, _shared["users"])}'
+        )
+        self.stdout.write(
+            f'Комментариев: {self.create_comments(last_post_id)}'
+        )
+        self.rebuild_derived()
+
+    def make_texts(self):
+        fake = Faker('ru_RU')
+        fake.seed_instance(self.seed)
+        return [
+            fake.text(max_nb_chars=self.rng.choice((80, 200, 600)))
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+
+    def create_groups(self):
+        prefix = f'load-{self.tag}-'
+        # mixer только заполняет поля, вставка - общими пачками
+        mixer = Mixer(commit=False, locale='ru_RU')
+        mixer.faker.seed_instance(self.seed)
+        bulk_insert(
+            Group,
+            mixer.cycle(self.groups).blend(
+                Group,
+                slug=(f'{prefix}{number}' for number in range(self.groups)),
+            ),
+        )
+        return list(
+            Group.objects.filter(slug__startswith=prefix).values_list(
+                'id', flat=True
+            )
+        )
+
+    def create_users(self):
+        prefix = f'load_{self.tag}_'
+        password = make_password(None)
+        bulk_insert(
+            User,
+            (
+                User(username=f'{prefix}{number}', password=password)
+                for number in range(self.users)
+            ),
+        )
+        return list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def create_images(self):
+        """Несколько картинок, общих для всех постов."""
+        storage = Post._meta.get_field('image').storage
+        names = set()
+        for _ in range(self.images):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', IMAGE_SIZE, color).save(buffer, 'JPEG')
+            names.add(
+                storage.save('posts/load.jpg', ContentFile(buffer.getvalue()))
+            )
+        return sorted(names)
+
+    def set_popularity(self, user_ids):
+        """Вес автора при выборе подписок: 1 / ранг ** popularity."""
+        authors = list(user_ids)
+        self.rng.shuffle(authors)
+        _shared['authors'] = authors
+        _shared['cum_weights'] = list(
+            itertools.accumulate(
+                1 / rank**self.popularity
+                for rank in range(1, len(authors) + 1)
+            )
+        )
+
+    def last_post_id(self):
+        return Post.objects.aggregate(last=Max('id'))['last'] or 0
+
+    def create_comments(self, last_post_id):
+        """Комментарии к постам, созданным после last_post_id."""
+        new_last_id = self.last_post_id()
+        ranges = [
+            (first_id, min(first_id + LOADGEN_CHUNK_SIZE - 1, new_last_id))
+            for first_id in range(
+                last_post_id + 1, new_last_id + 1, LOADGEN_CHUNK_SIZE
+            )
+        ]
+        return self.run_tasks(
+            create_comments,
+            [(*id_range, self.rng.getrandbits(64)) for id_range in ranges],
+        )
+
+    def in_workers(self, func, ids):
+        """Выполняет func по кускам ids, каждому со своим зерном."""
+        return self.run_tasks(
+            func,
+            [
+                (
+                    ids[start:start + LOADGEN_CHUNK_SIZE],
+                    self.rng.getrandbits(64),
+                )
+                for start in range(0, len(ids), LOADGEN_CHUNK_SIZE)
+            ],
+        )
+
+    def run_tasks(self, func, tasks):
+        if self.workers <= 1:
+            return sum(map(func, tasks))
+        # соединения с базой нельзя делить между процессами
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(self.workers, mp_context=context) as pool:
+            return sum(pool.map(func, tasks))
+
+    def build_image_variants(self):
+        """Варианты общих картинок: по одному кодированию на картинку.
+
+        Посты вставлены в обход сигналов и еще не попали в кеши, поэтому
+        описание вариантов пишется одним UPDATE без инвалидации.
+        """
+        for name in _shared['images']:
+            Post.objects.filter(image=name).update(
+                image_variants=images.dump_variants(
+                    name, images.encode_variants(name)
+                )
+            )
+
+    def rebuild_derived(self):
+        """Производные данные, которые обычно ведут сигналы."""
+        counters.recount()
+        blobs.recount()
+        self.build_image_variants()
+        graph.invalidate_all()
+        call_command('rebuild_timelines', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
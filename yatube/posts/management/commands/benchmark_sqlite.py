@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from core.sqlite import DEFAULT_PRAGMAS, TUNED_PRAGMAS, apply_pragmas
+from posts.benchmark import BENCHMARK_CACHES, ConcurrencyBenchmark
+
+COLUMNS = ('rps', 'errors', 'reads', 'read_p99_ms', 'writes', 'write_p99_ms')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite под конкурентной '
+        'нагрузкой в режиме по умолчанию и с SQLITE_TUNING.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=200,
+            help='Размер данных для generate_load_data.',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=4,
+            help='Процессов, как воркеров сервера.',
+        )
+        parser.add_argument(
+            '--threads', type=int, default=2, help='Потоков в процессе.'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Запросов на поток.',
+        )
+        parser.add_argument(
+            '--write-ratio',
+            type=float,
+            default=0.3,
+            help='Доля запросов на запись комментария.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замеры только для SQLite')
+        benchmark = ConcurrencyBenchmark(
+            options['processes'],
+            options['threads'],
+            options['requests'],
+            options['write_ratio'],
+            options['seed'],
+        )
+        # потоки работают с общей временной базой в файле
+        temp_dir = tempfile.mkdtemp()
+        old_name = connection.settings_dict['NAME']
+        old_test_name = connection.settings_dict['TEST']['NAME']
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            temp_dir, 'db.sqlite3'
+        )
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            with override_settings(
+                MEDIA_ROOT=temp_dir,
+                SEARCH_INDEX=os.path.join(temp_dir, 'search.sqlite3'),
+                CACHES=BENCHMARK_CACHES,
+            ):
+                cache.clear()
+                call_command(
+                    'generate_load_data',
+                    users=options['users'],
+                    seed=options['seed'],
+                    images=0,
+                    stdout=self.stdout,
+                )
+                results = {
+                    'default': self.run(benchmark, tuned=False),
+                    'tuned': self.run(benchmark, tuned=True),
+                }
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict['TEST']['NAME'] = old_test_name
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self.report(results)
+
+    def run(self, benchmark, tuned):
+        connections.close_all()
+        # режим журнала хранится в файле базы, его надо вернуть явно
+        connection.ensure_connection()
+        apply_pragmas(connection, TUNED_PRAGMAS if tuned else DEFAULT_PRAGMAS)
+        connection.close()
+        with override_settings(SQLITE_TUNING=tuned):
+            return benchmark.run()
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"режим":<10}' + ''.join(f'{column:>14}' for column in COLUMNS)
+        )
+        for mode, summary in results.items():
+            self.stdout.write(
+                f'{mode:<10}'
+                + ''.join(f'{summary[column]!s:>14}' for column in COLUMNS)
+            )
@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from posts.benchmark import BENCHMARK_CACHES, METRICS, Benchmark, compare
+from posts.consts import (
+    BENCHMARK_DEPTHS,
+    BENCHMARK_ITERATIONS,
+    BENCHMARK_TOLERANCE,
+)
+
+
+def depths(value):
+    return [int(depth) for depth in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет скорость страниц ленты на сгенерированных данных и '
+        'сравнивает с базовыми результатами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=2000,
+            help='Размер данных для generate_load_data.',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--current-db',
+            action='store_true',
+            help='Замерять на текущей базе, не создавая временную.',
+        )
+        parser.add_argument(
+            '--depths',
+            type=depths,
+            default=list(BENCHMARK_DEPTHS),
+            help='Глубины листания через запятую.',
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=BENCHMARK_ITERATIONS
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кеш перед каждым запросом.',
+        )
+        parser.add_argument('--output', help='Куда сохранить результаты.')
+        parser.add_argument(
+            '--baseline', help='Базовые результаты для сравнения.'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Записать результаты в --baseline вместо сравнения.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=BENCHMARK_TOLERANCE
+        )
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline требует --baseline')
+        results = self.measure(options)
+        self.report(results)
+        if options['output']:
+            self.save(options['output'], results)
+        if options['save_baseline']:
+            self.save(options['baseline'], results)
+        elif options['baseline']:
+            self.compare_with(
+                options['baseline'], results, options['tolerance']
+            )
+
+    def measure(self, options):
+        benchmark = Benchmark(
+            options['depths'], options['iterations'], options['cold']
+        )
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            cache.clear()
+            if options['current_db']:
+                return self.run(benchmark)
+            return self.measure_generated(benchmark, options)
+
+    def measure_generated(self, benchmark, options):
+        # временные база, файлы и поисковый индекс, чтобы не трогать
+        # рабочие данные
+        temp_dir = tempfile.mkdtemp()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            with override_settings(
+                MEDIA_ROOT=temp_dir,
+                SEARCH_INDEX=os.path.join(temp_dir, 'search.sqlite3'),
+            ):
+                call_command(
+                    'generate_load_data',
+                    users=options['users'],
+                    seed=options['seed'],
+                    stdout=self.stdout,
+                )
+                return self.run(benchmark)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def run(self, benchmark):
+        setup_test_environment()
+        try:
+            return benchmark.run()
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            teardown_test_environment()
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"страница":<20}'
+            + ''.join(f'{metric:>10}' for metric in METRICS)
+        )
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<20}'
+                + ''.join(f'{metrics[metric]:>10}' for metric in METRICS)
+            )
+
+    def save(self, path, results):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    def compare_with(self, path, results, tolerance):
+        with open(path) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, tolerance)
+        if regressions:
+            raise CommandError(
+                'Регрессия относительно базовых результатов:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,95 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts.consts import COMMENTS_NUMBERS, POSTS_NUMBERS
+from posts.models import Comment, Post
+from posts.paginators import (
+    NEXT,
+    CommentCursorPaginator,
+    CursorPaginator,
+    encode_cursor,
+)
+from posts.timeline import TimelinePaginator
+
+# строки плана, означающие полный проход по таблице
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b)(?!CONSTANT ROW)'),
+    'postgresql': re.compile(r'\bSeq Scan on\b'),
+}
+# строки плана, означающие сортировку без индекса
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': re.compile(r'\bSort\b'),
+}
+SAMPLE_ID = 1
+
+
+def feed_paginators():
+    """Пагинаторы лент и комментариев для тестового автора/группы/поста."""
+    paginators = {
+        name: CursorPaginator(queryset, POSTS_NUMBERS)
+        for name, queryset in (
+            ('index', Post.objects.feed()),
+            ('group_posts', Post.objects.feed().filter(group_id=SAMPLE_ID)),
+            ('profile', Post.objects.feed().filter(author_id=SAMPLE_ID)),
+            (
+                'follow_index (популярные авторы)',
+                Post.objects.feed().filter(
+                    author_id=SAMPLE_ID, fanned_out=False
+                ),
+            ),
+        )
+    }
+    paginators['follow_index'] = TimelinePaginator(SAMPLE_ID, POSTS_NUMBERS)
+    paginators['comments'] = CommentCursorPaginator(
+        Comment.objects.visible().filter(post_id=SAMPLE_ID), COMMENTS_NUMBERS
+    )
+    return paginators
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для запросов лент и завершается с ошибкой, '
+        'если какой-то из них читает таблицу целиком или сортирует '
+        'строки без индекса.'
+    )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in FULL_SCAN_PATTERNS:
+            raise CommandError(f'EXPLAIN для {vendor} не поддерживается.')
+        now = timezone.now()
+        sample = Post(pk=SAMPLE_ID, pub_date=now)
+        comment = Comment(pk=SAMPLE_ID, created=now)
+        failed = []
+        for name, paginator in feed_paginators().items():
+            cursor = encode_cursor(
+                comment if name == 'comments' else sample,
+                NEXT,
+                paginator.field,
+            )
+            pages = {
+                'первая страница': paginator.object_list,
+                'страница по курсору': paginator.cursor_queryset(cursor),
+            }
+            for page, page_queryset in pages.items():
+                plan = page_queryset[:paginator.per_page + 1].explain()
+                if FULL_SCAN_PATTERNS[vendor].search(plan):
+                    failed.append(name)
+                    status = self.style.ERROR('FULL SCAN')
+                elif SORT_PATTERNS[vendor].search(plan):
+                    failed.append(name)
+                    status = self.style.ERROR('SORT')
+                else:
+                    status = self.style.SUCCESS('OK')
+                self.stdout.write(f'{name} ({page}): {status}')
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+        if failed:
+            raise CommandError(
+                'Полный проход или сортировка без индекса: '
+                + ', '.join(sorted(set(failed)))
+            )
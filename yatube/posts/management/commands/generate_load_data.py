@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+
+from posts.loadgen import LoadGenerator, distribution
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает пользователей, подписки, посты и комментарии для '
+        'нагрузочного тестирования. Распределения: const:N, uniform:A:B, '
+        'pareto:ALPHA:MAX.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument(
+            '--posts-per-author', type=distribution, default='pareto:1.2:500'
+        )
+        parser.add_argument(
+            '--follows-per-user', type=distribution, default='pareto:1.5:200'
+        )
+        parser.add_argument(
+            '--comments-per-post', type=distribution, default='pareto:2:50'
+        )
+        parser.add_argument(
+            '--popularity',
+            type=float,
+            default=1.0,
+            help='Показатель Ципфа для выбора авторов при подписке.',
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=10,
+            help='Сколько разных картинок создать.',
+        )
+        parser.add_argument(
+            '--image-ratio',
+            type=float,
+            default=0.3,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько дней распределить даты постов.',
+        )
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        LoadGenerator(
+            users=options['users'],
+            groups=options['groups'],
+            posts_per_author=options['posts_per_author'],
+            follows_per_user=options['follows_per_user'],
+            comments_per_post=options['comments_per_post'],
+            popularity=options['popularity'],
+            images=options['images'],
+            image_ratio=options['image_ratio'],
+            days=options['days'],
+            workers=options['workers'],
+            seed=options['seed'],
+            stdout=self.stdout,
+        ).run()
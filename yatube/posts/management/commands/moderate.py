@@ -0,0 +1,97 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import moderation
+from posts.consts import MODERATION_CHUNK_SIZE
+from posts.models import Comment, Group, Post
+
+ACTIONS = ('delete', 'hide', 'unhide', 'move')
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово удаляет, скрывает, возвращает или переносит в другую '
+        'группу посты (или комментарии) по автору, датам и тексту.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=ACTIONS)
+        parser.add_argument(
+            '--comments',
+            action='store_true',
+            help='Обрабатывать комментарии, а не посты.',
+        )
+        parser.add_argument('--author', help='Имя пользователя автора.')
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='Не раньше этой даты (ГГГГ-ММ-ДД).',
+        )
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            help='Раньше этой даты (ГГГГ-ММ-ДД).',
+        )
+        parser.add_argument('--text', help='Подстрока текста.')
+        parser.add_argument(
+            '--group',
+            help='Slug группы для move; без него посты остаются без группы.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=MODERATION_CHUNK_SIZE
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать подходящие строки.',
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+        model = Comment if options['comments'] else Post
+        if model is Comment and action == 'move':
+            raise CommandError('Переносить в группу можно только посты')
+        if not any(
+            options[name] for name in ('author', 'since', 'until', 'text')
+        ):
+            raise CommandError('Нужен хотя бы один фильтр')
+        queryset = moderation.select(
+            model,
+            author=options['author'],
+            since=options['since'],
+            until=options['until'],
+            text=options['text'],
+        )
+        total = queryset.count()
+        self.stdout.write(f'Подходящих строк: {total}')
+        if options['dry_run'] or not total:
+            return
+
+        def progress(done):
+            self.stdout.write(f'Обработано: {done} из {total}')
+
+        size = options['chunk_size']
+        if action == 'move':
+            group = None
+            if options['group']:
+                try:
+                    group = Group.objects.get(slug=options['group'])
+                except Group.DoesNotExist:
+                    raise CommandError(f'Нет группы {options["group"]}')
+            done = moderation.move_posts(queryset, group, size, progress)
+        elif action == 'delete':
+            delete = (
+                moderation.delete_comments
+                if model is Comment
+                else moderation.delete_posts
+            )
+            done = delete(queryset, size, progress)
+        else:
+            hide = (
+                moderation.hide_comments
+                if model is Comment
+                else moderation.hide_posts
+            )
+            done = hide(queryset, action == 'hide', size, progress)
+        self.stdout.write(f'Готово: {done}')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts.consts import SEARCH_BATCH_SIZE
+from posts.models import Post
+from posts.search import get_index
+
+
+class Command(BaseCommand):
+    help = 'Строит заново полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options):
+        index = get_index()
+        index.clear()
+        posts = (
+            Post.objects.visible()
+            .only('id', 'text', 'pub_date')
+            .order_by('id')
+        )
+        batch = []
+        total = 0
+        for post in posts.iterator(chunk_size=SEARCH_BATCH_SIZE):
+            batch.append(post)
+            if len(batch) == SEARCH_BATCH_SIZE:
+                index.add(batch)
+                total += len(batch)
+                batch = []
+        index.add(batch)
+        index.optimize()
+        self.stdout.write(f'Проиндексировано постов: {total + len(batch)}')
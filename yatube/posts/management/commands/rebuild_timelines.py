@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Раскладывает по лентам подписчиков еще не разосланные посты.'
+
+    def handle(self, *args, **options):
+        fanned_out = timeline.fan_out_pending()
+        self.stdout.write(f'Разослано постов: {fanned_out}')
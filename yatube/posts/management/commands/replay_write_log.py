@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import write_behind
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет к базе журналы отложенной записи, оставшиеся от '
+        'упавших процессов сервера.'
+    )
+
+    def handle(self, *args, **options):
+        replayed = write_behind.replay(settings.WRITE_BEHIND_DIR)
+        self.stdout.write(f'Применено операций: {replayed}')
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:53
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    keep = (
+        Follow.objects.values('user', 'author')
+        .annotate(keep_id=Min('id'))
+        .values('keep_id')
+    )
+    Follow.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0008_timeline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['-pub_date', '-id'],
+                name='posts_post_pub_dat_d3c0cd_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_i_6a7ae9_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author__075f1d_idx',
+            ),
+        ),
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'
+            ),
+        ),
+    ]
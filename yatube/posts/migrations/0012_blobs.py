@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:08
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def count_references(apps, schema_editor):
+    # старые файлы остаются под прежними именами, у каждого своя запись
+    Blob = apps.get_model('posts', 'Blob')
+    Post = apps.get_model('posts', 'Post')
+    Blob.objects.bulk_create(
+        Blob(name=row['image'], refcount=row['total'])
+        for row in Post.objects.exclude(image='')
+        .order_by()
+        .values('image')
+        .annotate(total=Count('id'))
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0011_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                (
+                    'name',
+                    models.CharField(
+                        max_length=255,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='Имя файла',
+                    ),
+                ),
+                (
+                    'refcount',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='Число ссылок'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Файл',
+                'verbose_name_plural': 'Файлы',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(
+                blank=True,
+                storage=posts.storage.ContentAddressedStorage(),
+                upload_to='posts/',
+                verbose_name='Картинка',
+            ),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0012_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='hidden',
+            field=models.BooleanField(
+                default=False, verbose_name='Скрыт модератором'
+            ),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='hidden',
+            field=models.BooleanField(
+                default=False, verbose_name='Скрыт модератором'
+            ),
+        ),
+    ]
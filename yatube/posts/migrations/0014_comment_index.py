@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0013_hidden'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(
+                fields=['post', 'created', 'id'],
+                name='posts_comme_post_id_9660d8_idx',
+            ),
+        ),
+    ]
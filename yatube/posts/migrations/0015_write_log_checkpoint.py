@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0014_comment_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WriteLogCheckpoint',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'log',
+                    models.CharField(
+                        max_length=100, unique=True, verbose_name='Журнал'
+                    ),
+                ),
+                ('seq', models.BigIntegerField(verbose_name='Номер записи')),
+            ],
+            options={
+                'verbose_name': 'Отметка журнала',
+                'verbose_name_plural': 'Отметки журналов',
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_follow_counts(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    user_ids = set(Follow.objects.values_list('user', flat=True)) | set(
+        Follow.objects.values_list('author', flat=True)
+    )
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id) for user_id in user_ids),
+        ignore_conflicts=True,
+    )
+
+    def count(field):
+        follows = (
+            Follow.objects.filter(**{field: OuterRef('user')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return Coalesce(Subquery(follows), Value(0))
+
+    UserStats.objects.update(
+        followers_count=count('author'), following_count=count('user')
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0015_write_log_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='followers_count',
+            field=models.PositiveIntegerField(
+                default=0, verbose_name='Число подписчиков'
+            ),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='following_count',
+            field=models.PositiveIntegerField(
+                default=0, verbose_name='Число подписок'
+            ),
+        ),
+        migrations.RunPython(fill_follow_counts, migrations.RunPython.noop),
+    ]
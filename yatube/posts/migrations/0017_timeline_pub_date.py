@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:02
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.utils.timezone
+
+
+def fill_pub_date(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    TimelineEntry.objects.update(
+        pub_date=Subquery(
+            Post.objects.filter(pk=OuterRef('post')).values('pub_date')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0016_follow_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='pub_date',
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                verbose_name='Дата публикации',
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_pub_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_timel_user_id_98bb4a_idx',
+            ),
+        ),
+    ]
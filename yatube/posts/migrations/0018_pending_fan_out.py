@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:22
+
+from django.db import migrations, models
+from django.db.models import Count
+
+from posts.consts import TIMELINE_FANOUT_LIMIT
+
+
+def fan_out_existing(apps, schema_editor):
+    # посты, созданные до лент подписок, раскладываются так же, как в
+    # timeline.fan_out_pending
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    connection = schema_editor.connection
+    popular = (
+        Follow.objects.order_by()
+        .values('author')
+        .annotate(total=Count('id'))
+        .filter(total__gte=TIMELINE_FANOUT_LIMIT)
+        .values('author')
+    )
+    pending = Post.objects.filter(fanned_out=False).exclude(author__in=popular)
+    post_ids, params = pending.values('id').query.sql_with_params()
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+        f'{TimelineEntry._meta.db_table} '
+        f'(user_id, post_id, author_id, pub_date) '
+        f'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+        f'FROM {Post._meta.db_table} post '
+        f'JOIN {Follow._meta.db_table} follow '
+        f'ON follow.author_id = post.author_id '
+        f'WHERE post.id IN ({post_ids}) '
+        f'{connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+    pending.update(fanned_out=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0017_timeline_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                condition=models.Q(fanned_out=False),
+                fields=['author'],
+                name='posts_post_pending_idx',
+            ),
+        ),
+        migrations.RunPython(fan_out_existing, migrations.RunPython.noop),
+    ]
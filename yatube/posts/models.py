@@ -1,9 +1,24 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 
 User = get_user_model()
 POST_TRUNCATE_NUMBER = 15
+# поля, которые выводит includes/posts_rendering.html
+FEED_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'image',
+    'image_variants',
+    'author',
+    'author__username',
+    'group',
+    'group__slug',
+    'group__title',
+)
 
 
 class Group(models.Model):
@@ -15,6 +30,16 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def visible(self):
+        return self.filter(hidden=False)
+
+    def feed(self):
+        """Посты для лент: автор и группа одним JOIN, только нужные поля."""
+        feed = self.visible().select_related('author', 'group')
+        return feed.only(*FEED_FIELDS)
+
+
 class Post(models.Model):
     text = models.TextField('Текст поста', help_text='Введите текст поста')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
@@ -33,10 +58,38 @@ class Post(models.Model):
         verbose_name='Группа',
         help_text='Выберите группу',
     )
-    image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        blank=True,
+        storage=ContentAddressedStorage(),
+    )
+    fanned_out = models.BooleanField(
+        'Разослан по лентам подписчиков', default=False, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
+    image_variants = models.TextField(
+        'Варианты картинки', blank=True, editable=False
+    )
+    hidden = models.BooleanField('Скрыт модератором', default=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id']),
+            models.Index(fields=['group', '-pub_date', '-id']),
+            models.Index(fields=['author', '-pub_date', '-id']),
+            # неразосланные посты подмешиваются в ленту подписок при чтении
+            models.Index(
+                fields=['author'],
+                name='posts_post_pending_idx',
+                condition=models.Q(fanned_out=False),
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -44,6 +97,11 @@ class Post(models.Model):
         return self.text[:POST_TRUNCATE_NUMBER]
 
 
+class CommentQuerySet(models.QuerySet):
+    def visible(self):
+        return self.filter(hidden=False)
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
@@ -63,6 +121,14 @@ class Comment(models.Model):
     created = models.DateTimeField(
         'Дата публикации комментария', auto_now_add=True
     )
+    hidden = models.BooleanField('Скрыт модератором', default=False)
+
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id']),
+        ]
 
     def __str__(self):
         return self.text[:POST_TRUNCATE_NUMBER]
@@ -81,3 +147,87 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счетчики пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    # копия даты поста: лента листается по индексу этой таблицы
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        unique_together = ('user', 'post')
+        index_together = ('user', 'author')
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post']),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+
+
+class Blob(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+
+    name = models.CharField('Имя файла', max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+
+class WriteLogCheckpoint(models.Model):
+    """Последняя примененная запись журнала отложенной записи."""
+
+    log = models.CharField('Журнал', max_length=100, unique=True)
+    seq = models.BigIntegerField('Номер записи')
+
+    class Meta:
+        verbose_name = 'Отметка журнала'
+        verbose_name_plural = 'Отметки журналов'
@@ -0,0 +1,165 @@
+"""Массовая модерация постов и комментариев кусками.
+
+Выборка обходится по возрастанию id кусками по MODERATION_CHUNK_SIZE
+строк (id > последнего обработанного, без OFFSET). Каждый кусок - своя
+короткая транзакция из нескольких UPDATE/DELETE ... WHERE id IN (...),
+поэтому база не блокируется надолго, память не зависит от размера
+выборки, а прерванную чистку можно просто запустить снова.
+
+Производные данные обновляются теми же кусками: счетчики постов и
+комментариев, кеш объектов и фрагментов, поисковый индекс, ссылки на
+файлы картинок. Комментарии и записи лент удаляемых постов удаляются
+до самих постов, тоже кусками.
+"""
+
+from datetime import date, datetime, time
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import blobs, counters, fragments, object_cache, search
+from .consts import MODERATION_CHUNK_SIZE
+from .models import Comment, Post, TimelineEntry
+
+
+def _moment(value):
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def select(model, author=None, since=None, until=None, text=None):
+    """Посты или комментарии по автору, периоду и подстроке текста.
+
+    Даты без времени означают начало дня в текущем часовом поясе.
+    """
+    date_field = 'pub_date' if model is Post else 'created'
+    queryset = model.objects.all()
+    if author is not None:
+        queryset = queryset.filter(author__username=author)
+    if since is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': _moment(since)})
+    if until is not None:
+        queryset = queryset.filter(**{f'{date_field}__lt': _moment(until)})
+    if text:
+        queryset = queryset.filter(text__icontains=text)
+    return queryset
+
+
+def chunks(queryset, size=MODERATION_CHUNK_SIZE):
+    """id строк выборки списками не длиннее size."""
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last)[:size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def _delete_rows(queryset, size):
+    # без сигналов и сбора каскадов Django: их работа сделана пакетно
+    for ids in chunks(queryset, size):
+        with transaction.atomic():
+            queryset.model.objects.filter(pk__in=ids)._raw_delete(queryset.db)
+
+
+def _run(queryset, action, size, progress):
+    """Применяет action(ids) к кускам выборки, возвращает число строк."""
+    done = 0
+    for ids in chunks(queryset, size):
+        done += action(ids)
+        if progress is not None:
+            progress(done)
+    return done
+
+
+def _delete_posts(ids, size):
+    _delete_rows(Comment.objects.filter(post__in=ids), size)
+    _delete_rows(TimelineEntry.objects.filter(post__in=ids), size)
+    with transaction.atomic():
+        posts = Post.objects.filter(pk__in=ids)
+        rows = list(posts.values_list('pk', 'author', 'image'))
+        # записи, появившиеся после чистки выше
+        Comment.objects.filter(post__in=ids)._raw_delete(posts.db)
+        TimelineEntry.objects.filter(post__in=ids)._raw_delete(posts.db)
+        posts._raw_delete(posts.db)
+        blobs.release_many([image for _, _, image in rows if image])
+        counters.recount_authors({author for _, author, _ in rows})
+    search.get_index().remove(ids)
+    object_cache.posts.invalidate_many(ids)
+    return len(rows)
+
+
+def _hide_posts(ids, hidden):
+    with transaction.atomic():
+        posts = Post.objects.filter(pk__in=ids)
+        changed = posts.update(hidden=hidden)
+        counters.recount_authors(set(posts.values_list('author', flat=True)))
+    if hidden:
+        search.get_index().remove(ids)
+    else:
+        search.get_index().add(posts.only('id', 'text', 'pub_date'))
+    object_cache.posts.invalidate_many(ids)
+    return changed
+
+
+def delete_posts(queryset, size=MODERATION_CHUNK_SIZE, progress=None):
+    """Удаляет посты с комментариями, записями лент и картинками."""
+    return _run(queryset, lambda ids: _delete_posts(ids, size), size, progress)
+
+
+def hide_posts(
+    queryset, hidden=True, size=MODERATION_CHUNK_SIZE, progress=None
+):
+    """Скрывает посты из лент, поиска и счетчиков или возвращает их."""
+    return _run(queryset, lambda ids: _hide_posts(ids, hidden), size, progress)
+
+
+def move_posts(queryset, group, size=MODERATION_CHUNK_SIZE, progress=None):
+    """Переносит посты в группу group (None - без группы)."""
+
+    def move(ids):
+        with transaction.atomic():
+            moved = Post.objects.filter(pk__in=ids).update(group=group)
+        object_cache.posts.invalidate_many(ids)
+        # ссылка на группу входит в отрисованный пост
+        fragments.bump_many('post', ids)
+        return moved
+
+    return _run(queryset, move, size, progress)
+
+
+def delete_comments(queryset, size=MODERATION_CHUNK_SIZE, progress=None):
+    """Удаляет комментарии и пересчитывает счетчики их постов."""
+
+    def delete(ids):
+        with transaction.atomic():
+            comments = Comment.objects.filter(pk__in=ids)
+            post_ids = set(comments.values_list('post', flat=True))
+            deleted = comments._raw_delete(comments.db)
+            counters.recount_posts(post_ids)
+        fragments.bump_many('comments', post_ids)
+        return deleted
+
+    return _run(queryset, delete, size, progress)
+
+
+def hide_comments(
+    queryset, hidden=True, size=MODERATION_CHUNK_SIZE, progress=None
+):
+    """Скрывает комментарии или возвращает их."""
+
+    def hide(ids):
+        with transaction.atomic():
+            comments = Comment.objects.filter(pk__in=ids)
+            changed = comments.update(hidden=hidden)
+            post_ids = set(comments.values_list('post', flat=True))
+            counters.recount_posts(post_ids)
+        fragments.bump_many('comments', post_ids)
+        return changed
+
+    return _run(queryset, hide, size, progress)
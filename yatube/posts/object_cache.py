@@ -0,0 +1,125 @@
+"""Сквозной кеш объектов Post, Group и автора.
+
+Объект хранится под ключом, в который входит его версия. Версию меняют
+сигналы save/delete, поэтому значение, прочитанное из базы до правки,
+после правки уже никогда не будет прочитано: даже если оно попадет
+в кеш позже инвалидации, оно ляжет под старую версию.
+
+Промахи читаются из основной базы: отстающая реплика положила бы
+старую строку под новую версию.
+"""
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.http import Http404
+
+from .consts import OBJECT_CACHE_TIMEOUT
+from .models import Group, Post, User
+
+
+KEY_PREFIX = 'obj'
+# поля автора, которые выводят шаблоны профиля и поста; пароль, почта и
+# права в кеш не попадают
+AUTHOR_FIELDS = (
+    'id',
+    'username',
+    'first_name',
+    'last_name',
+    'stats__posts_count',
+    'stats__followers_count',
+    'stats__following_count',
+)
+# общая версия всех объектов, меняется при массовых правках
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+
+
+def _new_version():
+    return uuid4().hex
+
+
+class ObjectCache:
+    def __init__(self, queryset):
+        self.queryset = queryset.using('default')
+        self.label = queryset.model._meta.label_lower
+
+    def _version_key(self, pk):
+        return f'{KEY_PREFIX}:{self.label}:{pk}:version'
+
+    def _lookup_key(self, field, value):
+        return f'{KEY_PREFIX}:{self.label}:{field}:{value}'
+
+    def _object_key(self, pk):
+        keys = [GENERATION_KEY, self._version_key(pk)]
+        versions = cache.get_many(keys)
+        missing = {key: _new_version() for key in keys if key not in versions}
+        if missing:
+            cache.set_many(missing, None)
+            versions.update(missing)
+        generation, version = (versions[key] for key in keys)
+        return f'{KEY_PREFIX}:{self.label}:{pk}:{generation}:{version}'
+
+    def get(self, **lookup):
+        """Объект по одному условию: pk=..., slug=... или username=...
+
+        Объект читается из базы только после того, как прочитана его
+        версия; если по slug/username еще неизвестен pk, запоминается
+        только pk, а сам объект попадет в кеш при следующем запросе.
+        """
+        [(field, value)] = lookup.items()
+        model = self.queryset.model
+        pk = value
+        if field != 'pk':
+            pk = cache.get(self._lookup_key(field, value))
+        if pk is not None:
+            key = self._object_key(pk)
+            obj = cache.get(key)
+            if obj is None:
+                obj = self.queryset.filter(pk=pk).first()
+                if obj is not None:
+                    cache.set(key, obj, OBJECT_CACHE_TIMEOUT)
+            if obj is not None and (
+                field == 'pk' or getattr(obj, field) == value
+            ):
+                return obj
+            if field == 'pk':
+                raise model.DoesNotExist(f'{self.label} {lookup} не найден')
+        obj = self.queryset.get(**lookup)
+        cache.set(self._lookup_key(field, value), obj.pk, OBJECT_CACHE_TIMEOUT)
+        return obj
+
+    def get_or_404(self, **lookup):
+        try:
+            return self.get(**lookup)
+        except self.queryset.model.DoesNotExist:
+            raise Http404(f'{self.label} {lookup} не найден')
+
+    def invalidate(self, pk):
+        cache.set(self._version_key(pk), _new_version(), None)
+
+    def invalidate_many(self, pks):
+        cache.set_many(
+            {self._version_key(pk): _new_version() for pk in pks}, None
+        )
+
+
+posts = ObjectCache(Post.objects.all())
+groups = ObjectCache(Group.objects.all())
+authors = ObjectCache(
+    User.objects.select_related('stats').only(*AUTHOR_FIELDS)
+)
+
+
+def invalidate_all():
+    """Сбрасывает все закешированные объекты разом."""
+    cache.set(GENERATION_KEY, _new_version(), None)
+
+
+def get_post_or_404(post_id):
+    """Пост вместе с автором и группой, все три - из кеша."""
+    post = posts.get_or_404(pk=post_id)
+    if post.hidden:
+        raise Http404(f'Пост {post_id} скрыт')
+    post.author = authors.get(pk=post.author_id)
+    if post.group_id is not None:
+        post.group = groups.get(pk=post.group_id)
+    return post
@@ -0,0 +1,231 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .consts import ADMIN_EXACT_COUNT_LIMIT, COMMENTS_NUMBERS, POSTS_NUMBERS
+from .models import Comment
+
+CURSOR_SEPARATOR = '|'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(obj, direction, field='pub_date'):
+    """Упаковывает позицию (field, id) в непрозрачную строку."""
+    raw = CURSOR_SEPARATOR.join(
+        (direction, getattr(obj, field).isoformat(), str(obj.pk))
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор в (направление, дата, id)."""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        direction, moment, pk = raw.split(CURSOR_SEPARATOR)
+        moment = parse_datetime(moment)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS) or moment is None:
+        raise InvalidCursor(cursor)
+    return direction, moment, pk
+
+
+class CursorPage(Page):
+    """Страница ленты без номера: навигация только по курсорам."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id) или другому ключу из ordering.
+
+    Не выполняет COUNT(*) и OFFSET: каждая страница - это диапазонный
+    запрос от последней показанной записи.
+    """
+
+    ordering = ('-pub_date', '-id')
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    @property
+    def field(self):
+        return self.ordering[0].lstrip('-')
+
+    @property
+    def key(self):
+        return self.ordering[1].lstrip('-')
+
+    def cursor_queryset(self, cursor):
+        """Запрос записей, лежащих за курсором в его направлении."""
+        direction, moment, pk = decode_cursor(cursor)
+        descending = self.ordering[0].startswith('-')
+        lookup = 'lt' if (direction == NEXT) == descending else 'gt'
+        queryset = self.object_list.filter(
+            Q(**{f'{self.field}__{lookup}': moment})
+            | Q(**{self.field: moment, f'{self.key}__{lookup}': pk})
+        )
+        if direction == NEXT:
+            return queryset
+        return queryset.order_by(
+            *(
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in self.ordering
+            )
+        )
+
+    def rows(self, cursor=None):
+        """Не больше per_page + 1 записей за курсором в его направлении."""
+        queryset = self.object_list
+        if cursor is not None:
+            queryset = self.cursor_queryset(cursor)
+        return list(queryset[: self.per_page + 1])
+
+    def cursor_page(self, cursor=None):
+        """Возвращает страницу по курсору; без курсора - первую."""
+        objects = self.rows(cursor)
+        if cursor is None:
+            return self._forward_page(objects, has_previous=False)
+        if decode_cursor(cursor)[0] == NEXT:
+            return self._forward_page(objects, has_previous=True)
+        return self._backward_page(objects)
+
+    def get_cursor_page(self, cursor=None):
+        """Как cursor_page, но битый курсор ведет на первую страницу."""
+        try:
+            return self.cursor_page(cursor)
+        except InvalidCursor:
+            return self.cursor_page()
+
+    def _forward_page(self, objects, has_previous):
+        has_next = len(objects) > self.per_page
+        objects = objects[: self.per_page]
+        return self._make_page(objects, has_next, has_previous)
+
+    def _backward_page(self, objects):
+        if not objects:
+            return self.cursor_page()
+        has_previous = len(objects) > self.per_page
+        objects = objects[: self.per_page][::-1]
+        return self._make_page(objects, True, has_previous)
+
+    def _make_page(self, objects, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if objects and has_next:
+            next_cursor = encode_cursor(objects[-1], NEXT, self.field)
+        if objects and has_previous:
+            previous_cursor = encode_cursor(objects[0], PREVIOUS, self.field)
+        return CursorPage(objects, self, next_cursor, previous_cursor)
+
+
+class CommentCursorPaginator(CursorPaginator):
+    """Комментарии поста от старых к новым, по ключу (created, id)."""
+
+    ordering = ('created', 'id')
+
+
+def paginate(request, queryset, per_page=POSTS_NUMBERS):
+    """Страница ленты для запроса.
+
+    ?page=N обрабатывается классическим пагинатором (старые ссылки),
+    во всех остальных случаях используется курсор ?cursor=...
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return Paginator(queryset, per_page).get_page(page_number)
+    paginator = CursorPaginator(queryset, per_page)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
+
+
+def paginate_comments(post_id, cursor=None, per_page=COMMENTS_NUMBERS):
+    """Страница комментариев поста вместе с их авторами.
+
+    Каждая страница - диапазон индекса (post, created, id) от курсора,
+    битый курсор ведет на первую страницу. Страница попадает в кеш
+    фрагментов, поэтому читается из основной базы, а не с реплики.
+    """
+    comments = Comment.objects.db_manager('default').visible()
+    comments = comments.filter(post_id=post_id)
+    paginator = CommentCursorPaginator(
+        comments.select_related('author'), per_page
+    )
+    return paginator.get_cursor_page(cursor)
+
+
+def estimated_count(queryset):
+    """Число строк таблицы по статистике базы или None.
+
+    PostgreSQL хранит оценку в pg_class, SQLite - в sqlite_stat1 после
+    ANALYZE (первое число - строки в индексе, то есть в таблице).
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [connection.ops.quote_name(table)],
+                )
+                row = cursor.fetchone()
+                estimate = row and row[0]
+            elif connection.vendor == 'sqlite':
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table],
+                )
+                row = cursor.fetchone()
+                estimate = row and int(row[0].split()[0])
+            else:
+                return None
+    except DatabaseError:
+        # статистики еще нет: ANALYZE не выполнялся
+        return None
+    # до первого ANALYZE PostgreSQL возвращает -1 или 0
+    return int(estimate) if estimate and estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки без COUNT(*) по всей большой таблице.
+
+    Строки считаются точно, пока их не больше ADMIN_EXACT_COUNT_LIMIT:
+    COUNT(*) по подзапросу с LIMIT. Если строк больше, для всей таблицы
+    берется оценка из статистики базы, а для выборки с фильтрами
+    страниц показывается столько, сколько помещается в лимит.
+    """
+
+    exact_limit = ADMIN_EXACT_COUNT_LIMIT
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        counted = queryset[: self.exact_limit + 1].count()
+        if counted <= self.exact_limit or queryset.query.where:
+            return counted
+        return max(estimated_count(queryset) or 0, counted)
@@ -0,0 +1,247 @@
+"""Полнотекстовый поиск по постам.
+
+Индекс - таблица SQLite FTS5 в отдельном файле settings.SEARCH_INDEX,
+поэтому не зависит от основной базы. В индекс попадают основы слов
+(posts.stemmer), так что «кошки» находит «кошка». Посты индексируются
+сигналами при сохранении и удалении, команда rebuild_search_index
+строит индекс заново.
+
+Результаты упорядочены по bm25 (встроенный столбец rank FTS5), страницы
+листаются курсором по ключу (rank, rowid) без OFFSET. Число найденных
+постов считается не дальше SEARCH_COUNT_LIMIT.
+"""
+
+import base64
+import binascii
+import os
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from .consts import POSTS_NUMBERS, SEARCH_COUNT_LIMIT, SEARCH_MAX_TERMS
+from .paginators import (
+    CURSOR_SEPARATOR,
+    NEXT,
+    PREVIOUS,
+    CursorPage,
+    InvalidCursor,
+)
+from .stemmer import stems
+
+SCHEMA = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts USING fts5('
+    'body, pub_date UNINDEXED, '
+    "tokenize='unicode61 remove_diacritics 0')"
+)
+# строки за курсором и их порядок: лучшие (меньший rank) первыми
+AFTER = {
+    NEXT: ('(rank > ? OR (rank = ? AND rowid < ?))', 'rank, rowid DESC'),
+    PREVIOUS: ('(rank < ? OR (rank = ? AND rowid > ?))', 'rank DESC, rowid'),
+}
+
+
+def build_query(text):
+    """Запрос FTS5: все основы слов текста, каждая в кавычках."""
+    terms = list(dict.fromkeys(stems(text)))[:SEARCH_MAX_TERMS]
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self._path = path
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _write(self, statements):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, rows in statements:
+                connection.executemany(sql, rows)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def add(self, posts):
+        """Добавляет или обновляет посты в индексе."""
+        rows = [
+            (post.pk, ' '.join(stems(post.text)), post.pub_date.timestamp())
+            for post in posts
+        ]
+        self._write(
+            [
+                (
+                    'DELETE FROM posts WHERE rowid = ?',
+                    [row[:1] for row in rows],
+                ),
+                (
+                    'INSERT INTO posts (rowid, body, pub_date) '
+                    'VALUES (?, ?, ?)',
+                    rows,
+                ),
+            ]
+        )
+
+    def remove(self, post_ids):
+        self._write(
+            [
+                (
+                    'DELETE FROM posts WHERE rowid = ?',
+                    [(post_id,) for post_id in post_ids],
+                )
+            ]
+        )
+
+    def clear(self):
+        self._write([('DELETE FROM posts', [()])])
+
+    def optimize(self):
+        """Сливает сегменты индекса после массовой загрузки."""
+        self._connection.execute(
+            "INSERT INTO posts (posts) VALUES ('optimize')"
+        )
+
+    def count(self, query, limit):
+        """Число совпадений, но не больше limit + 1."""
+        if not query:
+            return 0
+        return self._connection.execute(
+            'SELECT count(*) FROM '
+            '(SELECT 1 FROM posts WHERE posts MATCH ? LIMIT ?)',
+            (query, limit + 1),
+        ).fetchone()[0]
+
+    def search(self, query, limit, cursor=None):
+        """(id, rank) постов по запросу, лучшие первыми.
+
+        cursor - (направление, rank, id) поста, за которым начинается
+        страница; в направлении PREVIOUS строки идут от худших к лучшим.
+        """
+        if not query:
+            return []
+        if cursor is None:
+            return self._connection.execute(
+                'SELECT rowid, rank FROM posts WHERE posts MATCH ? '
+                'ORDER BY rank, rowid DESC LIMIT ?',
+                (query, limit),
+            ).fetchall()
+        direction, rank, pk = cursor
+        after, order = AFTER[direction]
+        return self._connection.execute(
+            f'SELECT rowid, rank FROM posts WHERE posts MATCH ? AND {after} '
+            f'ORDER BY {order} LIMIT ?',
+            (query, rank, rank, pk, limit),
+        ).fetchall()
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_index():
+    """Индекс из settings.SEARCH_INDEX, один на процесс."""
+    path = settings.SEARCH_INDEX
+    with _lock:
+        if path not in _indexes:
+            _indexes[path] = SearchIndex(path)
+        return _indexes[path]
+
+
+def encode_cursor(direction, rank, pk):
+    raw = CURSOR_SEPARATOR.join((direction, repr(rank), str(pk)))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор поиска в (направление, rank, id)."""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        direction, rank, pk = raw.split(CURSOR_SEPARATOR)
+        rank = float(rank)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS):
+        raise InvalidCursor(cursor)
+    return direction, rank, pk
+
+
+class SearchPaginator:
+    """Страницы результатов поиска по курсору (rank, id).
+
+    rank зависит от статистики всего индекса, поэтому после добавления
+    постов граница страницы может немного сдвинуться; это плата за
+    страницы без OFFSET и полного пересчета совпадений.
+    """
+
+    def __init__(self, text, queryset, per_page=POSTS_NUMBERS):
+        self.query = build_query(text)
+        self.queryset = queryset
+        self.per_page = per_page
+
+    @cached_property
+    def _count(self):
+        found = get_index().count(self.query, SEARCH_COUNT_LIMIT)
+        return min(found, SEARCH_COUNT_LIMIT), found > SEARCH_COUNT_LIMIT
+
+    @property
+    def count(self):
+        """Число найденных постов, не больше SEARCH_COUNT_LIMIT."""
+        return self._count[0]
+
+    @property
+    def count_is_capped(self):
+        return self._count[1]
+
+    def cursor_page(self, cursor=None):
+        """Страница за курсором; без курсора - первая."""
+        position = None if cursor is None else decode_cursor(cursor)
+        rows = get_index().search(self.query, self.per_page + 1, position)
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        backward = position is not None and position[0] == PREVIOUS
+        if backward:
+            rows.reverse()
+            has_next, has_previous = bool(rows), has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(NEXT, rows[-1][1], rows[-1][0])
+        if rows and has_previous:
+            previous_cursor = encode_cursor(PREVIOUS, rows[0][1], rows[0][0])
+        post_ids = [pk for pk, _ in rows]
+        posts = self.queryset.in_bulk(post_ids)
+        # посты, удаленные в обход сигналов, просто пропускаются
+        return CursorPage(
+            [posts[pk] for pk in post_ids if pk in posts],
+            self,
+            next_cursor,
+            previous_cursor,
+        )
+
+    def get_cursor_page(self, cursor=None):
+        """Как cursor_page, но битый курсор ведет на первую страницу."""
+        try:
+            return self.cursor_page(cursor)
+        except InvalidCursor:
+            return self.cursor_page()
@@ -0,0 +1,172 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import (
+    blobs,
+    counters,
+    events,
+    fragments,
+    graph,
+    images,
+    object_cache,
+    search,
+    timeline,
+)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _hidden(instance):
+    # отложенное поле не дочитать: строки в базе уже нет
+    return instance.__dict__.get('hidden', False)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        events.publish_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_posts_count(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    if not _hidden(instance):
+        counters.change_posts_count(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if not _hidden(instance):
+        counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    # для отложенного поля картинки в __dict__ ничего нет
+    image = instance.__dict__.get('image')
+    instance._saved_image = getattr(image, 'name', image) or ''
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, raw=False, **kwargs):
+    if raw or 'image' in instance.get_deferred_fields():
+        return
+    name = instance.image.name or ''
+    saved = getattr(instance, '_saved_image', '')
+    if name != saved:
+        if name:
+            blobs.acquire(name)
+        if saved:
+            blobs.release(saved)
+        instance._saved_image = name
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    if getattr(instance, '_saved_image', ''):
+        blobs.release(instance._saved_image)
+
+
+@receiver(post_save, sender=Post)
+def build_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.schedule_variants(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.hidden:
+        search.get_index().remove([instance.pk])
+    else:
+        search.get_index().add([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_index().remove([instance.pk])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    object_cache.posts.invalidate(instance.pk)
+    fragments.bump('post', instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    fragments.bump('comments', instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    object_cache.groups.invalidate(instance.pk)
+    fragments.bump('group', instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author(sender, instance, update_fields=None, **kwargs):
+    object_cache.authors.invalidate(instance.pk)
+    # вход пользователя сохраняет только last_login, фрагменты не меняются
+    if update_fields != frozenset(['last_login']):
+        fragments.bump('author', instance.pk)
+
+
+@receiver(post_save, sender=UserStats)
+@receiver(post_delete, sender=UserStats)
+def invalidate_author_stats(sender, instance, **kwargs):
+    object_cache.authors.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_follow_counts(instance.user_id, instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_follow_counts(instance.user_id, instance.author_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_graph(sender, instance, **kwargs):
+    # до коммита другой запрос прочитал бы старые подписки под новой
+    # версией и закешировал бы их
+    transaction.on_commit(
+        lambda: graph.invalidate(instance.user_id, instance.author_id)
+    )
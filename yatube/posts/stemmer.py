@@ -0,0 +1,76 @@
+"""Стеммер Портера для русского языка.
+
+Упрощенная версия алгоритма Snowball: отбрасывает окончания в области
+RV (все, что после первой гласной). Слова без русских гласных
+возвращаются в нижнем регистре без изменений.
+"""
+
+import re
+
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+WORD = re.compile(r'\w+')
+
+
+def _strip(pattern, word):
+    return pattern.sub('', word, 1)
+
+
+def _strip_ending(rv):
+    stripped = _strip(PERFECTIVE_GERUND, rv)
+    if stripped != rv:
+        return stripped
+    rv = _strip(REFLEXIVE, rv)
+    stripped = _strip(ADJECTIVE, rv)
+    if stripped != rv:
+        return _strip(PARTICIPLE, stripped)
+    stripped = _strip(VERB, rv)
+    if stripped != rv:
+        return stripped
+    return _strip(NOUN, rv)
+
+
+def stem(word):
+    """Основа слова."""
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    prefix, rv = match.groups()
+    rv = _strip_ending(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    if DERIVATIONAL.match(rv):
+        rv = _strip(DERIVATIONAL_SUFFIX, rv)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = _strip(SUPERLATIVE, rv)
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def stems(text):
+    """Основы всех слов текста по порядку."""
+    return [stem(word) for word in WORD.findall(text)]
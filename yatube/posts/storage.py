@@ -0,0 +1,84 @@
+"""Хранилище, раскладывающее файлы по хешу содержимого.
+
+Файл считается sha256 по мере записи во временный файл рядом с целевым
+каталогом, затем переносится в <каталог>/ab/cd/<хеш><расширение>.
+Одинаковое содержимое хранится один раз: повторная запись просто
+возвращает имя уже лежащего файла. Сколько постов ссылаются на файл,
+учитывает posts.blobs.
+
+Перенос файла на место и удаление освободившегося файла идут под
+общей для всех процессов блокировкой (flock), а у повторно
+использованного файла растет время изменения (version): так удаление
+видит, что файл снова нужен.
+"""
+
+import fcntl
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+LOCK_NAME = '.storage.lock'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # имя определяется содержимым, подбирать свободное не нужно
+        return name
+
+    @contextmanager
+    def lock(self):
+        """Блокировка записи и удаления файлов хранилища."""
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, LOCK_NAME), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def version(self, name):
+        """Время изменения файла в наносекундах или None, если его нет."""
+        try:
+            return os.stat(self.path(name)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def hashed_name(self, name, digest):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def _save(self, name, content):
+        directory = self.path(os.path.dirname(name))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            name = self.hashed_name(name, digest.hexdigest())
+            full_path = self.path(name)
+            with self.lock():
+                if os.path.exists(full_path):
+                    # часы файловой системы грубые: версия должна
+                    # вырасти, даже если прошло меньше их шага
+                    now = time.time_ns()
+                    version = max(now, os.stat(full_path).st_mtime_ns + 1)
+                    os.utime(full_path, ns=(now, version))
+                else:
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    os.replace(temp_path, full_path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name.replace('\\', '/')
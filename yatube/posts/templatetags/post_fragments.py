@@ -0,0 +1,18 @@
+from django import template
+from django.utils.html import mark_safe
+
+from core.profiling import timer
+from posts.fragments import render_posts
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_fragments(posts, show_group_link=False):
+    """Отрисованные посты страницы ленты из кеша фрагментов."""
+    with timer('fragments'):
+        return [
+            mark_safe(fragment)
+            for fragment in render_posts(posts, show_group_link)
+        ]
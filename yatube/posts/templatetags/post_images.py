@@ -0,0 +1,53 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from core.profiling import timer
+from posts.consts import IMAGE_ASPECT
+from posts.images import load_variants
+
+register = template.Library()
+
+SIZES = f'(max-width: {IMAGE_ASPECT[0]}px) 100vw, {IMAGE_ASPECT[0]}px'
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    """<picture> с вариантами картинки поста по форматам и ширинам."""
+    with timer('thumbnail'):
+        return picture_context(post)
+
+
+def picture_context(post):
+    by_type = {}
+    for variant in load_variants(post):
+        by_type.setdefault(variant['type'], []).append(variant)
+    sources = [
+        {
+            'type': mime_type,
+            'srcset': ', '.join(
+                f'{default_storage.url(variant["name"])} {variant["width"]}w'
+                for variant in variants
+            ),
+        }
+        for mime_type, variants in by_type.items()
+    ]
+    fallback = None
+    if sources:
+        # последний формат - JPEG, его понимают все браузеры
+        variants = list(by_type.values())[-1]
+        default = [
+            variant
+            for variant in variants
+            if variant['width'] <= IMAGE_ASPECT[0]
+        ][-1]
+        fallback = dict(
+            default,
+            url=default_storage.url(default['name']),
+            srcset=sources.pop()['srcset'],
+        )
+    return {
+        'post': post,
+        'sources': sources,
+        'fallback': fallback,
+        'sizes': SIZES,
+    }
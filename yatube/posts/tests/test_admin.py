@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..paginators import EstimatedCountPaginator, estimated_count
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}') for number in range(5)
+        )
+
+    @mock.patch.object(EstimatedCountPaginator, 'exact_limit', 10)
+    def test_small_tables_are_counted_exactly(self):
+        """Пока строк меньше лимита, они считаются точно"""
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.num_pages, 3)
+
+    @mock.patch.object(EstimatedCountPaginator, 'exact_limit', 3)
+    def test_large_tables_use_statistics(self):
+        """Сверх лимита берется оценка из статистики базы"""
+        queryset = Post.objects.all()
+        self.assertIsNone(estimated_count(queryset))
+        self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 4)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimated_count(queryset), 5)
+        self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 5)
+        filtered = queryset.filter(text__startswith='Пост')
+        self.assertEqual(EstimatedCountPaginator(filtered, 2).count, 4)
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.unused_group = Group.objects.create(
+            title='Пустая группа', slug='unused', description='-'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_posts(self, count):
+        start = Post.objects.count()
+        for number in range(start, start + count):
+            author = User.objects.create_user(username=f'author{number}')
+            group = Group.objects.create(
+                title=f'Группа {author.pk}',
+                slug=f'group-{author.pk}',
+                description='-',
+            )
+            Post.objects.create(author=author, group=group, text='Текст')
+
+    def changelist_queries(self):
+        url = reverse('admin:posts_post_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries], response
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк"""
+        self.add_posts(2)
+        few, _ = self.changelist_queries()
+        self.add_posts(10)
+        many, _ = self.changelist_queries()
+        self.assertEqual(len(few), len(many))
+        counts = [sql for sql in many if 'COUNT(' in sql]
+        self.assertTrue(counts)
+        for sql in counts:
+            self.assertIn('LIMIT', sql)
+
+    def test_group_column_uses_autocomplete(self):
+        """Колонка группы - автокомплит только с выбранной группой"""
+        self.add_posts(1)
+        _, response = self.changelist_queries()
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, 'Группа ')
+        self.assertNotContains(response, self.unused_group.title)
+
+    def test_date_filter(self):
+        """Фильтр по дате публикации работает диапазоном"""
+        self.add_posts(1)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'),
+            {'pub_date__gte': '2000-01-01', 'pub_date__lt': '2000-01-02'},
+        )
+        self.assertEqual(response.context['cl'].result_count, 0)
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..benchmark import Benchmark, compare, percentile
+from ..management.commands.benchmark_views import Command
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class BenchmarkMathTests(TestCase):
+    def test_percentile(self):
+        """Процентиль считается по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 99), 5)
+
+    def test_compare_reports_regressions(self):
+        """Регрессией считается рост времени сверх допуска и любых запросов"""
+        baseline = {
+            'index@1': {'p50_ms': 10, 'p99_ms': 20, 'queries': 2},
+        }
+        self.assertEqual(
+            compare(
+                {
+                    'index@1': {
+                        'p50_ms': 12,
+                        'p99_ms': 20,
+                        'queries': 2,
+                        'peak_kb': 100,
+                    }
+                },
+                baseline,
+                tolerance=0.25,
+            ),
+            [],
+        )
+        self.assertEqual(
+            compare(
+                {
+                    'index@1': {
+                        'p50_ms': 13,
+                        'p99_ms': 20,
+                        'queries': 3,
+                        'peak_kb': 100,
+                    },
+                    'profile@1': {
+                        'p50_ms': 99,
+                        'p99_ms': 99,
+                        'queries': 9,
+                        'peak_kb': 100,
+                    },
+                },
+                baseline,
+                tolerance=0.25,
+            ),
+            ['index@1: p50_ms 13 > 10', 'index@1: queries 3 > 2'],
+        )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_DIR,
+    SEARCH_INDEX=os.path.join(TEMP_DIR, 'search.sqlite3'),
+)
+class BenchmarkRunTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def test_run_measures_every_page(self):
+        """Замеры проходят по всем страницам и глубинам листания"""
+        cache.clear()
+        with open(os.devnull, 'w') as devnull:
+            call_command(
+                'generate_load_data',
+                users=20,
+                posts_per_author='const:6',
+                follows_per_user='const:10',
+                comments_per_post='const:1',
+                images=0,
+                seed=1,
+                stdout=devnull,
+            )
+        results = Benchmark(depths=[1, 2], iterations=3).run()
+        self.assertEqual(
+            set(results),
+            {
+                'index@1',
+                'index@2',
+                'group_list@1',
+                'group_list@2',
+                'profile@1',
+                'post_detail@1',
+                'follow_index@1',
+                'follow_index@2',
+            },
+        )
+        # пост и страница комментариев берутся из кеша
+        self.assertEqual(results.pop('post_detail@1')['queries'], 0)
+        for metrics in results.values():
+            self.assertGreater(metrics['queries'], 0)
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+    def test_command_uses_separate_cache(self):
+        """Команда замеров очищает свой кеш, а не рабочий"""
+        cache.set('marker', 1)
+
+        def run(benchmark):
+            cache.set('marker', 2)
+            cache.clear()
+            return {}
+
+        with mock.patch.object(Command, 'run', side_effect=run):
+            call_command(
+                'benchmark_views', '--current-db', '--cold', stdout=StringIO()
+            )
+        self.assertEqual(cache.get('marker'), 1)
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import moderation
+from ..consts import COMMENTS_NUMBERS
+from ..counters import recount
+from ..models import Comment, Post, User
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        # одно время создания у всех: порядок держится на id
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Комментарий {n}.')
+            for n in range(COMMENTS_NUMBERS * 2 + 1)
+        )
+        recount()
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.more_url = reverse('posts:comments', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_load_more_walks_all_comments(self):
+        """Кнопка «Показать еще» проходит все комментарии по порядку"""
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Комментарий 0.')
+        self.assertNotContains(response, f'Комментарий {COMMENTS_NUMBERS}.')
+        cursor = response.context['comments']['next_cursor']
+        self.assertContains(response, f'{self.more_url}?cursor={cursor}')
+        page = self.client.get(self.more_url, {'cursor': cursor}).json()
+        self.assertIn(f'Комментарий {COMMENTS_NUMBERS}.', page['html'])
+        self.assertNotIn('Комментарий 0.', page['html'])
+        page = self.client.get(page['next']).json()
+        self.assertEqual(page['html'].count('media-body'), 1)
+        self.assertIsNone(page['next'])
+
+    def test_bad_cursor_gives_first_page(self):
+        """Битый курсор ведет на первую страницу"""
+        page = self.client.get(self.more_url, {'cursor': 'мусор'}).json()
+        self.assertIn('Комментарий 0.', page['html'])
+        response = self.client.get(
+            reverse('posts:comments', args=[self.post.pk + 1])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_page_is_invalidated(self):
+        """Кеш страницы сбрасывают модерация и переименование автора"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+        moderation.hide_comments(Comment.objects.filter(text='Комментарий 1.'))
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Комментарий 1.')
+        self.author.username = 'renamed'
+        self.author.save()
+        response = self.client.get(self.url)
+        self.assertNotContains(
+            response, reverse('posts:profile', args=['author'])
+        )
+
+    def test_add_comment_invalidates_page(self):
+        """Новый комментарий сразу виден на странице поста"""
+        post = Post.objects.create(text='Тихий пост', author=self.author)
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.client.get(url)
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('posts:add_comment', args=[post.pk]), {'text': 'Новый'}
+        )
+        self.assertContains(self.client.get(url), 'Новый')
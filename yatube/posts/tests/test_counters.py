@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..counters import recount
+from ..models import Comment, Post, User, UserStats
+from ..consts import COMMENTS_NUMBERS
+
+
+TEXT = 'Тут какой-то текст:)'
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text=TEXT, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_posts_count_follows_creates_and_deletes(self):
+        """Счетчик постов автора меняется при создании и удалении"""
+        self.authorized_client.post(reverse('posts:create'), {'text': TEXT})
+        self.assertEqual(self.user.stats.posts_count, 2)
+        Post.objects.filter(author=self.user).delete()
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, 0)
+
+    def test_comments_count_follows_creates_and_deletes(self):
+        """Счетчик комментариев поста меняется при создании и удалении"""
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': TEXT},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        Comment.objects.all().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_recount_restores_counters(self):
+        """recount исправляет счетчики после массовой вставки"""
+        Post.objects.bulk_create(
+            [Post(text=TEXT, author=self.user) for _ in range(3)]
+        )
+        Comment.objects.bulk_create(
+            [Comment(text=TEXT, author=self.user, post=self.post)]
+        )
+        recount()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 4)
+
+    def test_post_detail_does_not_count_on_render(self):
+        """Страница поста без COUNT(*), повторно - вообще без базы"""
+        Comment.objects.bulk_create(
+            [
+                Comment(text=TEXT, author=self.user, post=self.post)
+                for _ in range(COMMENTS_NUMBERS + 1)
+            ]
+        )
+        recount()
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(comments['count'], COMMENTS_NUMBERS)
+        self.assertContains(response, 'Всего постов автора: 1')
+        response = self.client.get(
+            url, {'comments_cursor': comments['next_cursor']}
+        )
+        self.assertEqual(response.context['comments']['count'], 1)
@@ -0,0 +1,152 @@
+import asyncio
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import asgi
+from ..events import (
+    INDEX_CHANNEL,
+    Broker,
+    Subscriber,
+    author_channel,
+    broker,
+    format_batch,
+)
+from ..models import Follow, Post, User
+
+
+def run_on_commit(func):
+    func()
+
+
+class BrokerTests(TestCase):
+    def test_publish_reaches_subscribed_channels_once(self):
+        """Событие получает каждый подписчик одного из каналов, один раз"""
+        broker = Broker()
+        everyone = broker.subscribe([INDEX_CHANNEL, author_channel(1)])
+        follower = broker.subscribe([author_channel(1)])
+        stranger = broker.subscribe([author_channel(2)])
+        broker.publish([INDEX_CHANNEL, author_channel(1)], {'id': 7})
+        self.assertEqual(everyone.wait(0), ([{'id': 7}], 0))
+        self.assertEqual(follower.wait(0), ([{'id': 7}], 0))
+        self.assertEqual(stranger.wait(0), ([], 0))
+        broker.unsubscribe(stranger)
+        self.assertEqual(len(broker), 2)
+
+    def test_queue_is_bounded(self):
+        """Медленный подписчик хранит только последние события"""
+        subscriber = Subscriber([INDEX_CHANNEL], size=3)
+        for number in range(5):
+            subscriber.put({'id': number})
+        events, dropped = subscriber.wait(0)
+        self.assertEqual([event['id'] for event in events], [2, 3, 4])
+        self.assertEqual(dropped, 2)
+        self.assertIn(b'event: overflow', format_batch(events, dropped))
+
+    def test_async_wait_wakes_on_publish(self):
+        """Асинхронное ожидание просыпается от публикации"""
+        subscriber = Subscriber([INDEX_CHANNEL])
+
+        async def wait():
+            waiter = asyncio.ensure_future(subscriber.wait_async(10))
+            await asyncio.sleep(0)
+            subscriber.put({'id': 1})
+            return await waiter
+
+        self.assertEqual(asyncio.run(wait()), ([{'id': 1}], 0))
+
+
+@override_settings(LIVE_UPDATES=True)
+@mock.patch('posts.events.transaction.on_commit', run_on_commit)
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def read(self, response):
+        """Первое сообщение потока после заголовка retry."""
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b'retry:'))
+        return next(chunks)
+
+    def test_new_post_is_pushed_to_index_stream(self):
+        """Новый пост приходит в поток общей ленты"""
+        response = self.client.get(reverse('posts:events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.client.force_login(self.author)
+        self.client.post(reverse('posts:create'), {'text': 'Новый пост'})
+        post = Post.objects.get()
+        data = f'{{"id": {post.pk}, "author": {self.author.pk}}}'
+        self.assertEqual(
+            self.read(response),
+            f'id: {post.pk}\nevent: post\ndata: {data}\n\n'.encode(),
+        )
+        response.close()
+        self.assertEqual(len(broker), 0)
+
+    def test_follow_stream_only_has_followed_authors(self):
+        """Поток ленты подписок получает посты только своих авторов"""
+        self.assertEqual(
+            self.client.get(reverse('posts:follow_events')).status_code, 302
+        )
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:follow_events'))
+        Post.objects.create(author=self.reader, text='Свой пост')
+        post = Post.objects.create(author=self.author, text='Пост автора')
+        self.assertIn(f'id: {post.pk}\n'.encode(), self.read(response))
+        response.close()
+
+    def test_live_updates_on_first_page(self):
+        """Первая страница ленты подключается к потоку новых постов"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, reverse('posts:events'))
+
+
+class LiveUpdatesOffTests(TestCase):
+    def test_streams_are_off_by_default(self):
+        """Без LIVE_UPDATES лента не открывает поток, а поток отвечает 204"""
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')), reverse('posts:events')
+        )
+        self.client.force_login(User.objects.create_user(username='reader'))
+        for name in ('posts:events', 'posts:follow_events'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 204)
+        self.assertEqual(len(broker), 0)
+
+
+@override_settings(LIVE_UPDATES=True)
+class ASGIEventStreamTests(TransactionTestCase):
+    def test_stream_through_asgi_until_disconnect(self):
+        """ASGI отдает поток из цикла событий и закрывает его при отключении"""
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            if not sent:
+                return {'type': 'http.request', 'body': b''}
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if message.get('body', b'').startswith(b'retry:'):
+                broker.publish([INDEX_CHANNEL], {'id': 5})
+            elif message.get('body', b'').startswith(b'id: 5'):
+                disconnect.set()
+
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('posts:events'),
+            'headers': [(b'host', b'testserver')],
+        }
+        application = asgi.get_asgi_application()
+        asyncio.run(asyncio.wait_for(application(scope, receive, send), 5))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(
+            [message.get('more_body') for message in sent[1:]], [True, True]
+        )
+        self.assertEqual(len(broker), 0)
@@ -1,11 +1,15 @@
+import io
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.test import Client, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
+from PIL import Image
 
+from ..consts import IMAGE_MAX_SIDE
 from ..forms import PostForm
 from ..models import Group, Post, User
 
@@ -66,7 +70,7 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group, self.group)
         self.assertEqual(post.author, self.user)
-        self.assertEqual(post.image.name, f'posts/{uploaded.name}')
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w\w/\w{64}\.gif$')
 
     def test_edit_post(self):
         """Валидная форма правит существующий пост"""
@@ -97,4 +101,105 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group, self.group)
         self.assertEqual(post.author, self.user)
-        self.assertEqual(post.image.name, f'posts/{uploaded.name}')
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w\w/\w{64}\.gif$')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=AUTHOR)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, content, name='photo.jpg'):
+        return self.authorized_client.post(
+            reverse('posts:create'),
+            data={
+                'text': TEXT,
+                'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+            },
+        )
+
+    def make_jpeg(self, size):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'blue').save(buffer, 'JPEG', exif=exif)
+        return buffer.getvalue()
+
+    def test_oversized_original_is_downscaled_without_metadata(self):
+        """Большой оригинал уменьшается и сохраняется без EXIF"""
+        self.upload(self.make_jpeg((IMAGE_MAX_SIDE * 2, 100)))
+        post = Post.objects.get(author=self.user)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (IMAGE_MAX_SIDE, 50))
+            self.assertEqual(len(image.getexif()), 0)
+            self.assertEqual(image.format, 'JPEG')
+
+    def test_animation_keeps_all_frames(self):
+        """Анимированный GIF уменьшается всеми кадрами, без комментария"""
+        frames = [
+            Image.new('RGB', (IMAGE_MAX_SIDE * 2, 20), color)
+            for color in ('red', 'green', 'blue')
+        ]
+        buffer = io.BytesIO()
+        frames[0].save(
+            buffer,
+            'GIF',
+            save_all=True,
+            append_images=frames[1:],
+            duration=[100, 200, 300],
+            loop=0,
+            comment=b'Camera',
+        )
+        self.upload(buffer.getvalue(), name='anim.gif')
+        post = Post.objects.get(author=self.user)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'GIF')
+            self.assertEqual(image.size, (IMAGE_MAX_SIDE, 10))
+            self.assertEqual(image.n_frames, 3)
+            self.assertEqual(image.info['loop'], 0)
+            self.assertNotIn('comment', image.info)
+            durations = []
+            for frame in range(image.n_frames):
+                image.seek(frame)
+                durations.append(image.info['duration'])
+            self.assertEqual(durations, [100, 200, 300])
+
+    def test_too_many_pixels_are_rejected_before_decoding(self):
+        """Картинка с большим разрешением не декодируется и не сохраняется"""
+        with mock.patch('posts.uploads.IMAGE_UPLOAD_MAX_PIXELS', 99):
+            with mock.patch('PIL.ImageFile.ImageFile.load') as load:
+                response = self.upload(self.make_jpeg((10, 10)))
+        load.assert_not_called()
+        self.assertFormError(
+            response,
+            'form',
+            'image',
+            'Слишком большое разрешение картинки.',
+        )
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+
+    def test_too_large_file_is_rejected(self):
+        """Файл больше лимита отклоняется"""
+        with mock.patch('posts.uploads.IMAGE_UPLOAD_MAX_SIZE', 10):
+            response = self.upload(self.make_jpeg((10, 10)))
+        self.assertTrue(
+            response.context['form'].has_error('image', 'too_large')
+        )
+
+    def test_not_an_image_is_rejected(self):
+        """Файл, не являющийся картинкой, отклоняется по заголовку"""
+        response = self.upload(b'not an image', name='text.jpg')
+        self.assertTrue(
+            response.context['form'].has_error('image', 'invalid_image')
+        )
@@ -0,0 +1,123 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import graph
+from ..counters import recount, recount_follows
+from ..models import Follow, User, UserStats
+
+
+def run_on_commit(func):
+    func()
+
+
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+class SocialGraphTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ann, self.bob, self.eve = (
+            User.objects.create_user(username=name)
+            for name in ('ann', 'bob', 'eve')
+        )
+        for user, author in (
+            (self.ann, self.bob),
+            (self.bob, self.ann),
+            (self.ann, self.eve),
+            (self.eve, self.bob),
+        ):
+            Follow.objects.create(user=user, author=author)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counts_follow_writes(self):
+        """Подписка, отписка и удаление пользователя меняют счетчики"""
+        self.assertEqual(self.stats(self.ann).following_count, 2)
+        self.assertEqual(self.stats(self.bob).followers_count, 2)
+        Follow.objects.filter(user=self.ann, author=self.bob).delete()
+        self.assertEqual(self.stats(self.ann).following_count, 1)
+        self.assertEqual(self.stats(self.bob).followers_count, 1)
+        self.eve.delete()
+        self.assertEqual(self.stats(self.ann).following_count, 0)
+        self.assertEqual(self.stats(self.bob).followers_count, 0)
+        self.assertEqual(self.stats(self.bob).following_count, 1)
+
+    def test_recount_restores_counts(self):
+        """Пересчет восстанавливает счетчики после bulk_create"""
+        Follow.objects.bulk_create([Follow(user=self.bob, author=self.eve)])
+        UserStats.objects.filter(user=self.ann).delete()
+        recount_follows([self.ann.pk, self.bob.pk, self.eve.pk])
+        self.assertEqual(self.stats(self.ann).following_count, 2)
+        self.assertEqual(self.stats(self.bob).following_count, 2)
+        self.assertEqual(self.stats(self.eve).followers_count, 2)
+        UserStats.objects.update(followers_count=0, following_count=0)
+        recount()
+        self.assertEqual(self.stats(self.eve).followers_count, 2)
+        self.assertEqual(self.stats(self.ann).followers_count, 1)
+
+    def test_queries_from_cache(self):
+        """Подписки, подписчики и взаимность читаются из кеша"""
+        ann, bob, eve = self.ann.pk, self.bob.pk, self.eve.pk
+        graph.mutuals(ann)
+        graph.following(bob)
+        graph.following(eve)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(graph.following(ann)), sorted([bob, eve]))
+            self.assertEqual(list(graph.followers(ann)), [bob])
+            self.assertTrue(graph.follows(ann, eve))
+            self.assertFalse(graph.follows(eve, ann))
+            self.assertTrue(graph.is_mutual(ann, bob))
+            self.assertFalse(graph.is_mutual(ann, eve))
+            self.assertEqual(graph.mutuals(ann), [bob])
+
+    def test_follow_writes_invalidate(self):
+        """Подписка и отписка сразу видны в графе"""
+        self.assertFalse(graph.follows(self.eve.pk, self.ann.pk))
+        Follow.objects.create(user=self.eve, author=self.ann)
+        self.assertTrue(graph.follows(self.eve.pk, self.ann.pk))
+        self.assertEqual(graph.mutuals(self.eve.pk), [self.ann.pk])
+        Follow.objects.filter(user=self.bob).delete()
+        self.assertEqual(list(graph.followers(self.ann.pk)), [self.eve.pk])
+        Follow.objects.bulk_create([Follow(user=self.bob, author=self.eve)])
+        graph.invalidate_all()
+        self.assertTrue(graph.follows(self.bob.pk, self.eve.pk))
+
+    def test_invalidates_after_commit(self):
+        """Граф сбрасывается только после коммита подписки"""
+        self.assertFalse(graph.follows(self.eve.pk, self.ann.pk))
+        callbacks = []
+        with mock.patch(
+            'posts.signals.transaction.on_commit', callbacks.append
+        ):
+            Follow.objects.create(user=self.eve, author=self.ann)
+        self.assertFalse(graph.follows(self.eve.pk, self.ann.pk))
+        for callback in callbacks:
+            callback()
+        self.assertTrue(graph.follows(self.eve.pk, self.ann.pk))
+
+    @mock.patch('posts.graph.GRAPH_CHUNK_IDS', 1)
+    def test_long_arrays_are_chunked(self):
+        """Длинный массив хранится в кеше частями"""
+        ann, bob, eve = self.ann.pk, self.bob.pk, self.eve.pk
+        Follow.objects.filter(user=self.eve).delete()
+        graph.following(ann)
+        graph.following(eve)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(graph.following(ann)), sorted([bob, eve]))
+            self.assertEqual(list(graph.following(eve)), [])
+
+    def test_profile_shows_counts(self):
+        """Профиль показывает счетчики и взаимную подписку"""
+        self.client.force_login(self.ann)
+        response = self.client.get(reverse('posts:profile', args=['bob']))
+        self.assertContains(response, 'Подписчиков: 2')
+        self.assertContains(response, 'Взаимная подписка')
+        self.assertTrue(response.context['following'])
+        response = self.client.get(reverse('posts:profile', args=['eve']))
+        self.assertContains(response, 'Подписан на вас', count=0)
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse('posts:profile', args=['eve']))
+        self.assertContains(response, 'Подписан на вас')
+        self.assertFalse(response.context['following'])
@@ -0,0 +1,93 @@
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..consts import IMAGE_VARIANT_WIDTHS
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, width=1000, height=500):
+        with mock.patch('posts.images.run_in_background') as run:
+            post = Post.objects.create(
+                text='Пост с картинкой',
+                author=self.user,
+                image=SimpleUploadedFile(
+                    'photo.jpg', make_jpeg(width, height), 'image/jpeg'
+                ),
+            )
+        self.assertEqual(
+            run.call_args.args[1:],
+            (images.build_variants, post.image.name),
+        )
+        return post
+
+    def test_variants_cover_widths_and_formats(self):
+        """Варианты создаются для каждой ширины не шире исходника"""
+        post = self.create_post()
+        images.build_variants(post.image.name)
+        post.refresh_from_db()
+        variants = images.load_variants(post)
+        formats = images.supported_formats()
+        self.assertIn('image/webp', [fmt[1] for fmt in formats])
+        widths = [width for width in IMAGE_VARIANT_WIDTHS if width <= 1000]
+        self.assertEqual(
+            [(variant['width'], variant['type']) for variant in variants],
+            [(width, fmt[1]) for width in widths for fmt in formats],
+        )
+        self.assertEqual(variants[0]['height'], 113)
+        with Image.open(f'{TEMP_MEDIA_ROOT}/{variants[0]["name"]}') as variant:
+            self.assertEqual(variant.size, (320, 113))
+
+    def test_replaced_image_drops_stale_variants(self):
+        """Варианты старой картинки не выводятся для новой"""
+        post = self.create_post()
+        post.image_variants = json.dumps(
+            {'source': 'posts/old.jpg', 'variants': [{'name': 'old'}]}
+        )
+        self.assertEqual(images.load_variants(post), [])
+
+    def test_feed_renders_picture_when_variants_are_ready(self):
+        """Лента выводит <picture> со srcset, пока нет - оригинал"""
+        post = self.create_post()
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, '<picture>')
+        self.assertContains(response, post.image.url)
+        images.build_variants(post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '320.webp 320w, ')
+        self.assertContains(response, '960.jpg 960w')
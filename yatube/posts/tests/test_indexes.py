@@ -0,0 +1,40 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.test import TestCase
+
+from ..consts import POSTS_NUMBERS
+from ..models import Follow, Post, User
+from ..paginators import CursorPaginator
+
+
+class FeedIndexesTests(TestCase):
+    def test_follow_pair_is_unique(self):
+        """Повторная подписка на того же автора запрещена в базе"""
+        user = User.objects.create_user(username='user')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
+
+    def test_feed_queries_do_not_scan_whole_table(self):
+        """Запросы лент не читают таблицу целиком и не сортируют без индекса"""
+        out = StringIO()
+        call_command('check_feed_indexes', stdout=out)
+        self.assertNotIn('FULL SCAN', out.getvalue())
+        self.assertNotIn('SORT', out.getvalue())
+
+    def test_sort_without_index_fails(self):
+        """Сортировка без индекса считается ошибкой"""
+        paginator = CursorPaginator(
+            Post.objects.feed().filter(author_id__in=[1, 2]), POSTS_NUMBERS
+        )
+        out = StringIO()
+        with mock.patch(
+            'posts.management.commands.check_feed_indexes.feed_paginators',
+            return_value={'two_authors': paginator},
+        ), self.assertRaises(CommandError):
+            call_command('check_feed_indexes', stdout=out)
+        self.assertIn('SORT', out.getvalue())
@@ -0,0 +1,109 @@
+import argparse
+import os
+import random
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from ..images import load_variants
+from ..loadgen import parse_distribution
+from ..models import (
+    Blob,
+    Comment,
+    Follow,
+    Group,
+    Post,
+    TimelineEntry,
+    User,
+)
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_DIR,
+    SEARCH_INDEX=os.path.join(TEMP_DIR, 'search.sqlite3'),
+)
+class LoadGeneratorTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def generate(self, **options):
+        options = {
+            'users': 30,
+            'groups': 2,
+            'posts_per_author': 'uniform:1:3',
+            'follows_per_user': 'const:5',
+            'comments_per_post': 'const:2',
+            'images': 2,
+            'image_ratio': 0.5,
+            'seed': 1,
+            **options,
+        }
+        with open(os.devnull, 'w') as devnull:
+            call_command('generate_load_data', stdout=devnull, **options)
+
+    def test_distributions(self):
+        """Строки распределений разбираются и проверяются"""
+        rng = random.Random(1)
+        self.assertEqual(parse_distribution('const:3')(rng), 3)
+        self.assertIn(parse_distribution('uniform:1:2')(rng), (1, 2))
+        values = [parse_distribution('pareto:1.2:50')(rng) for _ in range(500)]
+        self.assertLessEqual(max(values), 50)
+        self.assertLess(sorted(values)[250], 5)
+        for spec in ('normal:1', 'const', 'uniform:a:b', 'pareto:0:5'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_distribution(spec)
+
+    def test_generated_data_is_consistent(self):
+        """Данные создаются пачками, производные данные пересчитаны"""
+        self.generate()
+        users = User.objects.filter(username__startswith='load_')
+        self.assertEqual(users.count(), 30)
+        posts = Post.objects.all()
+        self.assertTrue(30 <= posts.count() <= 90)
+        self.assertEqual(Comment.objects.count(), posts.count() * 2)
+        follows = Follow.objects.all()
+        self.assertTrue(follows.exists())
+        self.assertFalse(follows.filter(user=F('author')).exists())
+        self.assertEqual(posts.filter(fanned_out=False).count(), 0)
+        entries = sum(
+            Follow.objects.filter(author_id=post.author_id).count()
+            for post in posts
+        )
+        self.assertEqual(TimelineEntry.objects.count(), entries)
+        user = users.first()
+        self.assertEqual(
+            user.stats.posts_count, posts.filter(author=user).count()
+        )
+        self.assertEqual(
+            sum(Blob.objects.values_list('refcount', flat=True)),
+            posts.exclude(image='').count(),
+        )
+        self.assertGreater(
+            len(set(posts.values_list('pub_date', flat=True))), 1
+        )
+        for post in posts.exclude(image=''):
+            self.assertTrue(load_variants(post), post.image.name)
+        self.assertEqual(
+            Group.objects.filter(slug__startswith='load-').count(), 2
+        )
+
+    def test_seed_makes_generation_repeatable(self):
+        """С одинаковым зерном получаются одинаковые объемы данных"""
+        self.generate()
+        first = (Post.objects.count(), Follow.objects.count())
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        self.generate()
+        self.assertEqual((Post.objects.count(), Follow.objects.count()), first)
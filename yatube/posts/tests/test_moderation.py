@@ -0,0 +1,194 @@
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import moderation
+from ..models import Blob, Comment, Follow, Group, Post, TimelineEntry, User
+from ..search import get_index
+from .test_storage import SMALL_GIF
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def run_now(key, func, *args):
+    func(*args)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_DIR,
+    SEARCH_INDEX=os.path.join(TEMP_DIR, 'search.sqlite3'),
+)
+@mock.patch('posts.images.run_in_background')
+@mock.patch('posts.blobs.run_in_background', run_now)
+class ModerationTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        get_index().clear()
+        self.spammer = User.objects.create_user(username='spammer')
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.spammer)
+        self.spam = [
+            Post.objects.create(
+                text=f'Спам {number}',
+                author=self.spammer,
+                image=SimpleUploadedFile('spam.gif', SMALL_GIF, 'image/gif'),
+            )
+            for number in range(5)
+        ]
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        for post in (*self.spam, self.post):
+            Comment.objects.create(post=post, author=self.spammer, text='Спам')
+            Comment.objects.create(post=post, author=self.author, text='Ок')
+
+    def feed(self):
+        return list(Post.objects.feed())
+
+    def test_delete_posts_in_chunks(self, _):
+        """Удаление кусками забирает комментарии, ленты и картинку"""
+        path = self.spam[0].image.path
+        progress = []
+        deleted = moderation.delete_posts(
+            moderation.select(Post, author='spammer'), 2, progress.append
+        )
+        self.assertEqual(deleted, 5)
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(self.feed(), [self.post])
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+        self.spammer.stats.refresh_from_db()
+        self.assertEqual(self.spammer.stats.posts_count, 0)
+        self.assertEqual(get_index().search('"спам"', 10), [])
+
+    def test_hide_and_unhide_posts(self, _):
+        """Скрытые посты пропадают из лент, поиска и счетчиков"""
+        spam = moderation.select(Post, text='Спам')
+        self.assertEqual(moderation.hide_posts(spam, size=3), 5)
+        self.assertEqual(self.feed(), [self.post])
+        self.assertEqual(get_index().search('"спам"', 10), [])
+        self.spammer.stats.refresh_from_db()
+        self.assertEqual(self.spammer.stats.posts_count, 0)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.spam[0].pk])
+        )
+        self.assertEqual(response.status_code, 404)
+        moderation.hide_posts(spam, hidden=False)
+        self.assertEqual(len(self.feed()), 6)
+        self.spammer.stats.refresh_from_db()
+        self.assertEqual(self.spammer.stats.posts_count, 5)
+
+    def test_move_posts_bumps_fragments(self, _):
+        """Перенос в группу сбрасывает кеш отрисованных постов"""
+        group = Group.objects.create(title='Спам', slug='spam', description='')
+        group_url = reverse('posts:group_list', args=['spam'])
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')), group_url
+        )
+        moved = moderation.move_posts(
+            moderation.select(Post, author='spammer'), group, 2
+        )
+        self.assertEqual(moved, 5)
+        self.assertEqual(group.posts.count(), 5)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), group_url, count=5
+        )
+
+    def test_comments_recount_posts(self, _):
+        """Скрытие и удаление комментариев пересчитывает их посты"""
+        spam = moderation.select(Comment, author='spammer')
+        self.assertEqual(moderation.hide_comments(spam, size=4), 6)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(moderation.delete_comments(spam, size=4), 6)
+        moderation.hide_comments(Comment.objects.all(), hidden=False)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(Comment.objects.count(), 6)
+
+    def test_select_by_dates(self, _):
+        """Даты выборки - начало дня, верхняя граница не включается"""
+        Post.objects.filter(pk=self.post.pk).update(
+            pub_date=timezone.make_aware(datetime.datetime(2020, 5, 1, 12))
+        )
+        selected = moderation.select(
+            Post,
+            since=datetime.date(2020, 5, 1),
+            until=datetime.date(2020, 5, 2),
+        )
+        self.assertEqual(list(selected), [self.post])
+
+    def test_command(self, _):
+        """Команда moderate сообщает о ходе работы"""
+        out = StringIO()
+        call_command(
+            'moderate', 'hide', author='spammer', chunk_size=2, stdout=out
+        )
+        self.assertEqual(
+            out.getvalue().splitlines(),
+            [
+                'Подходящих строк: 5',
+                'Обработано: 2 из 5',
+                'Обработано: 4 из 5',
+                'Обработано: 5 из 5',
+                'Готово: 5',
+            ],
+        )
+        out = StringIO()
+        call_command(
+            'moderate', 'delete', comments=True, text='Спам', stdout=out
+        )
+        self.assertIn('Готово: 6', out.getvalue())
+        self.assertEqual(Comment.objects.count(), 6)
+
+    def test_admin_actions(self, _):
+        """Действия админки: поиск по @автору, подтверждение, перенос"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        url = reverse('admin:posts_post_changelist') + '?q=%40spammer'
+        response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count, 5)
+        actions = response.context['action_form'].fields['action'].choices
+        self.assertNotIn('delete_selected', dict(actions))
+        data = {
+            'action': 'move_posts',
+            'index': 0,
+            'select_across': 1,
+            ACTION_CHECKBOX_NAME: [self.spam[0].pk],
+        }
+        response = self.client.post(url, data)
+        self.assertTemplateUsed(
+            response, 'admin/posts/moderation_confirmation.html'
+        )
+        self.assertEqual(response.context['count'], 5)
+        group = Group.objects.create(title='Спам', slug='spam', description='')
+        del data['index']
+        data.update(confirm='yes', group='spam')
+        response = self.client.post(url, data)
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(group.posts.count(), 5)
+        self.assertIsNone(Post.objects.get(pk=self.post.pk).group_id)
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'), {'q': '@spammer'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 6)
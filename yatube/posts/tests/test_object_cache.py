@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import object_cache
+from ..models import Group, Post, User
+
+
+TEXT = 'Тут какой-то текст:)'
+NEW_TEXT = 'Исправленный текст'
+
+
+class ObjectCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(slug='slug', title='Группа')
+        cls.post = Post.objects.create(
+            text=TEXT, author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_author_cache_keeps_only_public_fields(self):
+        """В кеш автора не попадают пароль, почта и права"""
+        author = object_cache.authors.get(pk=self.user.pk)
+        author = object_cache.authors.get(pk=self.user.pk)
+        self.assertTrue(
+            {'password', 'email', 'is_staff', 'is_superuser'}
+            <= author.get_deferred_fields()
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(author.username, self.user.username)
+            self.assertEqual(author.stats.posts_count, 1)
+
+    def test_warm_lookups_do_not_hit_database(self):
+        """Повторный поиск по slug, username и id идет в кеш"""
+        object_cache.groups.get(slug=self.group.slug)
+        object_cache.groups.get(slug=self.group.slug)
+        object_cache.authors.get(username=self.user.username)
+        object_cache.authors.get(username=self.user.username)
+        object_cache.get_post_or_404(self.post.id)
+        with self.assertNumQueries(0):
+            group = object_cache.groups.get(slug=self.group.slug)
+            author = object_cache.authors.get(username=self.user.username)
+            post = object_cache.get_post_or_404(self.post.id)
+        self.assertEqual(group, self.group)
+        self.assertEqual(author, self.user)
+        self.assertEqual(post.group, self.group)
+
+    def test_post_edit_is_visible_immediately(self):
+        """После правки поста страница поста не отдает старый текст"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.assertContains(self.client.get(url), TEXT)
+        self.authorized_client.post(
+            reverse('posts:edit', kwargs={'post_id': self.post.id}),
+            {'text': NEW_TEXT},
+        )
+        self.assertContains(self.client.get(url), NEW_TEXT)
+
+    def test_renamed_and_deleted_objects_are_not_served(self):
+        """Старый slug и удаленный пост дают 404"""
+        group = Group.objects.create(slug='old_slug')
+        old_url = reverse('posts:group_list', kwargs={'slug': group.slug})
+        self.client.get(old_url)
+        self.client.get(old_url)
+        group.slug = 'new_slug'
+        group.save()
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        post = Post.objects.create(text=TEXT, author=self.user)
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        self.client.get(url)
+        post.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import build_query, get_index
+from ..stemmer import stem
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(SEARCH_INDEX=os.path.join(TEMP_DIR, 'search.sqlite3'))
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        get_index().clear()
+
+    def create_post(self, text):
+        return Post.objects.create(text=text, author=self.user)
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return list(response.context['page_obj'])
+
+    def test_stemmer_merges_word_forms(self):
+        """Разные формы слова сводятся к одной основе"""
+        self.assertEqual(stem('кошки'), stem('кошкой'))
+        self.assertEqual(stem('гуляли'), stem('гуляет'))
+        self.assertEqual(build_query('Кошки, кошка!'), '"кошк"')
+
+    def test_search_finds_other_word_forms(self):
+        """Поиск находит пост по другой форме слова"""
+        post = self.create_post('Кошка гуляет по крыше')
+        self.create_post('Собака лает')
+        self.assertEqual(self.search('кошки гуляли'), [post])
+        self.assertEqual(self.search('жираф'), [])
+
+    def test_edit_and_delete_update_index(self):
+        """Правка и удаление поста сразу видны в поиске"""
+        post = self.create_post('Старый текст')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.search('старый'), [])
+        self.assertEqual(self.search('новый'), [post])
+        post.delete()
+        self.assertEqual(self.search('новый'), [])
+
+    def test_results_are_ranked_by_relevance(self):
+        """Выше идут более точные совпадения"""
+        diluted = self.create_post(
+            'Кошка и еще очень много других слов в этом длинном посте'
+        )
+        exact = self.create_post('Кошка')
+        self.assertEqual(self.search('кошка'), [exact, diluted])
+
+    def test_search_pages_by_cursor(self):
+        """Поиск листается курсором, запрос сохраняется в ссылках"""
+        posts = [self.create_post(f'Пост номер {n}') for n in range(12)]
+        url = reverse('posts:search')
+        response = self.client.get(url, {'q': 'пост'})
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, 12)
+        self.assertEqual(len(page), 10)
+        self.assertContains(
+            response,
+            f'href="?q=%D0%BF%D0%BE%D1%81%D1%82&amp;'
+            f'cursor={page.next_cursor}"',
+        )
+        second = self.search('пост', cursor=page.next_cursor)
+        self.assertEqual(len(second), 2)
+        self.assertEqual(set(page) | set(second), set(posts))
+        response = self.client.get(
+            url, {'q': 'пост', 'cursor': page.next_cursor}
+        )
+        previous = response.context['page_obj'].previous_cursor
+        self.assertEqual(self.search('пост', cursor=previous), list(page))
+        self.assertEqual(self.search('пост', cursor='битый'), list(page))
+
+    def test_count_is_capped(self):
+        """Число найденных постов считается до предела"""
+        for number in range(3):
+            self.create_post(f'Пост номер {number}')
+        with mock.patch('posts.search.SEARCH_COUNT_LIMIT', 2):
+            response = self.client.get(reverse('posts:search'), {'q': 'пост'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertContains(response, 'больше 2')
+
+    def test_rebuild_command_restores_index(self):
+        """Команда rebuild_search_index строит индекс заново"""
+        post = self.create_post('Потерянный пост')
+        get_index().clear()
+        call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.search('потерянный'), [post])
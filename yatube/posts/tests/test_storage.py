@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from .. import images
+from ..models import Blob, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xff\xff\xff\x21\xf9\x04\x00\x00'
+    b'\x00\x00\x00\x2c\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0c'
+    b'\x0a\x00\x3b'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xff\xff\xff', b'\x00\x00\xff')
+
+
+def run_on_commit(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch('posts.images.run_in_background')
+@mock.patch('posts.blobs.transaction.on_commit', run_on_commit)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, content=SMALL_GIF, name='meme.gif'):
+        return Post.objects.create(
+            text='Мем',
+            author=self.user,
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def refcount(self, name):
+        blob = Blob.objects.filter(name=name).first()
+        return blob.refcount if blob else 0
+
+    def test_duplicates_share_one_file(self, run):
+        """Одинаковые картинки хранятся одним файлом"""
+        first = self.create_post(name='meme.gif')
+        second = self.create_post(name='repost.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refcount(first.image.name), 2)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(
+            os.listdir(directory), [os.path.basename(first.image.name)]
+        )
+
+    def test_file_is_deleted_with_last_reference(self, run):
+        """Файл удаляется только вместе с последним постом"""
+        first = self.create_post()
+        second = self.create_post()
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_reuploaded_file_survives_pending_delete(self, run):
+        """Файл, загруженный снова до удаления, остается на месте"""
+        callbacks = []
+        post = self.create_post()
+        path = post.image.path
+        with mock.patch('posts.blobs.transaction.on_commit', callbacks.append):
+            post.delete()
+        self.create_post()
+        for callback in callbacks:
+            callback()
+        self.assertTrue(os.path.exists(path))
+        callbacks.clear()
+        with mock.patch('posts.blobs.transaction.on_commit', callbacks.append):
+            Post.objects.get().delete()
+        # пересохранен, но новый пост еще не зафиксирован
+        storage = Post._meta.get_field('image').storage
+        storage.save(
+            'posts/meme.gif', SimpleUploadedFile('meme.gif', SMALL_GIF)
+        )
+        for callback in callbacks:
+            callback()
+        self.assertTrue(os.path.exists(path))
+
+    def test_replaced_image_releases_old_file(self, run):
+        """Замена картинки в посте освобождает прежний файл"""
+        post = Post.objects.get(pk=self.create_post().pk)
+        old_path = post.image.path
+        post.image = SimpleUploadedFile('new.gif', OTHER_GIF, 'image/gif')
+        post.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(self.refcount(post.image.name), 1)
+
+    def test_duplicate_reuses_variants(self, run):
+        """Варианты картинки-дубликата не кодируются повторно"""
+        first = self.create_post()
+        images.build_variants(first.image.name)
+        second = self.create_post()
+        with mock.patch('posts.images.encode_variants') as encode:
+            images.build_variants(second.image.name)
+        encode.assert_not_called()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(images.load_variants(second))
+        self.assertEqual(
+            images.load_variants(first), images.load_variants(second)
+        )
@@ -0,0 +1,114 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Follow, Post, TimelineEntry, User
+from ..timeline import timeline_page
+
+
+TEXT = 'Тут какой-то текст:)'
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow(self):
+        self.reader_client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.author.username},
+            )
+        )
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост раскладывается в ленты подписчиков"""
+        self.follow()
+        post = Post.objects.create(text=TEXT, author=self.author)
+        self.assertTrue(post.fanned_out)
+        entry = TimelineEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дозаполняет ленту, отписка очищает ее"""
+        post = Post.objects.create(text=TEXT, author=self.author)
+        self.follow()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.reader_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.author.username},
+            )
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(list(timeline_page(self.reader)), [])
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 1)
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора не рассылаются, а читаются напрямую"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text=TEXT, author=self.author)
+        self.assertFalse(post.fanned_out)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(timeline_page(self.reader)), [post])
+
+    def test_bulk_created_posts_are_merged(self):
+        """Пост, созданный без сигналов, виден в ленте до рассылки"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create([Post(text=TEXT, author=self.author)])
+        post = Post.objects.get()
+        self.assertFalse(post.fanned_out)
+        self.assertEqual(list(timeline_page(self.reader)), [post])
+
+    @mock.patch('posts.timeline.TIMELINE_FANOUT_LIMIT', 2)
+    def test_pages_merge_entries_and_popular_authors(self):
+        """Страницы по курсору сливают разосланные посты и посты
+        популярного автора по дате"""
+        popular = User.objects.create_user(username='popular')
+        fan = User.objects.create_user(username='fan')
+        for user in (self.reader, fan):
+            Follow.objects.create(user=user, author=popular)
+        Follow.objects.create(user=self.reader, author=self.author)
+        start = timezone.now() - datetime.timedelta(days=1)
+        posts = []
+        for minute in range(7):
+            post = Post.objects.create(
+                text=TEXT, author=(popular, self.author)[minute % 2]
+            )
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=start + datetime.timedelta(minutes=minute)
+            )
+            TimelineEntry.objects.filter(post=post).update(
+                pub_date=start + datetime.timedelta(minutes=minute)
+            )
+            posts.append(post)
+        hidden = posts.pop(3)
+        Post.objects.filter(pk=hidden.pk).update(hidden=True)
+        expected = [post.pk for post in reversed(posts)]
+        self.assertEqual(TimelineEntry.objects.count(), 3)
+
+        first = timeline_page(self.reader, per_page=4)
+        self.assertEqual([post.pk for post in first], expected[:4])
+        second = timeline_page(self.reader, first.next_cursor, per_page=4)
+        self.assertEqual([post.pk for post in second], expected[4:])
+        self.assertFalse(second.has_next())
+        back = timeline_page(self.reader, second.previous_cursor, per_page=4)
+        self.assertEqual(list(back), list(first))
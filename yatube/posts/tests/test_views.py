@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 from django.urls import reverse
@@ -6,6 +8,7 @@ from django import forms
 
 from ..models import User, Group, Post, Comment, Follow
 from ..consts import POSTS_NUMBERS
+from ..paginators import CursorPaginator
 
 
 USERNAME = 'author'
@@ -70,6 +73,7 @@ class PostPagesTests(TestCase):
         }
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -129,7 +133,7 @@ class PostPagesTests(TestCase):
         )
         post = response.context['post']
         self.check_context(post)
-        comment = response.context['comments'][0]
+        comment = response.context['comment_page'][0]
         self.assertEqual(comment, self.comment)
 
     def test_post_create_show_correct_context(self):
@@ -165,18 +169,34 @@ class PostPagesTests(TestCase):
         self.assertEqual(len(posts), 0)
 
     def test_cache_index_page(self):
-        """Проверка кеширования главной страницы"""
+        """Посты главной берутся из кеша фрагментов, но правки и удаления
+        видны сразу"""
         response = self.authorized_client.get(self.url_address_map['index'])
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        cached_response = self.client.get(self.url_address_map['index'])
+        self.assertContains(cached_response, TEXT)
+        Post.objects.get(pk=self.post.pk).save()
+        fresh_response = self.client.get(self.url_address_map['index'])
+        self.assertContains(fresh_response, 'Без сигналов')
         self.post.delete()
-        cached_response = self.authorized_client.get(
-            self.url_address_map['index']
-        )
-        self.assertEqual(response.content, cached_response.content)
-        cache.clear()
         fresh_response = self.authorized_client.get(
             self.url_address_map['index']
         )
         self.assertNotEqual(response.content, fresh_response.content)
+        self.assertEqual(len(fresh_response.context['page_obj']), 0)
+
+    def test_post_fragments_are_shared_between_readers(self):
+        """Гость и пользователь получают один фрагмент поста,
+        а шапка страницы у каждого своя"""
+        guest_response = self.client.get(self.url_address_map['index'])
+        self.assertTemplateUsed(
+            guest_response, 'includes/posts_rendering.html'
+        )
+        response = self.authorized_client.get(self.url_address_map['index'])
+        self.assertTemplateNotUsed(response, 'includes/posts_rendering.html')
+        self.assertContains(response, TEXT)
+        self.assertContains(response, f'Пользователь: {self.user.username}')
+        self.assertNotContains(guest_response, 'Пользователь:')
 
     def test_authorized_client_can_follow_another_authors(self):
         """Проверка что авторизованный пользователь может подписываться
@@ -253,3 +273,88 @@ class PaginatorViewsTest(TestCase):
             self.assertEqual(
                 len(response.context['page_obj']), self.SECOND_PAGE_COUNT
             )
+
+    def test_cursor_pages_contain_correct_records(self):
+        """Проверка курсорной пагинации вперед и назад"""
+
+        for url_address in self.url_address_lst:
+            with self.subTest(url_address=url_address):
+                response = self.client.get(url_address)
+                first_page = response.context['page_obj']
+                self.assertEqual(len(first_page), POSTS_NUMBERS)
+                self.assertFalse(first_page.has_previous())
+                response = self.client.get(
+                    url_address + f'?cursor={first_page.next_cursor}'
+                )
+                second_page = response.context['page_obj']
+                self.assertEqual(len(second_page), self.SECOND_PAGE_COUNT)
+                self.assertFalse(second_page.has_next())
+                response = self.client.get(
+                    url_address + f'?cursor={second_page.previous_cursor}'
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']), list(first_page)
+                )
+
+    def test_cursor_page_skips_count_query(self):
+        """Курсорная страница читается одним запросом без COUNT"""
+        paginator = CursorPaginator(Post.objects.all(), POSTS_NUMBERS)
+        with self.assertNumQueries(1):
+            page = paginator.cursor_page()
+        with self.assertNumQueries(1):
+            paginator.cursor_page(page.next_cursor)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый курсор ведет на первую страницу"""
+        response = self.client.get(self.url_address_lst[0] + '?cursor=bad')
+        self.assertEqual(len(response.context['page_obj']), POSTS_NUMBERS)
+
+
+class FeedQueriesTest(TestCase):
+    # сессия, пользователь, страница постов и запросы самой ленты
+    MAX_QUERIES = 6
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(slug=SLUG)
+        for i in range(POSTS_NUMBERS):
+            author = User.objects.create_user(username=f'author_{i}')
+            group = Group.objects.create(slug=f'slug_{i}')
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(text=TEXT, author=author, group=group)
+            Post.objects.create(text=TEXT, author=cls.user, group=group)
+            Post.objects.create(text=TEXT, author=author, group=cls.group)
+        cls.url_address_lst = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:follow_index'),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertMaxQueries(self, max_queries, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            response = func(*args, **kwargs)
+        self.assertLessEqual(
+            len(context),
+            max_queries,
+            '\n'.join(query['sql'] for query in context.captured_queries),
+        )
+        return response
+
+    def test_feed_page_query_count_is_bounded(self):
+        """Число запросов страницы ленты не зависит от числа постов"""
+        for url_address in self.url_address_lst:
+            with self.subTest(url_address=url_address):
+                response = self.assertMaxQueries(
+                    self.MAX_QUERIES, self.authorized_client.get, url_address
+                )
+                self.assertEqual(
+                    len(response.context['page_obj']), POSTS_NUMBERS
+                )
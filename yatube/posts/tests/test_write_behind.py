@@ -0,0 +1,232 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import write_behind
+from ..models import Comment, Follow, Post, TimelineEntry, User
+from ..models import WriteLogCheckpoint
+from ..write_behind import COMMENT, FOLLOW, UNFOLLOW, WriteBehind, replay
+
+
+class WriteBehindTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+
+    def writer(self, **kwargs):
+        return WriteBehind(self.directory, background=False, **kwargs)
+
+    def log_lines(self, writer):
+        with open(writer.path, encoding='utf-8') as log:
+            return log.readlines()
+
+    def test_operations_are_logged_then_applied_in_batch(self):
+        """Операции сначала попадают в журнал, потом одной пачкой в базу"""
+        writer = self.writer()
+        for text in ('Первый', 'Второй'):
+            writer.submit(
+                COMMENT, post=self.post.pk, author=self.reader.pk, text=text
+            )
+        for op in (FOLLOW, UNFOLLOW, FOLLOW, FOLLOW):
+            writer.submit(op, user=self.reader.pk, author=self.author.pk)
+        writer.submit(FOLLOW, user=self.author.pk, author=self.author.pk)
+        self.assertEqual(len(self.log_lines(writer)), 7)
+        self.assertFalse(Comment.objects.exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(writer.flush(), 7)
+        sqls = [query['sql'] for query in queries]
+        # по одному запросу на таблицу, подписка без проверки exists();
+        # у читателя еще нет строки счетчиков, у автора она уже есть
+        self.assertEqual(
+            [
+                re.search(r'"(posts_\w+)"', sql).group(1)
+                for sql in sqls
+                if sql.startswith(('INSERT', 'UPDATE', 'DELETE'))
+            ],
+            [
+                'posts_comment',
+                'posts_post',
+                'posts_follow',
+                'posts_timelineentry',
+                'posts_userstats',
+                'posts_userstats',
+                'posts_writelogcheckpoint',
+            ],
+        )
+        self.assertFalse(
+            [sql for sql in sqls if sql.startswith('SELECT "posts_follow"')]
+        )
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Первый', 'Второй'],
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        self.assertEqual(Follow.objects.get().user, self.reader)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=self.post
+            ).exists()
+        )
+        self.assertEqual(self.log_lines(writer), [])
+        self.assertEqual(
+            WriteLogCheckpoint.objects.get(log=writer.name).seq, 7
+        )
+
+        writer.submit(UNFOLLOW, user=self.reader.pk, author=self.author.pk)
+        writer.flush()
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 0)
+
+    def test_batches_are_bounded(self):
+        """Очередь применяется пачками не длиннее batch_size"""
+        writer = self.writer(batch_size=2)
+        for number in range(5):
+            writer.submit(
+                COMMENT, post=self.post.pk, author=self.reader.pk, text='-'
+            )
+        with mock.patch(
+            'posts.write_behind.apply', side_effect=write_behind.apply
+        ) as apply:
+            writer.flush()
+        self.assertEqual(
+            [len(call.args[0]) for call in apply.call_args_list], [2, 2, 1]
+        )
+
+    def test_concurrent_submits_share_fsync(self):
+        """Одновременные операции сбрасываются на диск общим fsync"""
+        writer = self.writer()
+        fsync = os.fsync
+
+        def slow_fsync(fd):
+            time.sleep(0.05)
+            fsync(fd)
+
+        threads = [
+            threading.Thread(
+                target=writer.submit,
+                args=(COMMENT,),
+                kwargs={'post': self.post.pk, 'author': 1, 'text': '-'},
+            )
+            for _ in range(10)
+        ]
+        with mock.patch(
+            'posts.write_behind.os.fsync', side_effect=slow_fsync
+        ) as synced:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(self.log_lines(writer)), 10)
+        self.assertLess(synced.call_count, 10)
+        self.assertEqual(writer._synced, 10)
+
+    def test_deleted_post_is_skipped(self):
+        """Комментарий к удаленному за это время посту пропускается"""
+        writer = self.writer()
+        other = Post.objects.create(text='Удаляемый', author=self.author)
+        for post in (other, self.post):
+            writer.submit(
+                COMMENT, post=post.pk, author=self.reader.pk, text='-'
+            )
+        other.delete()
+        writer.flush()
+        self.assertEqual(Comment.objects.get().post, self.post)
+
+    def test_replay_applies_unapplied_entries_once(self):
+        """Журнал упавшего процесса доигрывается с места отметки"""
+        crashed = self.writer()
+        for text in ('Применен', 'Потерян', 'Тоже потерян'):
+            crashed.submit(
+                COMMENT, post=self.post.pk, author=self.reader.pk, text=text
+            )
+        # первая запись успела примениться до падения
+        write_behind._apply_batch(crashed.name, crashed._pending[:1])
+        with open(crashed.path, 'a', encoding='utf-8') as log:
+            log.write('{"seq": 4, "op": "comm')
+        alive = self.writer()
+        # журнал живого процесса заблокирован
+        self.assertEqual(replay(self.directory), 0)
+        crashed._log.close()
+        self.assertEqual(replay(self.directory), 2)
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Применен', 'Потерян', 'Тоже потерян'],
+        )
+        self.assertEqual(os.listdir(self.directory), [alive.name + '.log'])
+        self.assertFalse(
+            WriteLogCheckpoint.objects.filter(log=crashed.name).exists()
+        )
+
+
+class WriteBehindViewsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.writer = WriteBehind(self.directory, background=False)
+        patcher = mock.patch(
+            'posts.write_behind.get_writer', return_value=self.writer
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.client.force_login(self.reader)
+
+    def test_views_queue_writes(self):
+        """Комментарий и подписка ставятся в очередь без записи в базу"""
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Отложенный'},
+        )
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        self.client.get(reverse('posts:profile_follow', args=['reader']))
+        self.assertEqual(len(self.writer), 2)
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.writer.flush()
+        self.assertEqual(Comment.objects.get().text, 'Отложенный')
+        self.assertTrue(Follow.objects.filter(user=self.reader).exists())
+        self.client.get(reverse('posts:profile_unfollow', args=['author']))
+        self.writer.flush()
+        self.assertFalse(Follow.objects.exists())
+
+
+class WriteBehindThreadTests(TransactionTestCase):
+    def test_background_thread_flushes_and_close_removes_log(self):
+        """Поток записи применяет очередь сам, close() убирает журнал"""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        with override_settings(WRITE_BEHIND=True, WRITE_BEHIND_DIR=directory):
+            writer = write_behind.get_writer()
+            self.addCleanup(setattr, write_behind, '_writer', None)
+            self.assertTrue(
+                write_behind.submit(FOLLOW, user=reader.pk, author=author.pk)
+            )
+            writer.close()
+        self.assertTrue(Follow.objects.filter(user=reader).exists())
+        self.assertEqual(os.listdir(directory), [])
+        self.assertFalse(WriteLogCheckpoint.objects.exists())
@@ -0,0 +1,164 @@
+"""Лента подписок, материализованная при записи (fan-out-on-write).
+
+Новый пост автора раскладывается в TimelineEntry каждого подписчика
+вместе с датой поста, и страница ленты читается одним диапазонным
+сканированием по индексу (user, -pub_date, -post).
+Посты авторов с огромным числом подписчиков не раскладываются
+(fanned_out=False), как и посты, созданные в обход сигналов (bulk_create).
+Такие посты подмешиваются в ленту при чтении: по запросу на каждого
+автора с неразосланными постами, не длиннее страницы. Накопившиеся
+посты непопулярных авторов дорассылает rebuild_timelines.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, Max
+
+from .consts import POSTS_NUMBERS, TIMELINE_BATCH_SIZE, TIMELINE_FANOUT_LIMIT
+from .models import FEED_FIELDS, Follow, Post, TimelineEntry
+from .paginators import PREVIOUS, CursorPaginator, decode_cursor
+
+ENTRY_FIELDS = ('pub_date', 'post', *(f'post__{name}' for name in FEED_FIELDS))
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает пост по лентам подписчиков автора."""
+    followers = Follow.objects.filter(author_id=post.author_id)
+    if followers.count() >= TIMELINE_FANOUT_LIMIT:
+        return False
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post=post,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.values_list('user_id', flat=True).iterator()
+    )
+    Post.objects.filter(pk=post.pk).update(fanned_out=True)
+    post.fanned_out = True
+    return True
+
+
+def fan_out_pending():
+    """Раскладывает все еще не разосланные посты одним INSERT ... SELECT.
+
+    Для массовой загрузки: вместо запросов на каждый пост.
+    """
+    popular = (
+        Follow.objects.order_by()
+        .values('author')
+        .annotate(total=Count('id'))
+        .filter(total__gte=TIMELINE_FANOUT_LIMIT)
+        .values('author')
+    )
+    pending = Post.objects.filter(fanned_out=False).exclude(author__in=popular)
+    # посты, созданные во время рассылки, разошлет их собственный сигнал
+    last_id = pending.aggregate(last=Max('id'))['last']
+    if last_id is None:
+        return 0
+    pending = pending.filter(id__lte=last_id)
+    post_ids, params = pending.values('id').query.sql_with_params()
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+        f'{TimelineEntry._meta.db_table} '
+        f'(user_id, post_id, author_id, pub_date) '
+        f'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+        f'FROM {Post._meta.db_table} post '
+        f'JOIN {Follow._meta.db_table} follow '
+        f'ON follow.author_id = post.author_id '
+        f'WHERE post.id IN ({post_ids}) '
+        f'{connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        return pending.update(fanned_out=True)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика уже разосланные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id, fanned_out=True
+    ).values_list('id', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune(user, author):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user=user, author=author).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок по ключу (pub_date, post).
+
+    Разосланные посты - диапазон индекса TimelineEntry, неразосланные
+    посты - по диапазону индекса (author, -pub_date, -id) на автора.
+    Каждый запрос читает от курсора не больше per_page + 1 строк,
+    страницы сливаются в Python.
+    """
+
+    ordering = ('-pub_date', '-post_id')
+
+    def __init__(self, user, per_page):
+        entries = (
+            TimelineEntry.objects.filter(user=user, post__hidden=False)
+            .select_related('post__author', 'post__group')
+            .only(*ENTRY_FIELDS)
+        )
+        super().__init__(entries, per_page)
+        self.user = user
+
+    def pending(self):
+        """Пагинаторы неразосланных постов авторов ленты."""
+        followed = Follow.objects.filter(user=self.user).values('author')
+        # частичный индекс posts_post_pending_idx
+        authors = (
+            Post.objects.filter(author__in=followed, fanned_out=False)
+            .order_by()
+            .values_list('author', flat=True)
+            .distinct()
+        )
+        return [
+            CursorPaginator(
+                Post.objects.feed().filter(
+                    author_id=author_id, fanned_out=False
+                ),
+                self.per_page,
+            )
+            for author_id in authors
+        ]
+
+    def rows(self, cursor=None):
+        posts = {entry.post.pk: entry.post for entry in super().rows(cursor)}
+        for paginator in self.pending():
+            posts.update((post.pk, post) for post in paginator.rows(cursor))
+        backward = cursor is not None and decode_cursor(cursor)[0] == PREVIOUS
+        ordered = sorted(
+            posts.values(),
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=not backward,
+        )
+        return ordered[:self.per_page + 1]
+
+
+def timeline_page(user, cursor=None, per_page=POSTS_NUMBERS):
+    """Страница ленты подписок; битый курсор ведет на первую страницу."""
+    return TimelinePaginator(user, per_page).get_cursor_page(cursor)
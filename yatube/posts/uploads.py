@@ -0,0 +1,168 @@
+"""Прием картинок постов без чтения файла целиком в память.
+
+Загрузка пишется во временный файл кусками по UPLOAD_CHUNK_SIZE. Форма
+сначала читает только заголовок картинки и проверяет формат и число
+пикселей, затем декодирует ее, уменьшает слишком большие оригиналы и
+пересохраняет без метаданных (EXIF, ICC, текстовые блоки PNG).
+Анимированные GIF и WebP пересохраняются всеми кадрами.
+"""
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, ImageSequence
+
+from .consts import (
+    IMAGE_MAX_SIDE,
+    IMAGE_UPLOAD_FORMATS,
+    IMAGE_UPLOAD_MAX_PIXELS,
+    IMAGE_UPLOAD_MAX_SIZE,
+    UPLOAD_CHUNK_SIZE,
+)
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+# что из image.info нужно для корректного вида картинки
+KEEP_INFO = ('transparency',)
+
+
+class SpoolingUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку на диск и перестает писать после лимита размера.
+
+    Сам размер проверяет форма: file.size - это полный объем загрузки.
+    """
+
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= IMAGE_UPLOAD_MAX_SIZE:
+            self.file.write(raw_data)
+
+
+def open_checked(file):
+    """Открывает картинку по заголовку, не декодируя пикселей."""
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError:
+        raise ValidationError(
+            'Слишком большое разрешение картинки.', code='too_many_pixels'
+        )
+    except OSError:
+        raise ValidationError(
+            forms.ImageField.default_error_messages['invalid_image'],
+            code='invalid_image',
+        )
+    if image.format not in IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            'Поддерживаются только форматы %(formats)s.',
+            code='invalid_format',
+            params={'formats': ', '.join(IMAGE_UPLOAD_FORMATS)},
+        )
+    # кадры анимации декодируются все, лимит на их сумму
+    frames = getattr(image, 'n_frames', 1)
+    if image.width * image.height * frames > IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое разрешение картинки.', code='too_many_pixels'
+        )
+    return image
+
+
+def _animation(image):
+    """Уменьшенные кадры анимации и параметры для save(save_all=True)."""
+    frames = []
+    durations = []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 0))
+        frame = frame.convert('RGBA')
+        frame.info = {}
+        frame.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+        frames.append(frame)
+    options = {
+        'save_all': True,
+        'append_images': frames[1:],
+        'duration': durations,
+    }
+    # GIF без блока loop проигрывается один раз
+    if 'loop' in image.info:
+        options['loop'] = image.info['loop']
+    return frames[0], options
+
+
+def normalize(file):
+    """Уменьшенная копия картинки без метаданных во временном файле."""
+    image = open_checked(file)
+    image_format = image.format
+    options = SAVE_OPTIONS.get(image_format, {})
+    if getattr(image, 'is_animated', False):
+        try:
+            image, animation = _animation(image)
+        except (OSError, SyntaxError):
+            raise ValidationError(
+                forms.ImageField.default_error_messages['invalid_image'],
+                code='invalid_image',
+            )
+        return _save(file.name, image, image_format, {**options, **animation})
+    # JPEG умеет декодироваться сразу в уменьшенном масштабе
+    image.draft(image.mode, (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    try:
+        image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError):
+        raise ValidationError(
+            forms.ImageField.default_error_messages['invalid_image'],
+            code='invalid_image',
+        )
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+    image.info = {
+        key: value for key, value in image.info.items() if key in KEEP_INFO
+    }
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    return _save(file.name, image, image_format, options)
+
+
+def _save(name, image, image_format, options):
+    content_type = CONTENT_TYPES[image_format]
+    normalized = TemporaryUploadedFile(name, content_type, 0, None)
+    image.save(normalized, image_format, **options)
+    normalized.size = normalized.tell()
+    normalized.seek(0)
+    return normalized
+
+
+class NormalizedImageField(forms.ImageField):
+    """Поле картинки, которое принимает ее через normalize()."""
+
+    def to_python(self, data):
+        # полная проверка ImageField декодирует файл еще до проверки
+        # разрешения, поэтому берем только проверки FileField
+        file = forms.FileField.to_python(self, data)
+        if file is None:
+            return None
+        if file.size > IMAGE_UPLOAD_MAX_SIZE:
+            raise ValidationError(
+                'Файл больше %(limit)s.',
+                code='too_large',
+                params={'limit': filesizeformat(IMAGE_UPLOAD_MAX_SIZE)},
+            )
+        try:
+            return normalize(file)
+        finally:
+            # исходный временный файл больше не нужен
+            file.close()
@@ -8,12 +8,16 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.comments, name='comments'),
+    path('search/', views.search, name='search'),
     path('create/', views.post_create, name='create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='edit'),
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
+    path('events/', views.events, name='events'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/events/', views.follow_events, name='follow_events'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path(
         'profile/<str:username>/follow/',
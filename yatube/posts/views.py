@@ -1,35 +1,53 @@
-from django.core.paginator import Paginator
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie
-
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from core.db import use_primary
+from core.sqlite import (
+    WriteQueueTimeout,
+    overloaded,
+    queued_write,
+    serialize_writes,
+)
+
+from . import fragments, graph, object_cache, write_behind
+from .events import INDEX_CHANNEL, EventStreamResponse, author_channel
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
-from .consts import POSTS_NUMBERS
+from .models import Post, User, Follow
+from .paginators import paginate
+from .search import SearchPaginator
+from .timeline import timeline_page
+
+
+def _follow_status(request, author):
+    """Подписан ли читатель на автора и автор на читателя; из кеша графа."""
+    if not request.user.is_authenticated or request.user.pk == author.pk:
+        return False, False
+    return (
+        graph.follows(request.user.pk, author.pk),
+        graph.follows(author.pk, request.user.pk),
+    )
 
 
-@cache_page(20, key_prefix='index_page')
-@vary_on_cookie
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POSTS_NUMBERS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj,
+        'live_updates': settings.LIVE_UPDATES,
     }
     return render(request, 'posts/index.html', context)
 
 
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group).all()
-    paginator = Paginator(post_list, POSTS_NUMBERS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = object_cache.groups.get_or_404(slug=slug)
+    post_list = Post.objects.feed().filter(group=group)
+    page_obj = paginate(request, post_list)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -38,23 +56,25 @@ def group_posts(request, slug):
 
 
 def profile(request, username):
-    author = User.objects.get(username=username)
-    post_list = Post.objects.filter(author=author)
-    paginator = Paginator(post_list, POSTS_NUMBERS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(user=request.user, author=author).exists()
-    )
-    context = {'page_obj': page_obj, 'author': author, 'following': following}
+    author = object_cache.authors.get_or_404(username=username)
+    post_list = Post.objects.feed().filter(author=author)
+    page_obj = paginate(request, post_list)
+    following, followed_by = _follow_status(request, author)
+    context = {
+        'page_obj': page_obj,
+        'author': author,
+        'following': following,
+        'followed_by': followed_by,
+    }
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
     form = CommentForm()
-    post = Post.objects.get(id=post_id)
-    comments = post.comments.all()
+    post = object_cache.get_post_or_404(post_id)
+    comments = fragments.render_comments(
+        post_id, request.GET.get('comments_cursor')
+    )
     context = {
         'post': post,
         'is_edit': True,
@@ -64,8 +84,43 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать еще»."""
+    object_cache.get_post_or_404(post_id)
+    page = fragments.render_comments(post_id, request.GET.get('cursor'))
+    next_url = None
+    if page['next_cursor'] is not None:
+        next_url = (
+            reverse('posts:comments', args=[post_id])
+            + '?'
+            + urlencode({'cursor': page['next_cursor']})
+        )
+    return JsonResponse(
+        {
+            'html': page['html'],
+            'next_cursor': page['next_cursor'],
+            'next': next_url,
+        }
+    )
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, Post.objects.feed())
+    page_obj = paginator.get_cursor_page(request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        # параметры, которые пагинатор сохраняет в ссылках на страницы
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required()
+@use_primary
 def post_create(request):
+    # проверка и пересжатие картинки идут до очереди записи
     form = PostForm(request.POST or None, files=request.FILES or None)
     if not form.is_valid():
         return render(
@@ -73,11 +128,16 @@ def post_create(request):
         )
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    try:
+        with queued_write(settings.SQLITE_WRITE_QUEUE_TIMEOUT):
+            post.save()
+    except WriteQueueTimeout:
+        return overloaded()
     return redirect('posts:profile', username=request.user.username)
 
 
 @login_required()
+@use_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if post.author != request.user:
@@ -98,10 +158,17 @@ def post_edit(request, post_id):
 
 
 @login_required
+@use_primary
+@serialize_writes
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and not write_behind.submit(
+        write_behind.COMMENT,
+        post=post.pk,
+        author=request.user.pk,
+        text=form.cleaned_data['text'],
+    ):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -111,33 +178,61 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    # информация о текущем пользователе доступна в переменной request.user
-    post_list = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author', 'group')
-    paginator = Paginator(post_list, POSTS_NUMBERS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'page_obj': page_obj}
+    page_obj = timeline_page(request.user, request.GET.get('cursor'))
+    context = {'page_obj': page_obj, 'live_updates': settings.LIVE_UPDATES}
     return render(request, 'posts/follow.html', context)
 
 
+def _no_live_updates():
+    # 204 останавливает переподключения EventSource
+    return HttpResponse(status=204)
+
+
+def events(request):
+    """Поток SSE с новыми постами общей ленты."""
+    if not settings.LIVE_UPDATES:
+        return _no_live_updates()
+    return EventStreamResponse([INDEX_CHANNEL])
+
+
+@login_required
+def follow_events(request):
+    """Поток SSE с новыми постами авторов, на которых подписан читатель."""
+    if not settings.LIVE_UPDATES:
+        return _no_live_updates()
+    return EventStreamResponse(
+        [
+            author_channel(author_id)
+            for author_id in graph.following(request.user.pk)
+        ]
+    )
+
+
 @login_required
+@use_primary
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
+    if user == author or write_behind.submit(
+        write_behind.FOLLOW, user=user.pk, author=author.pk
+    ):
+        return redirect('posts:profile', username=username)
     is_following_already = Follow.objects.filter(
         user=user, author=author
     ).exists()
-    if user != author and not is_following_already:
+    if not is_following_already:
         Follow.objects.create(user=user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@use_primary
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=user, author=author).delete()
+    if not write_behind.submit(
+        write_behind.UNFOLLOW, user=user.pk, author=author.pk
+    ):
+        Follow.objects.filter(user=user, author=author).delete()
 
     return redirect('posts:profile', username=username)
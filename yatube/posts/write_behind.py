@@ -0,0 +1,363 @@
+"""Отложенная запись комментариев и подписок пачками.
+
+С WRITE_BEHIND представления add_comment, profile_follow и
+profile_unfollow не пишут в базу сами. Операция дописывается строкой
+JSON в журнал процесса, журнал сбрасывается на диск (fsync), и только
+после этого пользователь получает ответ. fsync общий для группы: один
+из ждущих запросов сбрасывает на диск все строки, дописанные к этому
+моменту, и будит остальных (group commit). Поток записи собирает очередь
+в пачки до WRITE_BEHIND_BATCH_SIZE операций и применяет каждую пачку
+одной транзакцией: комментарии - одним bulk_create, подписки -
+bulk_create(ignore_conflicts=True) без проверки exists(), отписки -
+одним DELETE. Так всплеск записи занимает единственного писателя SQLite
+несколькими короткими транзакциями вместо транзакции на запрос.
+
+В той же транзакции сохраняется номер последней примененной записи
+журнала (WriteLogCheckpoint). Журналы лежат в WRITE_BEHIND_DIR, по файлу
+на процесс, файл живого процесса заблокирован flock. Журналы упавших
+процессов доигрывает следующий запущенный писатель или команда
+replay_write_log: применяются только записи после отметки, поэтому
+каждая подтвержденная операция попадает в базу ровно один раз.
+
+Новые комментарии и подписки появляются в базе с задержкой до
+WRITE_BEHIND_INTERVAL секунд.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from core.sqlite import queued_write
+
+from . import counters, fragments, graph, timeline
+from .consts import WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_INTERVAL
+from .models import (
+    Comment,
+    Follow,
+    Post,
+    TimelineEntry,
+    User,
+    WriteLogCheckpoint,
+)
+
+logger = logging.getLogger(__name__)
+
+COMMENT = 'comment'
+FOLLOW = 'follow'
+UNFOLLOW = 'unfollow'
+LOG_SUFFIX = '.log'
+
+
+def _existing(model, pks):
+    return set(model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+
+
+def _pairs_query(pairs):
+    by_user = defaultdict(list)
+    for user_id, author_id in pairs:
+        by_user[user_id].append(author_id)
+    return reduce(
+        or_,
+        (
+            Q(user_id=user_id, author_id__in=author_ids)
+            for user_id, author_ids in by_user.items()
+        ),
+    )
+
+
+def apply(operations):
+    """Применяет операции журнала; вызывается внутри транзакции.
+
+    Операции над удаленными за это время постами и пользователями
+    пропускаются. У пары читатель-автор важна только последняя
+    операция подписки или отписки.
+    """
+    comments = [op for op in operations if op['op'] == COMMENT]
+    follows = {}
+    for op in operations:
+        if op['op'] in (FOLLOW, UNFOLLOW):
+            follows[(op['user'], op['author'])] = op['op']
+    users = _existing(
+        User,
+        {op['author'] for op in comments}
+        | {user_id for pair in follows for user_id in pair},
+    )
+    posts = _existing(Post, {op['post'] for op in comments})
+
+    comments = [
+        Comment(post_id=op['post'], author_id=op['author'], text=op['text'])
+        for op in comments
+        if op['post'] in posts and op['author'] in users
+    ]
+    Comment.objects.bulk_create(comments)
+    added = Counter(comment.post_id for comment in comments)
+    for post_id, count in added.items():
+        counters.change_comments_count(post_id, count)
+    transaction.on_commit(lambda: fragments.bump_many('comments', added))
+
+    followed = [
+        (user_id, author_id)
+        for (user_id, author_id), op in follows.items()
+        if op == FOLLOW
+        and user_id != author_id
+        and {user_id, author_id} <= users
+    ]
+    Follow.objects.bulk_create(
+        [
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in followed
+        ],
+        ignore_conflicts=True,
+    )
+    for user_id, author_id in followed:
+        timeline.backfill(user_id, author_id)
+
+    unfollowed = [pair for pair, op in follows.items() if op == UNFOLLOW]
+    if unfollowed:
+        query = _pairs_query(unfollowed)
+        rows = Follow.objects.filter(query)
+        # без сбора объектов для сигналов: ленты чистятся одним DELETE
+        rows._raw_delete(rows.db)
+        TimelineEntry.objects.filter(query).delete()
+
+    # ignore_conflicts не сообщает, какие подписки вставлены: счетчики
+    # участников пересчитываются
+    changed = followed + unfollowed
+    if changed:
+        counters.recount_follows(
+            {user_id for pair in changed for user_id in pair} & users
+        )
+        transaction.on_commit(lambda: graph.invalidate_many(changed))
+
+
+def _apply_batch(log, entries):
+    with queued_write(), transaction.atomic():
+        apply(entries)
+        WriteLogCheckpoint.objects.update_or_create(
+            log=log, defaults={'seq': entries[-1]['seq']}
+        )
+
+
+def _read(log):
+    entries = []
+    for line in log:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            # недописанная строка: ответ на эту операцию не отправлен
+            continue
+    return entries
+
+
+def replay(directory, batch_size=WRITE_BEHIND_BATCH_SIZE):
+    """Доигрывает журналы упавших процессов, возвращает число операций."""
+    if not os.path.isdir(directory):
+        return 0
+    replayed = 0
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(LOG_SUFFIX):
+            continue
+        name = filename[: -len(LOG_SUFFIX)]
+        path = os.path.join(directory, filename)
+        try:
+            log = open(path, encoding='utf-8', errors='replace')
+        except FileNotFoundError:
+            continue
+        with log:
+            try:
+                fcntl.flock(log, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # журнал живого процесса
+                continue
+            if os.fstat(log.fileno()).st_nlink == 0:
+                # журнал уже доиграл другой процесс
+                continue
+            applied = (
+                WriteLogCheckpoint.objects.filter(log=name)
+                .values_list('seq', flat=True)
+                .first()
+            ) or 0
+            entries = [entry for entry in _read(log) if entry['seq'] > applied]
+            for start in range(0, len(entries), batch_size):
+                _apply_batch(name, entries[start:start + batch_size])
+            replayed += len(entries)
+            os.remove(path)
+        WriteLogCheckpoint.objects.filter(log=name).delete()
+    return replayed
+
+
+class WriteBehind:
+    """Журнал и очередь отложенной записи одного процесса."""
+
+    def __init__(
+        self,
+        directory,
+        batch_size=WRITE_BEHIND_BATCH_SIZE,
+        interval=WRITE_BEHIND_INTERVAL,
+        background=True,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.pid = os.getpid()
+        self.name = f'{self.pid}-{uuid4().hex[:8]}'
+        self.path = os.path.join(directory, self.name + LOG_SUFFIX)
+        self.batch_size = batch_size
+        self.interval = interval
+        self._log = open(self.path, 'a', encoding='utf-8')
+        fcntl.flock(self._log, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._seq = 0
+        self._pending = []
+        self._closed = False
+        # журнал и очередь
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        # номер последней записи на диске и идет ли сейчас fsync
+        self._synced = 0
+        self._syncing = False
+        self._synced_changed = threading.Condition()
+        # пачки применяются по одной
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(
+                target=self._run, name='write-behind', daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, op, **fields):
+        """Записывает операцию в журнал и ставит в очередь.
+
+        После возврата операция не потеряется при падении процесса.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Журнал отложенной записи закрыт')
+            self._seq += 1
+            entry = {'seq': self._seq, 'op': op, **fields}
+            self._log.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._pending.append(entry)
+            self._ready.notify()
+        self._sync(entry['seq'])
+
+    def _sync(self, seq):
+        """Ждет, пока запись seq окажется на диске.
+
+        Если fsync никто не делает, поток делает его сам для всех строк,
+        дописанных к этому моменту; иначе ждет и проверяет снова.
+        """
+        with self._synced_changed:
+            while self._synced < seq and self._syncing:
+                self._synced_changed.wait()
+            if self._synced >= seq:
+                return
+            self._syncing = True
+        synced = self._synced
+        try:
+            with self._lock:
+                self._log.flush()
+                last = self._seq
+            os.fsync(self._log.fileno())
+            synced = last
+        finally:
+            with self._synced_changed:
+                self._synced = synced
+                self._syncing = False
+                self._synced_changed.notify_all()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Применяет всю очередь пачками, возвращает число операций."""
+        flushed = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[: self.batch_size]
+                if not batch:
+                    return flushed
+                _apply_batch(self.name, batch)
+                flushed += len(batch)
+                with self._lock:
+                    del self._pending[: len(batch)]
+                    if not self._pending:
+                        # все записи применены, номера продолжаются
+                        self._log.truncate(0)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._ready.wait_for(lambda: self._pending or self._closed)
+                # даем набраться пачке
+                self._ready.wait_for(
+                    lambda: len(self._pending) >= self.batch_size
+                    or self._closed,
+                    self.interval,
+                )
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Пачка отложенной записи не применена')
+                # операции остаются в очереди и журнале до следующей попытки
+                time.sleep(1)
+            finally:
+                close_old_connections()
+
+    def close(self):
+        """Применяет очередь и удаляет журнал процесса."""
+        if os.getpid() != self.pid:
+            # обработчик atexit, унаследованный дочерним процессом
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._ready.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        os.remove(self.path)
+        self._log.close()
+        WriteLogCheckpoint.objects.filter(log=self.name).delete()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Писатель процесса или None, если WRITE_BEHIND выключен.
+
+    Первый вызов в процессе доигрывает журналы упавших процессов.
+    """
+    global _writer
+    if not settings.WRITE_BEHIND:
+        return None
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            replay(settings.WRITE_BEHIND_DIR)
+            _writer = WriteBehind(settings.WRITE_BEHIND_DIR)
+            atexit.register(_writer.close)
+        return _writer
+
+
+def submit(op, **fields):
+    """Ставит операцию в отложенную запись; False, если она выключена."""
+    writer = get_writer()
+    if writer is None:
+        return False
+    writer.submit(op, **fields)
+    return True
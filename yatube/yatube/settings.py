@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from core.db import database_settings
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -53,6 +55,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.ReadYourWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -81,17 +85,39 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# ASGI: потоки, в которых выполняется обработчик Django, см. core/asgi.py
+ASGI_WORKERS = int(os.getenv('YATUBE_ASGI_WORKERS', 64))
+# сколько процессов сервера запущено; вместе с ASGI_WORKERS задает число
+# соединений с базой, см. core/checks.py
+WEB_PROCESSES = int(os.getenv('YATUBE_WEB_PROCESSES', 1))
+# новые посты по SSE, см. posts/events.py; включать только при запуске
+# через yatube/asgi.py: под WSGI каждый поток занимает воркер
+LIVE_UPDATES = os.getenv('YATUBE_LIVE_UPDATES', '') == '1'
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
-}
+# основная база и реплики задаются переменными окружения YATUBE_DB_*,
+# см. core/db.py; по умолчанию - SQLite в BASE_DIR/db.sqlite3
+DATABASES, DATABASE_REPLICAS = database_settings(os.environ, BASE_DIR)
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+# после записи пользователь столько секунд читает из основной базы
+DATABASE_REPLICA_LAG = int(os.getenv('YATUBE_DB_REPLICA_LAG', 10))
+DATABASE_STICKY_COOKIE = 'yatube_primary'
+# соединений с каждой базой, доступных сайту: max_connections
+# PostgreSQL по умолчанию (100) без зарезервированных для superuser (3)
+DATABASE_CONNECTION_LIMIT = int(os.getenv('YATUBE_DB_CONNECTION_LIMIT', 97))
+# WAL, mmap, busy_timeout и очередь записи для SQLite, см. core/sqlite.py
+SQLITE_TUNING = os.getenv('YATUBE_SQLITE_TUNING', '') == '1'
+# сколько секунд запрос ждет своей очереди на запись
+SQLITE_WRITE_QUEUE_TIMEOUT = 30
+# комментарии и подписки пишутся пачками через журнал на диске,
+# см. posts/write_behind.py
+WRITE_BEHIND = os.getenv('YATUBE_WRITE_BEHIND', '') == '1'
+WRITE_BEHIND_DIR = os.getenv(
+    'YATUBE_WRITE_BEHIND_DIR', os.path.join(BASE_DIR, 'write_log')
+)
 
 
 # Password validation
@@ -142,16 +168,51 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 print(EMAIL_FILE_PATH)
 print(EMAIL_BACKEND)
 
+# выборочное профилирование запросов, см. core/profiling.py:
+# доля профилируемых запросов (0 - выключено) и сколько последних
+# значений каждой метрики хранить для гистограмм
+PROFILING_SAMPLE_RATE = float(os.getenv('YATUBE_PROFILING_SAMPLE_RATE', 0))
+PROFILING_WINDOW = 1000
+
 # error 403
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 # Static files (CSS, JavaScript, Images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# загрузки сразу пишутся во временный файл, см. posts/uploads.py
+FILE_UPLOAD_HANDLERS = ['posts.uploads.SpoolingUploadHandler']
+
+# индекс полнотекстового поиска по постам, см. posts/search.py
+SEARCH_INDEX = os.getenv(
+    'YATUBE_SEARCH_INDEX', os.path.join(BASE_DIR, 'search.sqlite3')
+)
+# в тестах индекс поиска лежит во временном каталоге
+TEST_RUNNER = 'core.test_runner.TestRunner'
 
 # enabling caching
-CACHES = {
-    'default': {
+# По умолчанию кеш внутри процесса: тесты, runserver и замеры не делят
+# его между собой. Общий кеш для всех процессов включается явно через
+# YATUBE_CACHE_BACKEND: sqlite - файл на одном сервере,
+# memcached - сетевой кеш. YATUBE_CACHE_LOCATION задает файл или
+# серверы через ';'.
+CACHE_BACKENDS = {
+    'sqlite': {
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'memcached': {
+        'BACKEND': 'core.cache_backends.memcached.PooledMemcachedCache',
+        'LOCATION': os.getenv('YATUBE_CACHE_LOCATION', '127.0.0.1:11211'),
+        'OPTIONS': {'POOL_SIZE': 10},
+    },
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+}
+CACHES = {
+    'default': CACHE_BACKENDS[os.getenv('YATUBE_CACHE_BACKEND', 'locmem')],
 }